@@ -1,25 +1,90 @@
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from app.models import db
-from app.routes import main
+from app.routes import main, UPLOAD_FOLDER
+from app.cache import init_cache
+from app.extraction import init_extraction
+from app.shards import init_shards
+from app.db_routing import configure_routing, install_pragmas
+from app.compression import init_compression
+from app.backup import init_backup
+from app.scrubber import init_scrubber
+from app.recorder import init_recorder
+from app.profiling import init_profiling
+from app.limits import init_limits
+from app.suggest import init_suggest
+from app.migrations import ensure_schema
+from app.journals import init_journals
+from app.tasks import init_tasks
 import os
 
-def create_app():
-    app = Flask(__name__)
+def create_app(config=None):
+    # Denník z /j/<meno> má vlastný instance priečinok (archív, zálohy, zámky)
+    app = Flask(__name__, instance_path=(config or {}).get('DENNIK_INSTANCE_PATH'))
     
     # Konfigurácia databázy
     app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///dennik.db'
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     app.config['SECRET_KEY'] = 'dennik-secret-key-2025'
+    app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
     
-    # Inicializácia databázy
+    # Prepísanie konfigurácie (benchmarky, skripty)
+    if config:
+        app.config.update(config)
+    
+    # Inicializácia databázy (read-only pool pre GET + jedno spojenie zapisovača)
+    configure_routing(app)
+    init_compression()
     db.init_app(app)
+    init_cache(app)
+    init_extraction(app)
+    init_shards(app)
+    init_limits(app)
+    init_suggest(app)
+    
+    # Záznam requestov pre replay_traffic.py (iba ak je nastavený DENNIK_RECORD_FILE)
+    init_recorder(app)
+    
+    # Profilovanie requestov (DENNIK_PROFILE_TOKEN / DENNIK_PROFILE_SAMPLE, inak bez hákov)
+    init_profiling(app)
     
     # Registrácia blueprintov
     app.register_blueprint(main)
     
-    # Vytvorenie tabuliek
     with app.app_context():
-        db.create_all()
+        install_pragmas(db)
+    
+    # Schéma - pri aktuálnej verzii iba porovnanie PRAGMA user_version, žiadne DDL
+    ensure_schema(app)
+    
+    # Plánované zálohy (DENNIK_BACKUP_INTERVAL v sekundách, 0 = vypnuté)
+    init_backup(app)
+    
+    # Kontrola príloh a zber osirelých súborov (DENNIK_SCRUB_INTERVAL, 0 = iba na požiadanie)
+    init_scrubber(app)
     
-    return app
\ No newline at end of file
+    # Front úloh na pozadí (mazanie a dokončenie súborov príloh po commite)
+    init_tasks(app)
+    
+    # Ďalšie denníky pod /j/<meno> (iba hlavná aplikácia)
+    init_journals(app)
+    
+    return app
+
+
+def shutdown_app(app):
+    """Zastaví vlákna na pozadí a zatvorí enginy aplikácie (zatvorenie denníka)"""
+    for name in ('dennik_backup', 'dennik_scrub', 'dennik_tasks'):
+        service = app.extensions.get(name)
+        if service is not None:
+            service.stop()
+    app.extensions['dennik_extractor'].shutdown(wait=True)
+    app.extensions['dennik_shards'].dispose()
+    app.extensions['dennik_cache'].clear()
+    app.extensions.pop('dennik_suggest', None)
+    journals = app.extensions.get('dennik_journals')
+    if journals is not None:
+        journals.pool.close_all()
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
\ No newline at end of file
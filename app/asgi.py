@@ -0,0 +1,278 @@
+"""Asynchrónny (ASGI) režim servera
+
+Sťahovanie príloh (vrátane Range požiadaviek PDF.js) a export archívu
+sa obsluhujú priamo na event loope: súbor sa posiela po blokoch a
+každý `await send` čaká, kým klient dáta prevezme, takže pomalý klient
+nedrží worker ani vlákno. Všetky ostatné routy (SQLAlchemy, JSON API)
+bežia nezmenené cez asgiref.WsgiToAsgi.
+
+Synchrónne kroky (before/after_request háky Flasku, vyhľadanie prílohy,
+zostavenie ZIP exportu) aj čítanie jednotlivých blokov súboru bežia v
+executore; na loope ostáva iba odosielanie. Range sa rovnako ako vo
+WSGI route prijíma iba pre PDF. Rovnako sa obsluhujú aj denníky pod
+/j/<meno>/ (app/journals.py).
+
+Závislosti (nie sú potrebné pre WSGI režim): requirements-asgi.txt
+Spustenie: uvicorn asgi:application (alebo DENNIK_SERVER=asgi python run.py)
+"""
+import asyncio
+import os
+import re
+import unicodedata
+from functools import partial
+from urllib.parse import quote
+
+from flask import current_app, jsonify, request
+from werkzeug.exceptions import HTTPException
+
+from app.journals import JOURNAL_PREFIX, JournalError, dispatcher
+from app.limits import LimitExceeded, limit_response, limiter
+
+CHUNK = 64 * 1024
+RANGE_RE = re.compile(r'bytes=(\d*)-(\d*)$')
+ASYNC_ENDPOINTS = ('main.download_attachment', 'main.export_archive')
+
+
+def parse_range(header, file_size):
+    """(start, end) pre jeden rozsah 'bytes=a-b' / 'bytes=a-' / 'bytes=-n'; None = celý súbor; ValueError = 416"""
+    if not header:
+        return None
+    m = RANGE_RE.match(header.strip())
+    if not m or (not m.group(1) and not m.group(2)):
+        return None  # viac rozsahov alebo iný formát - pošle sa celý súbor
+    if not m.group(1):
+        length = int(m.group(2))
+        if length == 0:
+            raise ValueError(header)
+        return max(file_size - length, 0), file_size - 1
+    start = int(m.group(1))
+    end = int(m.group(2)) if m.group(2) else file_size - 1
+    end = min(end, file_size - 1)
+    if start > end:
+        raise ValueError(header)
+    return start, end
+
+
+def content_disposition(kind, filename):
+    """Hlavička aj pre názvy s diakritikou (RFC 6266)"""
+    ascii_name = unicodedata.normalize('NFKD', filename).encode('ascii', 'ignore').decode().replace('"', '') or 'subor'
+    return f"{kind}; filename=\"{ascii_name}\"; filename*=UTF-8''{quote(filename)}"
+
+
+async def send_response(send, response):
+    """Celá (malá) Flask odpoveď naraz - chyby a odpovede before_request hákov"""
+    body = response.get_data()
+    await send({'type': 'http.response.start', 'status': response.status_code,
+                'headers': asgi_headers(response, len(body))})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def asgi_headers(response, length=None):
+    headers = [(key.lower().encode('latin-1'), value.encode('latin-1'))
+               for key, value in response.headers.items() if key.lower() != 'content-length']
+    length = response.content_length if length is None else length
+    return headers + [(b'content-length', str(length or 0).encode())]
+
+
+def _read_chunk(f, start, size):
+    f.seek(start)
+    return f.read(size)
+
+
+async def stream_file(send, path, status, headers, start=0, length=0):
+    """Pošle `length` bajtov súboru od `start` po blokoch CHUNK
+
+    Otvorenie aj každé čítanie bloku beží v executore - pomalý disk
+    (alebo sieťový priečinok príloh) nezastaví ostatné spojenia na loope.
+    """
+    loop = asyncio.get_running_loop()
+    f = await loop.run_in_executor(None, open, path, 'rb')
+    try:
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        position, remaining = start, length
+        while remaining > 0:
+            chunk = await loop.run_in_executor(None, _read_chunk, f, position, min(CHUNK, remaining))
+            if not chunk:
+                break
+            position += len(chunk)
+            remaining -= len(chunk)
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': remaining > 0})
+        if remaining > 0 or length == 0:
+            # Prázdny súbor, alebo sa súbor počas prenosu skrátil - ukonči odpoveď
+            await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        await loop.run_in_executor(None, f.close)
+
+
+class AsyncDennik:
+    """ASGI aplikácia: I/O routy natívne, ostatné cez WSGI adaptér"""
+
+    def __init__(self, flask_app, wsgi=None):
+        self.flask_app = flask_app
+        if wsgi is None:
+            try:
+                from asgiref.wsgi import WsgiToAsgi
+            except ImportError:
+                raise RuntimeError('ASGI režim vyžaduje balík asgiref (pip install -r requirements-asgi.txt)')
+            wsgi = WsgiToAsgi(flask_app)
+        self.wsgi = wsgi
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http' and scope['method'] == 'GET':
+            journals = dispatcher(self.flask_app)
+            resolved = journals.resolve(scope['path']) if journals else None
+            if resolved is None:
+                root = scope.get('root_path', '')
+                match = self._match(self.flask_app, scope['path'], root)
+                if match:
+                    return await self._native(self.flask_app, scope, send, root, scope['path'], *match)
+            else:
+                # /j/<meno>/... - rovnaké natívne routy v aplikácii denníka
+                name, rest = resolved
+                try:
+                    app = await self._run_sync(journals.pool.checkout, name)
+                except JournalError:
+                    app = None  # 404 vráti WSGI dispatcher
+                if app is not None:
+                    try:
+                        match = self._match(app, rest)
+                        if match:
+                            root = scope.get('root_path', '') + JOURNAL_PREFIX + name
+                            return await self._native(app, scope, send, root, rest, *match)
+                    finally:
+                        journals.pool.release(name)
+        return await self.wsgi(scope, receive, send)
+
+    async def _native(self, app, scope, send, script_root, path, endpoint, args):
+        # Export je dočasný ZIP - po odoslaní (alebo chybe) sa zmaže
+        temporary = endpoint == 'main.export_archive'
+        if temporary:
+            prepare = self._export_response
+        else:
+            prepare = partial(self._download_response, args['attachment_id'])
+        response, file_path, start = await self._run_sync(
+            self._handle, app, scope, script_root, path, prepare, temporary)
+        try:
+            if file_path is None:
+                return await send_response(send, response)
+            await stream_file(send, file_path, response.status_code, asgi_headers(response),
+                              start, response.content_length)
+        finally:
+            # call_on_close (napr. slot limitu exportu) až po odoslaní tela
+            response.close()
+            if temporary and file_path is not None:
+                try:
+                    os.remove(file_path)
+                except OSError:
+                    pass
+
+    def _match(self, app, path, root_path=None):
+        adapter = app.url_map.bind('', script_name=root_path or None)
+        try:
+            endpoint, args = adapter.match(path, method='GET')
+        except HTTPException:
+            return None
+        if endpoint in ASYNC_ENDPOINTS:
+            return endpoint, args
+        return None
+
+    async def _run_sync(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, func, *args)
+
+    def _request_context(self, app, scope, script_root, path):
+        headers = [(key.decode('latin-1'), value.decode('latin-1')) for key, value in scope.get('headers', [])]
+        host = dict(headers).get('host') or '{}:{}'.format(*(scope.get('server') or ('localhost', 80)))
+        client = scope.get('client') or ('', 0)
+        return app.test_request_context(
+            path, method='GET', headers=headers,
+            base_url=f"{scope.get('scheme', 'http')}://{host}{script_root}",
+            query_string=scope.get('query_string', b'').decode('latin-1'),
+            environ_base={'REMOTE_ADDR': client[0]},
+        )
+
+    def _handle(self, app, scope, script_root, path, prepare, temporary=False):
+        """Synchrónna časť natívnej routy v request kontexte Flasku
+
+        before/after_request háky (recorder, profiler) vidia request rovnako
+        ako vo WSGI režime; after háky bežia pred odoslaním hlavičiek, takže
+        môžu hlavičky doplniť. Vráti (odpoveď, súbor tela alebo None, začiatok).
+        """
+        with self._request_context(app, scope, script_root, path):
+            file_path, start = None, 0
+            try:
+                response = app.preprocess_request()
+                if response is None:
+                    # GET request - vyhľadanie ide cez read-only engine, nie cez zapisovača
+                    response, file_path, start = prepare()
+                response = app.make_response(response)
+            except Exception as e:
+                response = app.make_response((jsonify({'error': str(e)}), 500))
+            try:
+                return app.process_response(response), file_path, start
+            except BaseException:
+                response.close()
+                if file_path is not None and temporary:
+                    os.remove(file_path)
+                raise
+
+    def _download_response(self, attachment_id):
+        from app.routes import _find_attachment, upload_folder
+        attachment = _find_attachment(attachment_id)
+        if attachment is None:
+            return (jsonify({'error': 'Príloha neexistuje'}), 404), None, 0
+        file_path = os.path.join(upload_folder(), attachment.filename)
+        try:
+            file_size = os.path.getsize(file_path)
+        except OSError:
+            return (jsonify({'error': 'Súbor neexistuje'}), 404), None, 0
+
+        force_download = request.args.get('download') == '1'
+        mime_type = attachment.mime_type or 'application/octet-stream'
+        # PDF inline (ak nie je download=1), ostatné ako attachment - rovnako ako WSGI routa
+        is_pdf = (mime_type == 'application/pdf'
+                  or attachment.original_filename.lower().endswith('.pdf')) and not force_download
+        response = current_app.response_class(mimetype=mime_type)
+        response.headers['Content-Disposition'] = content_disposition(
+            'inline' if is_pdf else 'attachment', attachment.original_filename)
+
+        # Range (PDF.js) iba pre PDF ako vo WSGI route, ostatné súbory vždy celé
+        start, length = 0, file_size
+        if is_pdf:
+            response.headers['Accept-Ranges'] = 'bytes'
+            try:
+                byte_range = parse_range(request.headers.get('Range'), file_size)
+            except ValueError:
+                response.status_code = 416
+                response.headers['Content-Range'] = f'bytes */{file_size}'
+                return response, None, 0
+            if byte_range:
+                start, end = byte_range
+                length = end - start + 1
+                response.status_code = 206
+                response.headers['Content-Range'] = f'bytes {start}-{end}/{file_size}'
+        response.content_length = length
+        return response, file_path, start
+
+    def _export_response(self):
+        from app.routes import build_export_archive, export_filename
+        # Rovnaký limit súbežnosti ako WSGI routa (sloty sú zdieľané medzi workermi);
+        # slot sa drží aj počas odosielania - uvoľní ho response.close() v _native
+        try:
+            slot = limiter('export').acquire()
+        except LimitExceeded as e:
+            return limit_response(e), None, 0
+        try:
+            zip_path = build_export_archive()
+        except BaseException:
+            slot.close()
+            raise
+        response = current_app.response_class(mimetype='application/zip')
+        response.call_on_close(slot.close)
+        response.headers['Content-Disposition'] = content_disposition('attachment', export_filename())
+        response.content_length = os.path.getsize(zip_path)
+        return response, zip_path, 0
+
+
+def create_asgi_app(flask_app):
+    return AsyncDennik(flask_app)
@@ -0,0 +1,276 @@
+"""Priebežné zálohy databázy a príloh
+
+Databáza sa kopíruje cez SQLite online backup API po malých blokoch
+stránok, takže zápisy medzi krokmi pokračujú a nevznikne roztrhnutá
+kópia. Prílohy sa ukladajú do úložiska adresovaného obsahom
+(objects/<sha256[:2]>/<sha256>) - súbor sa hashuje iba ak sa mu od
+poslednej zálohy zmenila veľkosť alebo mtime a kopíruje sa iba ak
+objekt ešte neexistuje.
+
+Archivované roky (shardy DENNIK_ARCHIVE_FOLDER/dennik-<rok>.db) sa
+kopírujú rovnako ako hlavná databáza. Snapshot sa skladá v dočasnom
+priečinku a premenuje sa až keď je celý; nedokončené zvyšky zmaže
+rotácia.
+
+Štruktúra priečinka záloh:
+    snapshots/<RRRRMMDD_HHMMSS>/dennik.db
+    snapshots/<RRRRMMDD_HHMMSS>/archive/dennik-<rok>.db
+    snapshots/<RRRRMMDD_HHMMSS>/manifest.json
+    objects/<sha256[:2]>/<sha256>
+"""
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+
+from app.shards import SHARD_RE
+
+MANIFEST_NAME = 'manifest.json'
+DATABASE_NAME = 'dennik.db'
+DEFAULT_KEEP = 7
+DEFAULT_PAGES_PER_STEP = 256
+DEFAULT_STEP_SLEEP = 0.005
+HASH_CHUNK = 1024 * 1024
+
+
+def backup_database(source_path, target_path, pages=DEFAULT_PAGES_PER_STEP, sleep=DEFAULT_STEP_SLEEP):
+    """Konzistentná kópia živej databázy cez online backup API"""
+    tmp_path = target_path + '.tmp'
+    source = sqlite3.connect(f'file:{source_path}?mode=ro', uri=True, timeout=30)
+    target = sqlite3.connect(tmp_path)
+    try:
+        source.backup(target, pages=pages, sleep=sleep)
+        # Záloha je samostatný súbor - bez WAL
+        target.execute('PRAGMA journal_mode=DELETE')
+    finally:
+        target.close()
+        source.close()
+    os.replace(tmp_path, target_path)
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def object_path(backup_folder, sha256):
+    return os.path.join(backup_folder, 'objects', sha256[:2], sha256)
+
+
+def load_manifest(snapshot_dir):
+    try:
+        with open(os.path.join(snapshot_dir, MANIFEST_NAME), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def list_snapshots(backup_folder):
+    """Dokončené snapshoty od najstaršieho po najnovší"""
+    root = os.path.join(backup_folder, 'snapshots')
+    if not os.path.isdir(root):
+        return []
+    return [
+        os.path.join(root, name) for name in sorted(os.listdir(root))
+        if not name.startswith('.') and os.path.exists(os.path.join(root, name, MANIFEST_NAME))
+    ]
+
+
+def build_manifest(upload_folder, previous=None):
+    """{názov súboru: {size, mtime, sha256}} - nezmenené súbory sa nehashujú znova"""
+    previous = (previous or {}).get('files', {})
+    files = {}
+    if not os.path.isdir(upload_folder):
+        return files
+    for entry in os.scandir(upload_folder):
+        if not entry.is_file():
+            continue
+        stat = entry.stat()
+        known = previous.get(entry.name)
+        if known and known['size'] == stat.st_size and known['mtime'] == stat.st_mtime:
+            files[entry.name] = known
+        else:
+            files[entry.name] = {
+                'size': stat.st_size,
+                'mtime': stat.st_mtime,
+                'sha256': file_sha256(entry.path),
+            }
+    return files
+
+
+def store_objects(backup_folder, upload_folder, files):
+    """Skopíruje do úložiska iba objekty, ktoré tam ešte nie sú; vráti ich počet"""
+    copied = 0
+    for name, info in files.items():
+        target = object_path(backup_folder, info['sha256'])
+        if os.path.exists(target):
+            continue
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.copyfile(os.path.join(upload_folder, name), target + '.tmp')
+        os.replace(target + '.tmp', target)
+        copied += 1
+    return copied
+
+
+def _remove_incomplete(backup_folder):
+    """Rozpracované a neúplné snapshoty (prerušená záloha) - volá sa iba pod zámkom záloh"""
+    root = os.path.join(backup_folder, 'snapshots')
+    if not os.path.isdir(root):
+        return
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        if os.path.isdir(path) and (name.startswith('.') or not os.path.exists(os.path.join(path, MANIFEST_NAME))):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def prune(backup_folder, keep):
+    """Ponechá posledných `keep` snapshotov a zmaže nepoužívané objekty"""
+    _remove_incomplete(backup_folder)
+    snapshots = list_snapshots(backup_folder)
+    for old in snapshots[:-keep] if keep > 0 else []:
+        shutil.rmtree(old, ignore_errors=True)
+    referenced = set()
+    for snapshot in list_snapshots(backup_folder):
+        manifest = load_manifest(snapshot) or {}
+        referenced.update(info['sha256'] for info in manifest.get('files', {}).values())
+    objects_root = os.path.join(backup_folder, 'objects')
+    removed = 0
+    if os.path.isdir(objects_root):
+        for prefix in os.listdir(objects_root):
+            prefix_dir = os.path.join(objects_root, prefix)
+            for name in os.listdir(prefix_dir):
+                if name not in referenced:
+                    os.remove(os.path.join(prefix_dir, name))
+                    removed += 1
+    return removed
+
+
+def backup_shards(archive_folder, target_folder, pages=DEFAULT_PAGES_PER_STEP, sleep=DEFAULT_STEP_SLEEP):
+    """Kópie archivovaných rokov; vráti {názov súboru: sha256}"""
+    shards = {}
+    if not archive_folder or not os.path.isdir(archive_folder):
+        return shards
+    for name in sorted(os.listdir(archive_folder)):
+        if not SHARD_RE.match(name):
+            continue
+        os.makedirs(target_folder, exist_ok=True)
+        target = os.path.join(target_folder, name)
+        backup_database(os.path.join(archive_folder, name), target, pages, sleep)
+        shards[name] = file_sha256(target)
+    return shards
+
+
+def run_backup(database_path, upload_folder, backup_folder, keep=DEFAULT_KEEP,
+               pages=DEFAULT_PAGES_PER_STEP, sleep=DEFAULT_STEP_SLEEP, archive_folder=None):
+    """Jeden snapshot: databáza + archivované roky + inkrementálne prílohy + rotácia; vráti súhrn"""
+    started = time.monotonic()
+    os.makedirs(backup_folder, exist_ok=True)
+
+    # Iba jeden proces naraz (viac workerov zdieľa priečinok záloh)
+    lock = open(os.path.join(backup_folder, '.lock'), 'w')
+    try:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return None
+
+        snapshots = list_snapshots(backup_folder)
+        previous = load_manifest(snapshots[-1]) if snapshots else None
+
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        snapshot_dir = os.path.join(backup_folder, 'snapshots', stamp)
+        if os.path.exists(snapshot_dir):
+            return None  # snapshot z tej istej sekundy už existuje
+        # Skladá sa bokom; pri chybe ostane iba priečinok bez manifestu, ktorý zmaže prune
+        work_dir = os.path.join(backup_folder, 'snapshots', f'.{stamp}.tmp')
+        shutil.rmtree(work_dir, ignore_errors=True)
+        os.makedirs(work_dir)
+
+        backup_database(database_path, os.path.join(work_dir, DATABASE_NAME), pages, sleep)
+        shards = backup_shards(archive_folder, os.path.join(work_dir, 'archive'), pages, sleep)
+        files = build_manifest(upload_folder, previous)
+        copied = store_objects(backup_folder, upload_folder, files)
+
+        manifest = {
+            'created_at': datetime.now().isoformat(),
+            'database': DATABASE_NAME,
+            'database_sha256': file_sha256(os.path.join(work_dir, DATABASE_NAME)),
+            'archive': shards,
+            'files': files,
+        }
+        with open(os.path.join(work_dir, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=1)
+        # Až kompletný snapshot dostane svoje meno
+        os.replace(work_dir, snapshot_dir)
+
+        removed = prune(backup_folder, keep)
+        return {
+            'snapshot': snapshot_dir,
+            'files': len(files),
+            'shards': len(shards),
+            'copied': copied,
+            'removed_objects': removed,
+            'seconds': round(time.monotonic() - started, 3),
+        }
+    finally:
+        lock.close()
+
+
+def backup_app(app):
+    """Záloha podľa konfigurácie aplikácie"""
+    from app.models import db
+    with app.app_context():
+        database_path = db.engine.url.database
+    return run_backup(
+        database_path,
+        app.config['UPLOAD_FOLDER'],
+        app.config['DENNIK_BACKUP_FOLDER'],
+        keep=app.config['DENNIK_BACKUP_KEEP'],
+        archive_folder=app.config.get('DENNIK_ARCHIVE_FOLDER'),
+    )
+
+
+class BackupService:
+    """Vlákno na pozadí, ktoré robí zálohu každých `interval` sekúnd"""
+
+    def __init__(self, app, interval):
+        self.app = app
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='dennik-backup', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                result = backup_app(self.app)
+                if result:
+                    print(f"[BACKUP] {result['snapshot']} ({result['copied']} nových súborov, "
+                          f"{result['seconds']} s)", file=sys.stderr)
+            except Exception as e:
+                print(f'[BACKUP] Záloha zlyhala: {e}', file=sys.stderr)
+
+
+def init_backup(app):
+    app.config.setdefault('DENNIK_BACKUP_FOLDER', os.path.join(app.instance_path, 'backups'))
+    app.config.setdefault('DENNIK_BACKUP_KEEP', int(os.environ.get('DENNIK_BACKUP_KEEP', DEFAULT_KEEP)))
+    app.config.setdefault('DENNIK_BACKUP_INTERVAL', int(os.environ.get('DENNIK_BACKUP_INTERVAL', '0')))
+    interval = app.config['DENNIK_BACKUP_INTERVAL']
+    if interval > 0:
+        service = BackupService(app, interval)
+        app.extensions['dennik_backup'] = service
+        service.start()
@@ -0,0 +1,103 @@
+"""Cache odvodených dát podľa verzie dát
+
+Každý commit, ktorý zmení záznamy, kategórie alebo prílohy, zvýši
+počítadlo 'data_version' v tabuľke Settings v rámci tej istej transakcie.
+Kľúče v cache obsahujú verziu, takže zmena dát staré hodnoty
+automaticky zneplatní - aj keď beží viac workerov.
+"""
+import threading
+from collections import OrderedDict
+from flask import current_app
+from sqlalchemy import event
+from app.models import db, Entry, Category, Attachment, Settings
+
+DATA_VERSION_KEY = 'data_version'
+TRACKED_MODELS = (Entry, Category, Attachment)
+DEFAULT_CACHE_SIZE = 256
+
+
+class VersionedCache:
+    """Jednoduchá LRU cache (thread-safe) pre výsledky závislé od verzie dát"""
+
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                return self._data[key]
+        value = compute()
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+def data_version():
+    """Aktuálna verzia dát (0 ak sa ešte nič nezmenilo)"""
+    value = db.session.query(Settings.value).filter(Settings.key == DATA_VERSION_KEY).scalar()
+    return int(value) if value else 0
+
+
+def cached(key, compute):
+    """Vráti hodnotu z cache aplikácie pre (verzia dát, key), prípadne ju vypočíta"""
+    cache = current_app.extensions['dennik_cache']
+    return cache.get_or_compute((data_version(),) + tuple(key), compute)
+
+
+def _touches_tracked(session):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, TRACKED_MODELS):
+            return True
+    return False
+
+
+def mark_data_changed(session=None):
+    """Pre hromadné zmeny mimo ORM (query.delete, INSERT ... SELECT)"""
+    (session or db.session).info['dennik_data_changed'] = True
+
+
+def _mark_changes(session, flush_context, instances):
+    if _touches_tracked(session):
+        session.info['dennik_data_changed'] = True
+
+
+def _bump_version(session):
+    # before_commit beží pred posledným flushom - skontroluj aj neuložené zmeny
+    changed = session.info.pop('dennik_data_changed', False)
+    if not (changed or _touches_tracked(session)):
+        return
+    settings = Settings.__table__
+    connection = session.connection()
+    updated = connection.execute(
+        settings.update()
+        .where(settings.c.key == DATA_VERSION_KEY)
+        .values(value=db.cast(db.func.coalesce(db.cast(settings.c.value, db.Integer), 0) + 1, db.Text))
+    )
+    if updated.rowcount == 0:
+        connection.execute(settings.insert().values(key=DATA_VERSION_KEY, value='1'))
+
+
+def _forget_changes(session):
+    session.info.pop('dennik_data_changed', None)
+
+
+def init_cache(app):
+    """Zaregistruje cache aplikácie a počítadlo verzie dát"""
+    app.extensions['dennik_cache'] = VersionedCache(app.config.get('DENNIK_CACHE_SIZE', DEFAULT_CACHE_SIZE))
+    if not event.contains(db.session, 'before_flush', _mark_changes):
+        event.listen(db.session, 'before_flush', _mark_changes)
+        event.listen(db.session, 'before_commit', _bump_version)
+        event.listen(db.session, 'after_rollback', _forget_changes)
@@ -0,0 +1,89 @@
+"""Transparentná kompresia dlhých textov záznamov
+
+Obsah nad COMPRESS_THRESHOLD bajtov sa ukladá ako BLOB so značkou
+formátu (MARKER + kód algoritmu) a zlib dátami; kratší obsah ostáva
+obyčajný text, takže staré riadky netreba meniť. Dekompresia prebieha
+až pri prístupe k Entry.content (t.j. pri serializácii celého textu).
+
+Pre SQL (vyhľadávanie) je na každom SQLite spojení registrovaná
+funkcia dennik_body(x), ktorá vráti dekomprimovaný text.
+"""
+import zlib
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+MARKER = b'\x00dz'
+ZLIB = b'1'
+COMPRESS_THRESHOLD = 4096
+COMPRESS_LEVEL = 6
+MIN_SAVING = 0.9  # komprimovať iba ak výsledok ušetrí aspoň 10 %
+
+
+def compress_body(text):
+    """str -> str (krátky text) alebo bytes so značkou formátu"""
+    if text is None:
+        return None
+    encoded = text.encode('utf-8')
+    if len(encoded) < COMPRESS_THRESHOLD:
+        return text
+    packed = zlib.compress(encoded, COMPRESS_LEVEL)
+    if len(packed) + len(MARKER) + 1 > len(encoded) * MIN_SAVING:
+        return text
+    return MARKER + ZLIB + packed
+
+
+def decompress_body(value):
+    """Uložená hodnota -> str"""
+    if value is None or isinstance(value, str):
+        return value
+    value = bytes(value)
+    if not value.startswith(MARKER):
+        return value.decode('utf-8')
+    algorithm = value[len(MARKER):len(MARKER) + 1]
+    if algorithm == ZLIB:
+        return zlib.decompress(value[len(MARKER) + 1:]).decode('utf-8')
+    raise ValueError(f'Neznámy formát komprimovaného textu: {algorithm!r}')
+
+
+def is_compressed(value):
+    return isinstance(value, (bytes, memoryview)) and bytes(value[:len(MARKER)]) == MARKER
+
+
+def _register_functions(dbapi_connection, connection_record):
+    create_function = getattr(dbapi_connection, 'create_function', None)
+    if create_function is not None:
+        create_function('dennik_body', 1, decompress_body, deterministic=True)
+
+
+def init_compression():
+    """SQL funkcia dennik_body pre všetky enginy (hlavný, čitatelia, shardy)"""
+    if not event.contains(Engine, 'connect', _register_functions):
+        event.listen(Engine, 'connect', _register_functions)
+
+
+def compress_existing(db, batch_size=200):
+    """Migrácia: skomprimuje existujúce dlhé texty; vráti počet zmenených riadkov"""
+    entry = db.metadata.tables['entry']
+    changed = 0
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            db.select(entry.c.id, entry.c.content)
+            .where(entry.c.id > last_id)
+            .where(db.func.typeof(entry.c.content) == 'text')
+            .where(db.func.length(entry.c.content) >= COMPRESS_THRESHOLD // 4)
+            .order_by(entry.c.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        for row_id, content in rows:
+            packed = compress_body(content)
+            if packed is not content:
+                db.session.execute(entry.update().where(entry.c.id == row_id).values(content=packed))
+                changed += 1
+        last_id = rows[-1][0]
+        db.session.commit()
+    # Uvoľní spojenie zapisovača (pool má iba jedno)
+    db.session.commit()
+    return changed
@@ -0,0 +1,125 @@
+"""Smerovanie čítaní a zápisov na samostatné SQLite enginy
+
+GET/HEAD requesty čítajú cez pool read-only spojení (mode=ro,
+PRAGMA query_only), zápisy idú cez jedno dedikované spojenie zapisovača.
+Databáza beží vo WAL režime, takže čitatelia nečakajú na prebiehajúci
+zápis a zápisy sa navzájom serializujú na jednom spojení.
+
+Mimo request kontextu (vlákna na pozadí, skripty) ide db.session vždy
+cez zapisovača. Jediné spojenie zapisovača nesmie držať dlhé čítanie -
+kým beží, každý zápis čaká. Kód na pozadí preto číta cez
+reader_session() a db.session používa iba na krátke dotazy a zápisy
+ukončené commitom.
+"""
+import time
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session as PlainSession
+from sqlalchemy.pool import QueuePool
+
+READER_BIND = 'reader'
+READ_METHODS = ('GET', 'HEAD')
+DEFAULT_READ_POOL_SIZE = 8
+BUSY_TIMEOUT_SECONDS = 30
+
+
+class RoutingSession(Session):
+    """Session, ktorá počas GET requestov číta z read-only enginu"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and self._reads_from_replica():
+            return self._db.engines[READER_BIND]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _reads_from_replica(self):
+        if READER_BIND not in self._db.engines or not has_request_context():
+            return False
+        # Ak už session niečo mení, čítania musia vidieť neuložené zmeny zapisovača
+        if self.new or self.dirty or self.deleted:
+            return False
+        return request.method in READ_METHODS
+
+
+class WriterPool(QueuePool):
+    """Pool zapisovača, ktorý meria čakanie na (jediné) spojenie
+
+    Čakanie sa pripíše requestu iba ak ho meria recorder (g.dennik_lock_wait).
+    """
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            if has_request_context() and 'dennik_lock_wait' in g:
+                g.dennik_lock_wait += time.perf_counter() - started
+
+
+@contextmanager
+def reader_session():
+    """Read-only session pre kód mimo requestu (bez bindu čitateľov cez hlavný engine)"""
+    from app.models import db
+    session = PlainSession(bind=db.engines.get(READER_BIND, db.engine))
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+def reader_url(database_uri):
+    """URI read-only spojenia pre súborovú SQLite databázu (None pre :memory:)"""
+    url = make_url(database_uri)
+    if not url.drivername.startswith('sqlite') or url.database in (None, '', ':memory:'):
+        return None
+    if url.query.get('uri'):
+        return str(url.update_query_dict({'mode': 'ro'}))
+    return str(url.set(database=f'file:{url.database}').update_query_dict({'mode': 'ro', 'uri': 'true'}))
+
+
+def configure_routing(app):
+    """Pred db.init_app: bind pre čitateľov a pool s jedným spojením zapisovača"""
+    url = reader_url(app.config['SQLALCHEMY_DATABASE_URI'])
+    if url is None or not app.config.get('DENNIK_READ_REPLICA', True):
+        return
+    binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+    binds.setdefault(READER_BIND, {
+        'url': url,
+        'pool_size': app.config.get('DENNIK_READ_POOL_SIZE', DEFAULT_READ_POOL_SIZE),
+        'max_overflow': 0,
+        'connect_args': {'timeout': BUSY_TIMEOUT_SECONDS},
+    })
+    app.config['SQLALCHEMY_BINDS'] = binds
+    options = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    options.setdefault('poolclass', WriterPool)
+    options.setdefault('pool_size', 1)
+    options.setdefault('max_overflow', 0)
+    options.setdefault('pool_timeout', BUSY_TIMEOUT_SECONDS)
+    options.setdefault('connect_args', {'timeout': BUSY_TIMEOUT_SECONDS})
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+
+def _on_writer_connect(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.close()
+
+
+def _on_reader_connect(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA query_only=1')
+    cursor.close()
+
+
+def install_pragmas(db):
+    """V kontexte aplikácie po db.init_app: PRAGMA pre nové spojenia"""
+    if READER_BIND not in db.engines:
+        return
+    if not event.contains(db.engine, 'connect', _on_writer_connect):
+        event.listen(db.engine, 'connect', _on_writer_connect)
+    if not event.contains(db.engines[READER_BIND], 'connect', _on_reader_connect):
+        event.listen(db.engines[READER_BIND], 'connect', _on_reader_connect)
@@ -0,0 +1,244 @@
+"""Extrakcia textu z príloh pre vyhľadávanie
+
+Extrakcia beží v lokálnom process poole mimo requestu - upload iba
+naplánuje úlohu a hneď odpovie. Výsledok sa uloží do AttachmentText;
+text sa extrahuje znova len vtedy, keď sa zmení veľkosť alebo mtime
+uloženého súboru.
+
+PDF používa pypdf (ak je nainštalované) alebo nástroj pdftotext,
+MSG používa extract_msg; bez nich sa tieto typy preskočia.
+"""
+import os
+import re
+import shutil
+import subprocess
+import sys
+import zipfile
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from email import policy
+from email.parser import BytesParser
+from xml.etree import ElementTree
+
+EXTRACTABLE_EXTENSIONS = {'pdf', 'txt', 'eml', 'msg', 'docx'}
+MAX_TEXT_CHARS = 1_000_000
+DEFAULT_WORKERS = 2
+
+WORD_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+TAG_RE = re.compile(r'<[^>]+>')
+
+
+class ExtractionUnavailable(Exception):
+    """Pre daný typ chýba voliteľná knižnica alebo nástroj"""
+
+
+# === Extraktory (bežia v pracovnom procese) ===
+
+def _decode(data):
+    for encoding in ('utf-8', 'cp1250'):
+        try:
+            return data.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return data.decode('latin-1')
+
+
+def _extract_txt(path):
+    with open(path, 'rb') as f:
+        return _decode(f.read(MAX_TEXT_CHARS * 4))
+
+
+def _extract_eml(path):
+    with open(path, 'rb') as f:
+        message = BytesParser(policy=policy.default).parse(f)
+    parts = [f"{name}: {message[name]}" for name in ('Subject', 'From', 'To') if message[name]]
+    for part in message.walk():
+        if part.is_multipart() or part.get_content_disposition() == 'attachment':
+            continue
+        content_type = part.get_content_type()
+        if content_type not in ('text/plain', 'text/html'):
+            continue
+        try:
+            body = part.get_content()
+        except (LookupError, UnicodeDecodeError):
+            body = _decode(part.get_payload(decode=True) or b'')
+        if content_type == 'text/html':
+            body = TAG_RE.sub(' ', body)
+        parts.append(body)
+    return '\n'.join(parts)
+
+
+def _extract_docx(path):
+    with zipfile.ZipFile(path) as docx:
+        root = ElementTree.fromstring(docx.read('word/document.xml'))
+    paragraphs = []
+    for paragraph in root.iter(f'{WORD_NS}p'):
+        text = ''.join(node.text or '' for node in paragraph.iter(f'{WORD_NS}t'))
+        if text:
+            paragraphs.append(text)
+    return '\n'.join(paragraphs)
+
+
+def _extract_pdf(path):
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        PdfReader = None
+    if PdfReader is not None:
+        reader = PdfReader(path)
+        return '\n'.join(page.extract_text() or '' for page in reader.pages)
+    if shutil.which('pdftotext'):
+        result = subprocess.run(['pdftotext', '-q', '-enc', 'UTF-8', path, '-'],
+                                capture_output=True, timeout=120)
+        return _decode(result.stdout)
+    raise ExtractionUnavailable('pypdf ani pdftotext nie sú dostupné')
+
+
+def _extract_msg(path):
+    try:
+        import extract_msg
+    except ImportError:
+        raise ExtractionUnavailable('extract_msg nie je nainštalované')
+    message = extract_msg.Message(path)
+    try:
+        return '\n'.join(filter(None, [message.subject, message.sender, message.to, message.body]))
+    finally:
+        message.close()
+
+
+EXTRACTORS = {
+    'txt': _extract_txt,
+    'eml': _extract_eml,
+    'docx': _extract_docx,
+    'pdf': _extract_pdf,
+    'msg': _extract_msg,
+}
+
+
+def extract_text(path, extension):
+    """Vráti (text, chyba) - volá sa v pracovnom procese"""
+    try:
+        text = EXTRACTORS[extension](path)
+    except ExtractionUnavailable as e:
+        return None, str(e)
+    except Exception as e:
+        return None, f'{type(e).__name__}: {e}'[:255]
+    text = re.sub(r'\s+', ' ', text or '').strip()
+    return text[:MAX_TEXT_CHARS], None
+
+
+# === Plánovanie (beží v procese aplikácie) ===
+
+def _file_extension(filename):
+    return filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
+
+
+class TextExtractor:
+    """Process pool pre extrakciu textu; výsledky ukladá v kontexte aplikácie"""
+
+    def __init__(self, app):
+        self.app = app
+        self.max_workers = app.config.get('DENNIK_EXTRACT_WORKERS', DEFAULT_WORKERS)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                # forkserver - deti nededia vlákna ani SQLite spojenia servera
+                method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context(method)
+                )
+            return self._executor
+
+    def _discard(self, executor):
+        """Rozbitý pool (napr. OOM kill pracovného procesu) zahodiť - ďalšia úloha založí nový"""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False)
+
+    def _submit(self, *args):
+        executor = self._pool()
+        try:
+            return executor, executor.submit(*args)
+        except BrokenProcessPool:
+            self._discard(executor)
+            executor = self._pool()
+            return executor, executor.submit(*args)
+
+    def needs_extraction(self, attachment, file_path):
+        """True ak príloha nemá text alebo sa súbor od extrakcie zmenil"""
+        if _file_extension(attachment.filename) not in EXTRACTABLE_EXTENSIONS:
+            return False
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return False
+        current = attachment.text
+        return (current is None or current.file_size != stat.st_size
+                or current.file_mtime != stat.st_mtime)
+
+    def schedule(self, attachment, file_path):
+        """Naplánuje extrakciu (neblokuje) - vráti True ak bola úloha odoslaná"""
+        if not self.needs_extraction(attachment, file_path):
+            return False
+        stat = os.stat(file_path)
+        executor, future = self._submit(extract_text, file_path, _file_extension(attachment.filename))
+        attachment_id = attachment.id
+        future.add_done_callback(
+            lambda done: self._store(attachment_id, stat.st_size, stat.st_mtime, done, executor)
+        )
+        return True
+
+    def _store(self, attachment_id, file_size, file_mtime, future, executor=None):
+        from app.models import db, Attachment, AttachmentText
+        try:
+            text, error = future.result()
+        except BrokenProcessPool as e:
+            if executor is not None:
+                self._discard(executor)
+            text, error = None, f'{type(e).__name__}: {e}'[:255]
+        except Exception as e:  # spadnutý pracovný proces
+            text, error = None, f'{type(e).__name__}: {e}'[:255]
+        with self.app.app_context():
+            try:
+                if db.session.get(Attachment, attachment_id) is None:
+                    return  # príloha medzitým zmazaná
+                row = db.session.get(AttachmentText, attachment_id)
+                if row is None:
+                    row = AttachmentText(attachment_id=attachment_id)
+                    db.session.add(row)
+                row.text = text
+                row.error = error
+                row.file_size = file_size
+                row.file_mtime = file_mtime
+                row.extracted_at = datetime.utcnow()
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                print(f'[EXTRACT] Uloženie textu prílohy {attachment_id} zlyhalo: {e}', file=sys.stderr)
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+def init_extraction(app):
+    app.extensions['dennik_extractor'] = TextExtractor(app)
+
+
+def schedule_extraction(app, attachment, file_path):
+    """Naplánuje extrakciu textu prílohy; chyby plánovania nikdy neprerušia request"""
+    try:
+        return app.extensions['dennik_extractor'].schedule(attachment, file_path)
+    except Exception as e:
+        print(f'[EXTRACT] Naplánovanie extrakcie zlyhalo: {e}', file=sys.stderr)
+        return False
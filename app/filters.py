@@ -0,0 +1,249 @@
+"""Kompilátor filtrov pre /api/entries
+
+Parsovanie (parse_entry_filters) je oddelené od zostavenia query
+(apply_entry_filters), takže obe časti sa dajú skúšať samostatne.
+Každý tvar filtra mieri na konkrétny index definovaný v models.py.
+"""
+from datetime import date, datetime, timedelta
+from sqlalchemy import and_, or_, desc, asc
+from app.models import db, Entry, Category, Attachment, AttachmentText
+
+
+class FilterError(ValueError):
+    """Neplatná hodnota filtra - route ju vráti ako 400"""
+
+
+# Triedenie -> stĺpce (každá možnosť má zodpovedajúci index)
+SORT_OPTIONS = {
+    'date_desc': (desc(Entry.date), desc(Entry.time)),        # idx_entry_date_time
+    'date_asc': (asc(Entry.date), asc(Entry.time)),           # idx_entry_date_time
+    'created_desc': (desc(Entry.created_at),),                # idx_entry_created_at
+    'created_asc': (asc(Entry.created_at),),                  # idx_entry_created_at
+    'updated_desc': (desc(Entry.updated_at),),                # idx_entry_updated_at
+    'updated_asc': (asc(Entry.updated_at),),                  # idx_entry_updated_at
+    'title': (asc(Entry.title),),                             # idx_entry_title
+}
+DEFAULT_SORT = 'date_desc'
+
+
+def _nullable(value):
+    return (value is not None, value)
+
+
+# Rovnaké poradie v Pythone - pri spájaní stránok z viacerých databáz (shardov)
+SORT_KEYS = {
+    'date_desc': (lambda e: (e.date, e.time), True),
+    'date_asc': (lambda e: (e.date, e.time), False),
+    'created_desc': (lambda e: _nullable(e.created_at), True),
+    'created_asc': (lambda e: _nullable(e.created_at), False),
+    'updated_desc': (lambda e: _nullable(e.updated_at), True),
+    'updated_asc': (lambda e: _nullable(e.updated_at), False),
+    'title': (lambda e: e.title, False),
+}
+MAX_PER_PAGE = 200
+
+TRUE_VALUES = {'1', 'true', 'yes', 'on'}
+FALSE_VALUES = {'0', 'false', 'no', 'off'}
+
+
+def _parse_int(value, name):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise FilterError(f'Neplatná hodnota parametra {name}')
+
+
+def _parse_date(value, name):
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise FilterError(f'Neplatný formát dátumu v parametri {name} (očakávané RRRR-MM-DD)')
+
+
+def _parse_datetime(value, name, upper=False):
+    """Dátum alebo dátum s časom; samotný dátum pri hornej hranici zahŕňa celý deň"""
+    try:
+        if len(value) == 10:
+            day = date.fromisoformat(value)
+            moment = datetime(day.year, day.month, day.day)
+            return moment + timedelta(days=1) if upper else moment
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise FilterError(f'Neplatný formát času v parametri {name}')
+
+
+def _parse_bool(value, name):
+    lowered = value.lower()
+    if lowered in TRUE_VALUES:
+        return True
+    if lowered in FALSE_VALUES:
+        return False
+    raise FilterError(f'Neplatná hodnota parametra {name}')
+
+
+def _parse_id_list(args):
+    """category_id (aj opakovane) a category_ids=1,2,3"""
+    raw = []
+    if hasattr(args, 'getlist'):
+        raw.extend(args.getlist('category_id'))
+    elif args.get('category_id'):
+        raw.append(args.get('category_id'))
+    if args.get('category_ids'):
+        raw.extend(str(args.get('category_ids')).split(','))
+    ids = []
+    for value in raw:
+        value = str(value).strip()
+        if value:
+            category_id = _parse_int(value, 'category_ids')
+            if category_id not in ids:
+                ids.append(category_id)
+    return ids
+
+
+def parse_entry_filters(args):
+    """Prevod query parametrov (request.args alebo dict) na normalizovaný dict filtrov"""
+    filters = {}
+
+    if args.get('year'):
+        filters['year'] = _parse_int(args.get('year'), 'year')
+        if not 1 <= filters['year'] <= 9998:
+            raise FilterError('Neplatná hodnota parametra year')
+    if args.get('month') and 'year' in filters:
+        month = _parse_int(args.get('month'), 'month')
+        if not 1 <= month <= 12:
+            raise FilterError('Neplatná hodnota parametra month')
+        filters['month'] = month
+
+    if args.get('date_from'):
+        filters['date_from'] = _parse_date(args.get('date_from'), 'date_from')
+    if args.get('date_to'):
+        filters['date_to'] = _parse_date(args.get('date_to'), 'date_to')
+    if 'date_from' in filters and 'date_to' in filters and filters['date_from'] > filters['date_to']:
+        raise FilterError('date_from musí byť pred date_to')
+
+    for field in ('created', 'updated'):
+        if args.get(f'{field}_from'):
+            filters[f'{field}_from'] = _parse_datetime(args.get(f'{field}_from'), f'{field}_from')
+        if args.get(f'{field}_to'):
+            filters[f'{field}_to'] = _parse_datetime(args.get(f'{field}_to'), f'{field}_to', upper=True)
+
+    category_ids = _parse_id_list(args)
+    if category_ids:
+        filters['category_ids'] = category_ids
+
+    if args.get('has_attachments'):
+        filters['has_attachments'] = _parse_bool(args.get('has_attachments'), 'has_attachments')
+    if args.get('attachment_type'):
+        filters['attachment_type'] = args.get('attachment_type').strip().lower()
+        if filters.get('has_attachments') is False:
+            raise FilterError('attachment_type sa nedá kombinovať s has_attachments=0')
+
+    search = (args.get('search') or '').strip()
+    if search:
+        filters['search'] = search
+
+    sort = args.get('sort') or DEFAULT_SORT
+    if sort not in SORT_OPTIONS:
+        raise FilterError(f'Neznáme triedenie: {sort}')
+    filters['sort'] = sort
+
+    page = _parse_int(args.get('page') or 1, 'page')
+    per_page = _parse_int(args.get('per_page') or 20, 'per_page')
+    filters['page'] = max(page, 1)
+    filters['per_page'] = min(max(per_page, 1), MAX_PER_PAGE)
+
+    return filters
+
+
+def expand_category_ids(category_ids):
+    """Pridá podkategórie ku každej zadanej kategórii (hierarchia má max. 2 úrovne)"""
+    if not category_ids:
+        return []
+    child_ids = db.session.query(Category.id).filter(Category.parent_id.in_(category_ids)).all()
+    expanded = list(category_ids)
+    for (child_id,) in child_ids:
+        if child_id not in expanded:
+            expanded.append(child_id)
+    return expanded
+
+
+def _like_escape(value):
+    """Hodnota od používateľa ako doslovný text v LIKE (%, _ a \\ bez zástupného významu)"""
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _attachment_condition(filters):
+    """EXISTS nad prílohami - korelované cez idx_attachment_entry_mime"""
+    conditions = [Attachment.entry_id == Entry.id]
+    mime = filters.get('attachment_type')
+    if mime:
+        if mime.endswith('/*'):
+            conditions.append(Attachment.mime_type.like(_like_escape(mime[:-1]) + '%', escape='\\'))
+        elif '/' in mime:
+            conditions.append(Attachment.mime_type == mime)
+        else:
+            # Prípona (napr. "pdf") - porovnanie s pôvodným názvom súboru
+            conditions.append(Attachment.original_filename.ilike(f'%.{_like_escape(mime)}', escape='\\'))
+    return db.session.query(Attachment.id).filter(and_(*conditions)).exists()
+
+
+def apply_entry_filters(query, filters):
+    """Aplikuje normalizované filtre na query nad Entry (bez paginácie)"""
+    # Rok/mesiac ako rozsah dátumov - rovnaký index pokryje filter aj triedenie
+    if 'year' in filters:
+        year = filters['year']
+        if 'month' in filters:
+            month = filters['month']
+            first_day = date(year, month, 1)
+            next_first = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+        else:
+            first_day = date(year, 1, 1)
+            next_first = date(year + 1, 1, 1)
+        query = query.filter(Entry.date >= first_day, Entry.date < next_first)
+
+    if 'date_from' in filters:
+        query = query.filter(Entry.date >= filters['date_from'])
+    if 'date_to' in filters:
+        query = query.filter(Entry.date <= filters['date_to'])
+
+    if 'created_from' in filters:
+        query = query.filter(Entry.created_at >= filters['created_from'])
+    if 'created_to' in filters:
+        query = query.filter(Entry.created_at < filters['created_to'])
+    if 'updated_from' in filters:
+        query = query.filter(Entry.updated_at >= filters['updated_from'])
+    if 'updated_to' in filters:
+        query = query.filter(Entry.updated_at < filters['updated_to'])
+
+    if filters.get('category_ids'):
+        query = query.filter(Entry.category_id.in_(expand_category_ids(filters['category_ids'])))
+
+    if 'attachment_type' in filters:
+        query = query.filter(_attachment_condition(filters))
+    elif 'has_attachments' in filters:
+        exists = _attachment_condition(filters)
+        query = query.filter(exists if filters['has_attachments'] else ~exists)
+
+    if filters.get('search'):
+        search_term = f"%{filters['search']}%"
+        # Text extrahovaný z príloh sa prehľadáva spolu s obsahom záznamu
+        in_attachments = db.session.query(Attachment.id).join(
+            AttachmentText, AttachmentText.attachment_id == Attachment.id
+        ).filter(
+            Attachment.entry_id == Entry.id,
+            AttachmentText.text.ilike(search_term)
+        ).exists()
+        query = query.filter(
+            or_(
+                Entry.title.ilike(search_term),
+                Entry.content_sql().ilike(search_term),
+                in_attachments
+            )
+        )
+
+    return query.order_by(*SORT_OPTIONS[filters.get('sort', DEFAULT_SORT)])
+
+
+def compile_entry_query(filters):
+    """Query nad Entry pre normalizované filtre"""
+    return apply_entry_filters(Entry.query, filters)
@@ -0,0 +1,304 @@
+"""Viac denníkov v jednom procese, smerovaných podľa prefixu URL
+
+    /                -> hlavný denník (dennik.db, uploads/ ako doteraz)
+    /j/<meno>/...    -> denník <meno> v <DENNIK_JOURNALS_FOLDER>/<meno>/
+
+Každý denník má vlastnú SQLite databázu, priečinok príloh, archív,
+zálohy aj cache - je to samostatná Flask aplikácia z create_app s
+vlastným instance priečinkom. Spoločné sú iba limity súbežnosti (disk
+je jeden). Otvorené denníky drží LRU s najviac DENNIK_JOURNALS_MAX
+položkami; denník bez requestu dlhšie ako DENNIK_JOURNALS_IDLE sekúnd
+sa zatvorí (enginy, vlákna na pozadí, cache) a pri ďalšom requeste sa
+znova otvorí. Zatvára sa iba denník, ktorý práve nič nerobí.
+
+Nový denník sa zakladá cez create_journal.py (alebo automaticky pri
+prvom requeste, ak je DENNIK_JOURNALS_AUTOCREATE zapnuté).
+"""
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from werkzeug.wsgi import ClosingIterator
+
+JOURNAL_PREFIX = '/j/'
+JOURNAL_NAME_RE = re.compile(r'^[a-z0-9][a-z0-9_-]{0,39}$')
+JOURNAL_PATH_RE = re.compile(r'^/j/([^/]+)(/.*)?$')
+DATABASE_NAME = 'dennik.db'
+DEFAULT_MAX_OPEN = 8
+DEFAULT_IDLE_SECONDS = 900
+DEFAULT_READ_POOL_SIZE = 2
+# Nastavenia, ktoré patria konkrétnemu denníku a nededia sa z hlavného
+PER_JOURNAL_KEYS = {
+    'SQLALCHEMY_DATABASE_URI', 'SQLALCHEMY_BINDS', 'SQLALCHEMY_ENGINE_OPTIONS', 'UPLOAD_FOLDER',
+    'DENNIK_ARCHIVE_FOLDER', 'DENNIK_BACKUP_FOLDER', 'DENNIK_PROFILE_FOLDER', 'DENNIK_READ_POOL_SIZE',
+}
+
+
+class JournalError(Exception):
+    """Neplatné meno alebo neexistujúci denník"""
+
+
+def validate_name(name):
+    if not JOURNAL_NAME_RE.match(name or ''):
+        raise JournalError('Meno denníka môže obsahovať iba malé písmená, číslice, - a _ (najviac 40 znakov)')
+    return name
+
+
+def journal_folder(root_app, name):
+    return os.path.join(root_app.config['DENNIK_JOURNALS_FOLDER'], validate_name(name))
+
+
+def journal_exists(root_app, name):
+    return os.path.isfile(os.path.join(journal_folder(root_app, name), DATABASE_NAME))
+
+
+def list_journals(root_app):
+    folder = root_app.config['DENNIK_JOURNALS_FOLDER']
+    if not os.path.isdir(folder):
+        return []
+    return sorted(name for name in os.listdir(folder)
+                  if JOURNAL_NAME_RE.match(name) and journal_exists(root_app, name))
+
+
+def journal_config(root_app, name):
+    """Konfigurácia create_app pre denník: vlastné súbory, ostatné zdedené z hlavného"""
+    folder = os.path.abspath(journal_folder(root_app, name))
+    config = {key: value for key, value in root_app.config.items()
+              if key.startswith('DENNIK_') and key not in PER_JOURNAL_KEYS}
+    config.update({
+        'SECRET_KEY': root_app.config['SECRET_KEY'],
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{os.path.join(folder, DATABASE_NAME)}',
+        'UPLOAD_FOLDER': os.path.join(folder, 'uploads'),
+        'DENNIK_INSTANCE_PATH': os.path.join(folder, 'instance'),
+        'DENNIK_READ_POOL_SIZE': root_app.config['DENNIK_JOURNALS_READ_POOL_SIZE'],
+        'DENNIK_JOURNAL_NAME': name,
+        # Limity súbežnosti platia pre celý proces, nie pre každý denník zvlášť
+        'DENNIK_LIMITS_FOLDER': root_app.config['DENNIK_LIMITS_FOLDER'],
+    })
+    return config
+
+
+def create_journal(root_app, name):
+    """Založí denník (priečinky + prázdna databáza so schémou); vráti jeho priečinok"""
+    from app import create_app, shutdown_app
+    folder = journal_folder(root_app, name)
+    os.makedirs(os.path.join(folder, 'uploads'), exist_ok=True)
+    app = create_app(journal_config(root_app, name))
+    shutdown_app(app)
+    return folder
+
+
+class _OpenJournal:
+    def __init__(self, app):
+        self.app = app
+        self.active = 0
+        self.last_used = time.monotonic()
+
+    def busy(self):
+        """Bežiaci request, obnova zo zálohy, kontrola príloh alebo úloha - nezatvárať
+
+        Zatvorený denník nemá workera, takže drží otvorený aj úloha, ktorá
+        je splatná teraz alebo čoskoro (vzdialenejšie spracuje worker po
+        ďalšom otvorení denníka).
+        """
+        restore_lock = self.app.extensions.get('dennik_restore_lock')
+        scrub = self.app.extensions.get('dennik_scrub')
+        tasks = self.app.extensions.get('dennik_tasks')
+        return (self.active > 0
+                or (restore_lock is not None and restore_lock.locked())
+                or (scrub is not None and scrub.running)
+                or (tasks is not None and (tasks.running > 0 or tasks.pending_soon())))
+
+
+class JournalPool:
+    """LRU otvorených denníkov s uzatváraním nečinných"""
+
+    def __init__(self, root_app):
+        self.root_app = root_app
+        self.max_open = max(1, root_app.config['DENNIK_JOURNALS_MAX'])
+        self.idle = root_app.config['DENNIK_JOURNALS_IDLE']
+        self.opened = 0
+        self.evicted = 0
+        self._journals = OrderedDict()
+        self._lock = threading.Lock()
+        self._opening = {}
+        self._reaper = None
+        self._stop = threading.Event()
+
+    def checkout(self, name):
+        """Aplikácia denníka s rezervovaným requestom (vrátiť cez release)"""
+        validate_name(name)
+        while True:
+            with self._lock:
+                journal = self._journals.get(name)
+                if journal is not None:
+                    journal.active += 1
+                    journal.last_used = time.monotonic()
+                    self._journals.move_to_end(name)
+                    return journal.app
+                opening = self._opening.get(name)
+                if opening is None:
+                    opening = self._opening[name] = threading.Event()
+                    break
+            # Ten istý denník práve otvára iné vlákno
+            opening.wait()
+
+        try:
+            journal = _OpenJournal(self._open(name))
+        except BaseException:
+            with self._lock:
+                self._opening.pop(name).set()
+            raise
+        with self._lock:
+            journal.active = 1
+            self._journals[name] = journal
+            self._opening.pop(name).set()
+            self.opened += 1
+            closing = self._over_limit()
+        self._close(closing)
+        self._start_reaper()
+        return journal.app
+
+    def release(self, name):
+        with self._lock:
+            journal = self._journals.get(name)
+            if journal is not None:
+                journal.active -= 1
+                journal.last_used = time.monotonic()
+
+    def _open(self, name):
+        from app import create_app
+        if not journal_exists(self.root_app, name):
+            if not self.root_app.config['DENNIK_JOURNALS_AUTOCREATE']:
+                raise JournalError(f'Denník {name} neexistuje')
+            os.makedirs(os.path.join(journal_folder(self.root_app, name), 'uploads'), exist_ok=True)
+        return create_app(journal_config(self.root_app, name))
+
+    def _over_limit(self):
+        """Pod zámkom: vyberie najstaršie nečinné denníky nad limit LRU"""
+        closing = []
+        for name in list(self._journals):
+            if len(self._journals) <= self.max_open:
+                break
+            if not self._journals[name].busy():
+                closing.append(self._journals.pop(name))
+        return closing
+
+    def _idle(self):
+        now = time.monotonic()
+        with self._lock:
+            names = [name for name, journal in self._journals.items()
+                     if not journal.busy() and now - journal.last_used >= self.idle]
+            return [self._journals.pop(name) for name in names]
+
+    def _close(self, journals):
+        from app import shutdown_app
+        for journal in journals:
+            try:
+                shutdown_app(journal.app)
+            except Exception as e:
+                print(f"[JOURNALS] Zatvorenie denníka {journal.app.config.get('DENNIK_JOURNAL_NAME')} "
+                      f"zlyhalo: {e}", file=sys.stderr)
+            self.evicted += 1
+
+    def _start_reaper(self):
+        if self.idle <= 0 or self._reaper is not None:
+            return
+        with self._lock:
+            if self._reaper is None:
+                self._reaper = threading.Thread(target=self._run, name='dennik-journals', daemon=True)
+                self._reaper.start()
+
+    def _run(self):
+        while not self._stop.wait(min(60, self.idle)):
+            self._close(self._idle())
+            with self._lock:
+                closing = self._over_limit()
+            self._close(closing)
+
+    def close_all(self):
+        self._stop.set()
+        with self._lock:
+            journals = list(self._journals.values())
+            self._journals.clear()
+        self._close(journals)
+
+    def status(self):
+        now = time.monotonic()
+        with self._lock:
+            return {
+                'max_open': self.max_open,
+                'idle_seconds': self.idle,
+                'opened': self.opened,
+                'evicted': self.evicted,
+                'open': [{'name': name, 'active': journal.active,
+                          'idle_seconds': round(now - journal.last_used, 1)}
+                         for name, journal in self._journals.items()],
+            }
+
+
+class JournalDispatcher:
+    """WSGI middleware: /j/<meno>/... do aplikácie denníka, ostatné do hlavnej"""
+
+    def __init__(self, root_app, wsgi_app):
+        self.root_app = root_app
+        self.wsgi_app = wsgi_app
+        self.pool = JournalPool(root_app)
+
+    def resolve(self, path):
+        """(meno, zvyšok cesty) pre cestu denníka, inak None"""
+        match = JOURNAL_PATH_RE.match(path or '')
+        if not match:
+            return None
+        return match.group(1), match.group(2) or '/'
+
+    def __call__(self, environ, start_response):
+        resolved = self.resolve(environ.get('PATH_INFO', ''))
+        if resolved is None:
+            return self.wsgi_app(environ, start_response)
+        name, rest = resolved
+        try:
+            app = self.pool.checkout(name)
+        except JournalError as e:
+            return _json_error(start_response, '404 NOT FOUND', str(e))
+        environ = dict(environ)
+        environ['SCRIPT_NAME'] = environ.get('SCRIPT_NAME', '') + JOURNAL_PREFIX + name
+        environ['PATH_INFO'] = rest
+        try:
+            response = app(environ, start_response)
+        except BaseException:
+            self.pool.release(name)
+            raise
+        # Denník je rezervovaný, kým sa neodošle celá odpoveď (aj streamovaná)
+        return ClosingIterator(response, [lambda: self.pool.release(name)])
+
+
+def _json_error(start_response, status, message):
+    body = json.dumps({'error': message}, ensure_ascii=False).encode('utf-8')
+    start_response(status, [('Content-Type', 'application/json'), ('Content-Length', str(len(body)))])
+    return [body]
+
+
+def dispatcher(app):
+    """Dispatcher hlavnej aplikácie alebo None (v denníku / vypnuté)"""
+    return app.extensions.get('dennik_journals')
+
+
+def init_journals(app):
+    app.config.setdefault('DENNIK_JOURNALS', os.environ.get('DENNIK_JOURNALS', '1') != '0')
+    app.config.setdefault('DENNIK_JOURNALS_FOLDER', os.environ.get('DENNIK_JOURNALS_FOLDER')
+                          or os.path.join(app.instance_path, 'journals'))
+    app.config.setdefault('DENNIK_JOURNALS_MAX', int(os.environ.get('DENNIK_JOURNALS_MAX', DEFAULT_MAX_OPEN)))
+    app.config.setdefault('DENNIK_JOURNALS_IDLE', int(os.environ.get('DENNIK_JOURNALS_IDLE', DEFAULT_IDLE_SECONDS)))
+    app.config.setdefault('DENNIK_JOURNALS_AUTOCREATE', os.environ.get('DENNIK_JOURNALS_AUTOCREATE') == '1')
+    app.config.setdefault('DENNIK_JOURNALS_READ_POOL_SIZE', DEFAULT_READ_POOL_SIZE)
+    # Denník sám ďalšie denníky neobsluhuje
+    if not app.config['DENNIK_JOURNALS'] or app.config.get('DENNIK_JOURNAL_NAME'):
+        return
+    middleware = JournalDispatcher(app, app.wsgi_app)
+    app.extensions['dennik_journals'] = middleware
+    app.wsgi_app = middleware
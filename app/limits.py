@@ -0,0 +1,225 @@
+"""Limity súbežnosti pre náročné endpointy (export, upload, hromadné operácie)
+
+Každý limit má `slots` súbežne bežiacich requestov. Sloty sú súbory
+<instance>/limits/<meno>.slot<N> držané cez fcntl.flock, takže limit
+platí naraz pre všetky vlákna aj workery, a zámok sa uvoľní aj keď
+proces spadne. Request, ktorý nedostane slot, čaká vo fronte
+(<meno>.queue, poradie FIFO) najviac `wait` sekúnd; ak je front plný
+alebo čakanie vyprší, dostane 429 s Retry-After a pozíciou vo fronte.
+Interaktívne endpointy limitom nepodliehajú.
+"""
+import fcntl
+import json
+import math
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import current_app, jsonify, make_response
+from werkzeug.wsgi import ClosingIterator
+
+POLL_INTERVAL = 0.1
+STALE_TICKET_SECONDS = 600
+
+# slots = súbežne bežiace, queue = max. čakajúcich, wait = max. čakanie v s,
+# retry_after = odhad trvania jednej operácie v s (pre hlavičku Retry-After)
+DEFAULT_LIMITS = {
+    'export': {'slots': 1, 'queue': 4, 'wait': 2, 'retry_after': 30},
+    'upload': {'slots': 3, 'queue': 12, 'wait': 15, 'retry_after': 5},
+    'bulk': {'slots': 1, 'queue': 2, 'wait': 2, 'retry_after': 60},
+}
+
+
+class LimitExceeded(Exception):
+    """Všetky sloty sú obsadené a na slot sa nepodarilo dočkať"""
+
+    def __init__(self, name, position, retry_after):
+        super().__init__(f'Limit {name} je vyčerpaný (pozícia vo fronte {position})')
+        self.name = name
+        self.position = position
+        self.retry_after = retry_after
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class ConcurrencyLimiter:
+    """Sloty + FIFO front jedného limitu, zdieľané cez súbory"""
+
+    def __init__(self, folder, name, slots, queue=0, wait=0, retry_after=10):
+        self.folder = folder
+        self.name = name
+        self.slots = max(1, int(slots))
+        self.queue = max(0, int(queue))
+        self.wait = float(wait)
+        self.retry_after = retry_after
+        os.makedirs(folder, exist_ok=True)
+        self._queue_path = os.path.join(folder, f'{name}.queue')
+
+    def _try_slot(self):
+        for index in range(self.slots):
+            handle = open(os.path.join(self.folder, f'{self.name}.slot{index}'), 'a')
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                handle.close()
+                continue
+            return handle
+        return None
+
+    @contextmanager
+    def _tickets(self):
+        """Zoznam čakajúcich [[ticket, pid, čas], ...] pod zámkom súboru frontu"""
+        with open(self._queue_path, 'a+') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            f.seek(0)
+            try:
+                tickets = json.loads(f.read() or '[]')
+            except ValueError:
+                tickets = []
+            now = time.time()
+            # Čakajúci z mŕtvych procesov alebo zabudnuté lístky
+            live = [t for t in tickets if now - t[2] < STALE_TICKET_SECONDS and _pid_alive(t[1])]
+            yield live
+            f.seek(0)
+            f.truncate()
+            f.write(json.dumps(live))
+
+    def _retry_after(self, position):
+        return max(1, math.ceil(self.retry_after * math.ceil(position / self.slots)))
+
+    def acquire(self):
+        """Vráti držaný slot (zatvoriť pri release) alebo vyhodí LimitExceeded"""
+        ticket = uuid.uuid4().hex
+        with self._tickets() as tickets:
+            if not tickets:
+                handle = self._try_slot()
+                if handle is not None:
+                    return handle
+            if len(tickets) >= self.queue or self.wait <= 0:
+                position = len(tickets) + 1
+                raise LimitExceeded(self.name, position, self._retry_after(position))
+            tickets.append([ticket, os.getpid(), time.time()])
+
+        deadline = time.monotonic() + self.wait
+        position = None
+        try:
+            while True:
+                with self._tickets() as tickets:
+                    ids = [t[0] for t in tickets]
+                    if ticket not in ids:
+                        tickets.append([ticket, os.getpid(), time.time()])
+                        ids.append(ticket)
+                    position = ids.index(ticket) + 1
+                    # Slot skúšajú iba prví čakajúci (FIFO)
+                    if position <= self.slots:
+                        handle = self._try_slot()
+                        if handle is not None:
+                            tickets[:] = [t for t in tickets if t[0] != ticket]
+                            return handle
+                if time.monotonic() >= deadline:
+                    raise LimitExceeded(self.name, position, self._retry_after(position))
+                time.sleep(POLL_INTERVAL)
+        except BaseException:
+            with self._tickets() as tickets:
+                tickets[:] = [t for t in tickets if t[0] != ticket]
+            raise
+
+    @contextmanager
+    def slot(self):
+        handle = self.acquire()
+        try:
+            yield
+        finally:
+            handle.close()  # zatvorenie uvoľní flock
+
+    def status(self):
+        busy = 0
+        for index in range(self.slots):
+            with open(os.path.join(self.folder, f'{self.name}.slot{index}'), 'a') as handle:
+                try:
+                    fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    fcntl.flock(handle, fcntl.LOCK_UN)
+                except BlockingIOError:
+                    busy += 1
+        with self._tickets() as tickets:
+            waiting = len(tickets)
+        return {'slots': self.slots, 'busy': busy, 'waiting': waiting, 'queue': self.queue}
+
+
+def limiter(name, app=None):
+    app = app or current_app
+    return app.extensions['dennik_limits'][name]
+
+
+def limit_response(error):
+    response = jsonify({
+        'error': 'Server je práve vyťažený, skúste to znova neskôr',
+        'limit': error.name,
+        'queue_position': error.position,
+        'retry_after': error.retry_after,
+    })
+    response.status_code = 429
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+
+def limited(name, until_sent=False):
+    """Dekorátor routy: beh iba v slote limitu `name`, inak 429
+
+    until_sent=True drží slot aj počas odosielania tela odpovede (send_file,
+    streamované dáta) - uvoľní ho až zatvorenie tela po odoslaní. Telo sa
+    obalí, lebo send_file (direct_passthrough) call_on_close nevolá.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not until_sent:
+                try:
+                    with limiter(name).slot():
+                        return view(*args, **kwargs)
+                except LimitExceeded as e:
+                    return limit_response(e)
+            try:
+                handle = limiter(name).acquire()
+            except LimitExceeded as e:
+                return limit_response(e)
+            try:
+                response = make_response(view(*args, **kwargs))
+            except BaseException:
+                handle.close()
+                raise
+            if response.status_code >= 400:
+                handle.close()
+            else:
+                response.response = ClosingIterator(response.response, handle.close)
+            return response
+        return wrapper
+    return decorator
+
+
+def init_limits(app):
+    app.config.setdefault('DENNIK_LIMITS_FOLDER', os.path.join(app.instance_path, 'limits'))
+    limits = {name: dict(options) for name, options in DEFAULT_LIMITS.items()}
+    for name, options in (app.config.get('DENNIK_LIMITS') or {}).items():
+        limits.setdefault(name, {}).update(options)
+    for name, options in limits.items():
+        # DENNIK_LIMIT_EXPORT_SLOTS=2, DENNIK_LIMIT_UPLOAD_WAIT=30, ...
+        for key in ('slots', 'queue', 'wait', 'retry_after'):
+            value = os.environ.get(f'DENNIK_LIMIT_{name.upper()}_{key.upper()}')
+            if value is not None:
+                options[key] = float(value) if key == 'wait' else int(value)
+    app.config['DENNIK_LIMITS'] = limits
+    app.extensions['dennik_limits'] = {
+        name: ConcurrencyLimiter(app.config['DENNIK_LIMITS_FOLDER'], name, **options)
+        for name, options in limits.items()
+    }
@@ -0,0 +1,123 @@
+"""Verzované migrácie schémy
+
+Verzia schémy je uložená v PRAGMA user_version databázy. Štart
+aplikácie porovná jedno číslo so SCHEMA_VERSION a ak sedí, DDL sa
+vôbec nespúšťa. Nová databáza dostane celú schému cez create_all a
+rovno aktuálnu verziu; staršia databáza prejde chýbajúcimi krokmi.
+
+Každý krok musí byť idempotentný (databázy spred verzovania môžu mať
+časť zmien už hotovú). Indexy sa vytvárajú po jednom v krátkych
+transakciách - vo WAL režime čitatelia počas toho nečakajú, takže
+migrate_db.py sa dá spustiť aj za behu aplikácie.
+"""
+import fcntl
+import sys
+from app.models import db
+
+
+def _create_missing_tables():
+    db.create_all()
+
+
+def _create_missing_indexes():
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            create_index_online(index)
+
+
+def _compress_entries():
+    from app.compression import compress_existing
+    compress_existing(db)
+
+
+# (verzia, popis, funkcia) - nové kroky iba pridávať na koniec
+MIGRATIONS = [
+    (1, 'tabuľky attachment, attachment_text a settings', _create_missing_tables),
+    (2, 'indexy pre filtre záznamov a časovú os', _create_missing_indexes),
+    (3, 'kompresia dlhých textov záznamov', _compress_entries),
+    (4, 'tabuľka attachment_file pre kontrolu príloh', _create_missing_tables),
+    (5, 'tabuľka task pre úlohy na pozadí', _create_missing_tables),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def create_index_online(index):
+    """CREATE INDEX IF NOT EXISTS v samostatnej krátkej transakcii"""
+    with db.engine.begin() as conn:
+        index.create(bind=conn, checkfirst=True)
+
+
+def schema_version():
+    with db.engine.connect() as conn:
+        return conn.exec_driver_sql('PRAGMA user_version').scalar()
+
+
+def set_schema_version(version):
+    with db.engine.begin() as conn:
+        conn.exec_driver_sql(f'PRAGMA user_version = {int(version)}')
+
+
+def _has_tables():
+    with db.engine.connect() as conn:
+        return conn.exec_driver_sql(
+            "SELECT count(*) FROM sqlite_master WHERE type = 'table' AND name = 'entry'"
+        ).scalar() > 0
+
+
+def _lock_path():
+    database = db.engine.url.database
+    if not database or database == ':memory:':
+        return None
+    return database + '.migrate.lock'
+
+
+def migrate(report=None):
+    """Aplikuje chýbajúce migrácie; vráti zoznam vykonaných verzií (v kontexte aplikácie)"""
+    if schema_version() == SCHEMA_VERSION:
+        return []
+
+    lock_path = _lock_path()
+    lock = open(lock_path, 'w') if lock_path else None
+    try:
+        if lock:
+            # Viac workerov naraz - migruje iba prvý, ostatní počkajú
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        current = schema_version()
+        if current == SCHEMA_VERSION:
+            return []
+        if current > SCHEMA_VERSION:
+            raise RuntimeError(f'Databáza má novšiu schému ({current}) ako aplikácia ({SCHEMA_VERSION})')
+
+        if current == 0 and not _has_tables():
+            # Nová databáza - celá schéma naraz
+            db.create_all()
+            set_schema_version(SCHEMA_VERSION)
+            return [SCHEMA_VERSION]
+
+        applied = []
+        for version, description, step in MIGRATIONS:
+            if version <= current:
+                continue
+            if report:
+                report(version, description)
+            step()
+            # Krok mohol použiť session - vráť spojenie zapisovača do poolu
+            db.session.remove()
+            set_schema_version(version)
+            applied.append(version)
+        return applied
+    finally:
+        if lock:
+            lock.close()
+
+
+def ensure_schema(app):
+    """Pri štarte: iba porovnanie user_version, DDL len ak schéma zaostáva"""
+    with app.app_context():
+        if not app.config.get('DENNIK_AUTO_MIGRATE', True):
+            current = schema_version()
+            if current != SCHEMA_VERSION:
+                print(f'[SCHEMA] Databáza má verziu {current}, aplikácia očakáva {SCHEMA_VERSION} '
+                      f'- spusti migrate_db.py', file=sys.stderr)
+            return
+        migrate()
@@ -1,7 +1,11 @@
+import json
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+from app.db_routing import RoutingSession
+from app.compression import compress_body, decompress_body
 
-db = SQLAlchemy()
+# GET requesty čítajú cez read-only engine (pozri db_routing.py)
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 class Category(db.Model):
     """Hierarchické kategórie pre denník - skupiny a podskupiny"""
@@ -42,7 +46,8 @@ class Entry(db.Model):
     date = db.Column(db.Date, nullable=False, default=datetime.utcnow().date)
     time = db.Column(db.Time, nullable=False, default=datetime.utcnow().time)
     title = db.Column(db.String(200), nullable=False)
-    content = db.Column(db.Text, nullable=False)
+    # Dlhý obsah je uložený komprimovaný (pozri compression.py) - používaj Entry.content
+    _content = db.Column('content', db.Text, nullable=False)
     
     # Kategória (foreign key)
     category_id = db.Column(db.Integer, db.ForeignKey('category.id'), nullable=False)
@@ -61,6 +66,11 @@ class Entry(db.Model):
         db.Index('idx_entry_date', 'date'),
         db.Index('idx_entry_category', 'category_id'),
         db.Index('idx_entry_year_category', 'year', 'category_id'),
+        db.Index('idx_entry_date_time', 'date', 'time'),
+        db.Index('idx_entry_created_at', 'created_at'),
+        db.Index('idx_entry_updated_at', 'updated_at'),
+        db.Index('idx_entry_title', 'title'),
+        db.Index('idx_entry_date_category', 'date', 'category_id'),
     )
     
     def __init__(self, **kwargs):
@@ -69,6 +79,26 @@ class Entry(db.Model):
             self.year = self.date.year
             self.month = self.date.month
     
+    @property
+    def content(self):
+        return decompress_body(self._content)
+    
+    @content.setter
+    def content(self, value):
+        self._content = compress_body(value)
+    
+    @classmethod
+    def content_sql(cls):
+        """SQL výraz s dekomprimovaným obsahom (pre vyhľadávanie)
+
+        Python funkcia dennik_body sa volá iba pre komprimované (BLOB) riadky,
+        obyčajný text ostáva celý v SQLite.
+        """
+        return db.case(
+            (db.func.typeof(cls._content) == 'blob', db.func.dennik_body(cls._content)),
+            else_=cls._content,
+        )
+    
     def __repr__(self):
         return f'<Entry {self.title} ({self.date})>'
     
@@ -99,6 +129,11 @@ class Attachment(db.Model):
     # Relationship s Entry
     entry = db.relationship('Entry', backref=db.backref('attachments', lazy=True, cascade='all, delete-orphan'))
     
+    # Index pre EXISTS filtre (má prílohy / typ prílohy)
+    __table_args__ = (
+        db.Index('idx_attachment_entry_mime', 'entry_id', 'mime_type'),
+    )
+    
     def __repr__(self):
         return f'<Attachment {self.original_filename}>'
     
@@ -113,6 +148,89 @@ class Attachment(db.Model):
             'uploaded_at': self.uploaded_at.isoformat() if self.uploaded_at else None
         }
 
+class AttachmentText(db.Model):
+    """Extrahovaný text prílohy pre vyhľadávanie (oddelene, aby Attachment ostal ľahký)"""
+    attachment_id = db.Column(db.Integer, db.ForeignKey('attachment.id'), primary_key=True)
+    text = db.Column(db.Text)
+    # Stav súboru pri extrakcii - pri zmene sa text extrahuje znova
+    file_size = db.Column(db.Integer)
+    file_mtime = db.Column(db.Float)
+    extracted_at = db.Column(db.DateTime, default=datetime.utcnow)
+    error = db.Column(db.String(255))
+    
+    attachment = db.relationship('Attachment', backref=db.backref('text', uselist=False, lazy=True, cascade='all, delete-orphan'))
+    
+    def __repr__(self):
+        return f'<AttachmentText {self.attachment_id}>'
+
+class AttachmentFile(db.Model):
+    """Stav súboru v uploads/ podľa poslednej kontroly (index veľkosť/mtime + SHA-256)"""
+    filename = db.Column(db.String(255), primary_key=True)
+    file_size = db.Column(db.Integer)
+    file_mtime = db.Column(db.Float)
+    sha256 = db.Column(db.String(64))
+    # ok | missing | corrupt | orphan
+    status = db.Column(db.String(20), nullable=False, default='ok')
+    # Od kedy súbor chýba / nemá riadok Attachment (pre hlásenie a lehotu pred zmazaním)
+    since = db.Column(db.DateTime)
+    checked_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('idx_attachment_file_status', 'status'),
+    )
+
+    def __repr__(self):
+        return f'<AttachmentFile {self.filename} {self.status}>'
+
+    def to_dict(self):
+        return {
+            'filename': self.filename,
+            'file_size': self.file_size,
+            'sha256': self.sha256,
+            'status': self.status,
+            'since': self.since.isoformat() if self.since else None,
+            'checked_at': self.checked_at.isoformat() if self.checked_at else None
+        }
+
+class Task(db.Model):
+    """Úloha na pozadí (app/tasks.py) - zapisuje sa v tej istej transakcii ako zmena dát"""
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text)  # JSON
+    # Rovnaký kľúč = tá istá úloha (opakované zaradenie sa ignoruje)
+    idempotency_key = db.Column(db.String(200), unique=True)
+    # pending | running | done | failed
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    run_after = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index('idx_task_status_run_after', 'status', 'run_after'),
+    )
+
+    def __repr__(self):
+        return f'<Task {self.id} {self.kind} {self.status}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'payload': json.loads(self.payload) if self.payload else None,
+            'idempotency_key': self.idempotency_key,
+            'status': self.status,
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'run_after': self.run_after.isoformat() if self.run_after else None,
+            'last_error': self.last_error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
 class Settings(db.Model):
     """Globálne nastavenia denníka"""
     id = db.Column(db.Integer, primary_key=True)
@@ -0,0 +1,247 @@
+"""Profilovanie jednotlivých requestov na požiadanie
+
+Request sa profiluje, ak nesie hlavičku X-Dennik-Profile s tokenom
+DENNIK_PROFILE_TOKEN, alebo náhodne s pravdepodobnosťou
+DENNIK_PROFILE_SAMPLE. Počas requestu vlákno na pozadí vzorkuje jeho
+zásobník (sys._current_frames) každých DENNIK_PROFILE_INTERVAL ms a
+SQL dotazy sa časujú cez udalosti kurzora. Výsledok sú dva súbory:
+
+    <čas>_<metóda>_<routa>_<id>.folded    - collapsed stacks (flamegraph.pl, speedscope)
+    <čas>_<metóda>_<routa>_<id>.json      - metadáta requestu + časová os SQL
+
+Hodnoty query parametrov sa v profile nahrádzajú rovnako ako v
+záznamoch recorderu (app/recorder.py). Uložené profily sú dostupné
+iba s tokenom - bez DENNIK_PROFILE_TOKEN ich API nevydá vôbec. Ten
+istý token (is_admin) chráni všetky /api/admin/* a obnovu zo zálohy.
+
+V priečinku ostáva najviac DENNIK_PROFILE_KEEP profilov. Ak nie je
+nastavený token ani vzorkovanie, nič sa neregistruje - bežné requesty
+nemajú žiadnu réžiu.
+"""
+import hmac
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from flask import g, request
+from sqlalchemy import event
+
+from app.recorder import sanitize_value
+
+PROFILE_HEADER = 'X-Dennik-Profile'
+DEFAULT_INTERVAL_MS = 5
+DEFAULT_KEEP = 50
+MAX_SQL_LENGTH = 500
+MAX_STACK_DEPTH = 64
+PROFILE_NAME_RE = re.compile(r'^[\w.\-]+\.(folded|json)$')
+
+
+def is_admin(app):
+    """Hlavička s platným tokenom (porovnanie v konštantnom čase)"""
+    token = app.config.get('DENNIK_PROFILE_TOKEN')
+    supplied = request.headers.get(PROFILE_HEADER)
+    return bool(token and supplied and hmac.compare_digest(token, supplied))
+
+
+def _frame_name(code, root):
+    path = code.co_filename
+    if path.startswith(root):
+        path = os.path.relpath(path, root)
+    return f'{code.co_name} ({path}:{code.co_firstlineno})'
+
+
+class StackSampler:
+    """Vzorkuje zásobník jedného vlákna a počíta rovnaké zásobníky"""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = {}
+        self.count = 0
+        self._root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='dennik-profile', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                stack.append(_frame_name(frame.f_code, self._root))
+                frame = frame.f_back
+            if stack:
+                key = ';'.join(reversed(stack))
+                self.samples[key] = self.samples.get(key, 0) + 1
+                self.count += 1
+
+    def collapsed(self):
+        return ''.join(f'{stack} {count}\n' for stack, count in sorted(self.samples.items()))
+
+
+class RequestProfiler:
+    """before/after_request háky a časovanie SQL pre profilované requesty"""
+
+    def __init__(self, app):
+        self.app = app
+        self.folder = app.config['DENNIK_PROFILE_FOLDER']
+        self.sample = app.config['DENNIK_PROFILE_SAMPLE']
+        self.interval = app.config['DENNIK_PROFILE_INTERVAL'] / 1000.0
+        self.keep = app.config['DENNIK_PROFILE_KEEP']
+        self._lock = threading.Lock()
+
+    def wanted(self):
+        if request.blueprint != 'main':
+            return False
+        if PROFILE_HEADER in request.headers:
+            return is_admin(self.app)
+        return self.sample > 0 and random.random() < self.sample
+
+    def before(self):
+        if not self.wanted():
+            return
+        sampler = StackSampler(threading.get_ident(), self.interval)
+        g.dennik_profile = {'sampler': sampler, 'sql': [], 'started': time.perf_counter()}
+        sampler.start()
+
+    def after(self, response):
+        profile = g.pop('dennik_profile', None)
+        if profile is None:
+            return response
+        profile['sampler'].stop()
+        elapsed = (time.perf_counter() - profile['started']) * 1000
+        name = self._write(profile, response, elapsed)
+        response.headers['X-Dennik-Profile-Id'] = name
+        return response
+
+    def teardown(self, exc):
+        # Neošetrená výnimka - after_request sa nevolal, vzorkovač treba zastaviť
+        profile = g.pop('dennik_profile', None)
+        if profile is not None:
+            profile['sampler'].stop()
+
+    def _write(self, profile, response, elapsed):
+        route = request.url_rule.rule if request.url_rule else request.path
+        slug = re.sub(r'[^\w]+', '-', route).strip('-')[:60] or 'root'
+        name = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{request.method}_{slug}_{uuid.uuid4().hex[:6]}"
+        sql = profile['sql']
+        meta = {
+            'id': name,
+            'method': request.method,
+            'route': route,
+            'path': request.path,
+            # Hodnoty parametrov (napr. hľadaný text) sa do profilu nezapisujú
+            'query': {key: sanitize_value(key, values) for key, values in request.args.lists()},
+            'status': response.status_code,
+            'ms': round(elapsed, 2),
+            'samples': profile['sampler'].count,
+            'interval_ms': self.interval * 1000,
+            'sql_count': len(sql),
+            'sql_ms': round(sum(item['ms'] for item in sql), 2),
+            'sql': sql,
+        }
+        os.makedirs(self.folder, exist_ok=True)
+        with open(os.path.join(self.folder, name + '.folded'), 'w', encoding='utf-8') as f:
+            f.write(profile['sampler'].collapsed())
+        with open(os.path.join(self.folder, name + '.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, indent=1, ensure_ascii=False)
+        self._prune()
+        return name
+
+    def _prune(self):
+        with self._lock:
+            names = sorted({n.rsplit('.', 1)[0] for n in os.listdir(self.folder) if PROFILE_NAME_RE.match(n)})
+            for old in names[:-self.keep] if self.keep > 0 else []:
+                for ext in ('.folded', '.json'):
+                    try:
+                        os.remove(os.path.join(self.folder, old + ext))
+                    except OSError:
+                        pass
+
+    def list(self):
+        """Uložené profily od najnovšieho (iba metadáta bez SQL)"""
+        if not os.path.isdir(self.folder):
+            return []
+        profiles = []
+        for filename in sorted(os.listdir(self.folder), reverse=True):
+            if not filename.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.folder, filename), encoding='utf-8') as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                continue
+            meta.pop('sql', None)
+            profiles.append(meta)
+        return profiles
+
+    def path(self, filename):
+        """Cesta k súboru profilu alebo None (iba názvy z priečinka, žiadne ../)"""
+        if not PROFILE_NAME_RE.match(filename):
+            return None
+        path = os.path.join(self.folder, filename)
+        return path if os.path.isfile(path) else None
+
+
+def _active_profile():
+    try:
+        return g.get('dennik_profile')
+    except RuntimeError:
+        return None  # mimo kontextu aplikácie (skripty, vlákna na pozadí)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _active_profile() is not None:
+        conn.info.setdefault('dennik_profile_query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _active_profile()
+    starts = conn.info.get('dennik_profile_query_start')
+    if profile is None or not starts:
+        return
+    started = starts.pop()
+    profile['sql'].append({
+        'at_ms': round((started - profile['started']) * 1000, 2),
+        'ms': round((time.perf_counter() - started) * 1000, 3),
+        'bind': 'reader' if 'mode=ro' in str(conn.engine.url) else 'writer',
+        'statement': statement[:MAX_SQL_LENGTH],
+    })
+
+
+def install_sql_timing(db):
+    """V kontexte aplikácie: časovanie dotazov na všetkých enginoch aplikácie"""
+    for engine in db.engines.values():
+        if not event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+            event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+
+def init_profiling(app):
+    app.config.setdefault('DENNIK_PROFILE_TOKEN', os.environ.get('DENNIK_PROFILE_TOKEN') or None)
+    app.config.setdefault('DENNIK_PROFILE_SAMPLE', float(os.environ.get('DENNIK_PROFILE_SAMPLE', '0')))
+    app.config.setdefault('DENNIK_PROFILE_FOLDER', os.path.join(app.instance_path, 'profiles'))
+    app.config.setdefault('DENNIK_PROFILE_KEEP', int(os.environ.get('DENNIK_PROFILE_KEEP', DEFAULT_KEEP)))
+    app.config.setdefault('DENNIK_PROFILE_INTERVAL', DEFAULT_INTERVAL_MS)
+    if not app.config['DENNIK_PROFILE_TOKEN'] and app.config['DENNIK_PROFILE_SAMPLE'] <= 0:
+        return
+    profiler = RequestProfiler(app)
+    app.extensions['dennik_profiler'] = profiler
+    app.before_request(profiler.before)
+    app.after_request(profiler.after)
+    app.teardown_request(profiler.teardown)
+    from app.models import db
+    with app.app_context():
+        install_sql_timing(db)
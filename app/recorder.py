@@ -0,0 +1,154 @@
+"""Záznam tvaru requestov pre neskoršie prehranie záťaže (replay_traffic.py)
+
+Zapína sa iba cez DENNIK_RECORD_FILE - inak sa nič neregistruje a
+requesty nemajú žiadnu réžiu navyše. Zaznamenávajú sa iba requesty
+blueprintu `main`, jeden JSON riadok na request:
+
+    {"t": 1700000000.12, "method": "GET", "route": "/api/entries",
+     "path": "/api/entries", "query": {"year": "2024"}, "json": null,
+     "files": [], "request_bytes": 0, "status": 200, "response_bytes": 5120,
+     "ms": 12.3, "lock_wait_ms": 0.0, "writer_ms": 0.4}
+
+`lock_wait_ms` je čakanie na spojenie zapisovača v tomto procese,
+`writer_ms` čas dotazov cez zapisovača - vrátane čakania SQLite
+(busy_timeout) na zámok, ktorý drží iný proces. Obe hodnoty idú aj do
+hlavičky Server-Timing, z ktorej ich číta replay_traffic.py.
+
+Texty sa nezapisujú: hodnota, ktorá nevyzerá ako číslo, dátum, čas
+alebo známy prepínač, sa nahradí reťazcom 'x' rovnakej dĺžky (tvar a
+veľkosť requestu ostanú, obsah nie). Súbory z uploadu majú iba
+veľkosť a príponu.
+"""
+import json
+import os
+import random
+import re
+import threading
+import time
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+SAFE_VALUE_RE = re.compile(r'^[\d\s:.,\-+T*/]{0,40}$')
+# Prepínače, ktorých hodnoty nie sú osobné údaje (triedenie, typ prílohy, ...)
+PLAIN_KEYS = {'sort', 'attachment_type', 'granularity', 'by', 'download', 'mime_type', 'active'}
+MAX_JSON_DEPTH = 4
+
+
+def sanitize_value(key, value, depth=0):
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, str):
+        if key in PLAIN_KEYS and len(value) <= 64 or SAFE_VALUE_RE.match(value):
+            return value
+        return 'x' * len(value)
+    if depth >= MAX_JSON_DEPTH:
+        return None
+    if isinstance(value, list):
+        return [sanitize_value(key, item, depth + 1) for item in value]
+    if isinstance(value, dict):
+        return {k: sanitize_value(k, v, depth + 1) for k, v in value.items()}
+    return None
+
+
+def describe_request():
+    """Tvar aktuálneho requestu bez citlivého obsahu"""
+    record = {
+        'method': request.method,
+        'route': request.url_rule.rule if request.url_rule else None,
+        # Vrátane prefixu denníka (/j/<meno>), aby replay trafil ten istý denník
+        'path': request.script_root + request.path,
+        'query': {key: sanitize_value(key, value) for key, value in request.args.items()},
+        'json': None,
+        'files': [],
+        'request_bytes': request.content_length or 0,
+    }
+    if request.is_json:
+        record['json'] = sanitize_value(None, request.get_json(silent=True))
+    elif request.files:
+        for field, storage in request.files.items(multi=True):
+            name = storage.filename or ''
+            storage.stream.seek(0, os.SEEK_END)
+            size = storage.stream.tell()
+            storage.stream.seek(0)
+            record['files'].append({
+                'field': field,
+                'ext': name.rsplit('.', 1)[1].lower() if '.' in name else '',
+                'size': size,
+                'mime_type': storage.mimetype,
+            })
+    return record
+
+
+class RequestRecorder:
+    """Zapisuje JSONL záznam; súbor je zdieľaný viacerými vláknami aj workermi (O_APPEND)"""
+
+    def __init__(self, path, sample=1.0):
+        self.path = path
+        self.sample = sample
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def before(self):
+        if request.blueprint != 'main' or (self.sample < 1.0 and random.random() >= self.sample):
+            return
+        g.dennik_record = describe_request()
+        g.dennik_record['t'] = round(time.time(), 4)
+        g.dennik_record_started = time.perf_counter()
+        g.dennik_lock_wait = 0.0
+        g.dennik_writer_time = 0.0
+
+    def after(self, response):
+        record = g.pop('dennik_record', None)
+        if record is None:
+            return response
+        record['status'] = response.status_code
+        # Content-Length má aj send_file a natívne ASGI odpovede (telo sa streamuje mimo objektu)
+        record['response_bytes'] = response.content_length
+        if record['response_bytes'] is None:
+            record['response_bytes'] = response.calculate_content_length()
+        record['ms'] = round((time.perf_counter() - g.pop('dennik_record_started')) * 1000, 2)
+        record['lock_wait_ms'] = round(g.pop('dennik_lock_wait', 0.0) * 1000, 2)
+        record['writer_ms'] = round(g.pop('dennik_writer_time', 0.0) * 1000, 2)
+        response.headers['Server-Timing'] = f"lock;dur={record['lock_wait_ms']}, writer;dur={record['writer_ms']}"
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+            f.write(line)
+        return response
+
+
+def _measured():
+    return has_request_context() and 'dennik_writer_time' in g
+
+
+def _before_writer_execute(conn, cursor, statement, parameters, context, executemany):
+    if _measured():
+        conn.info['dennik_record_execute'] = time.perf_counter()
+
+
+def _after_writer_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop('dennik_record_execute', None)
+    if started is not None and _measured():
+        g.dennik_writer_time += time.perf_counter() - started
+
+
+def install_writer_timing(db):
+    """V kontexte aplikácie: čas dotazov cez engine zapisovača pre zaznamenávané requesty"""
+    if not event.contains(db.engine, 'before_cursor_execute', _before_writer_execute):
+        event.listen(db.engine, 'before_cursor_execute', _before_writer_execute)
+        event.listen(db.engine, 'after_cursor_execute', _after_writer_execute)
+
+
+def init_recorder(app):
+    app.config.setdefault('DENNIK_RECORD_FILE', os.environ.get('DENNIK_RECORD_FILE') or None)
+    app.config.setdefault('DENNIK_RECORD_SAMPLE', float(os.environ.get('DENNIK_RECORD_SAMPLE', '1.0')))
+    path = app.config['DENNIK_RECORD_FILE']
+    if not path:
+        return
+    recorder = RequestRecorder(path, app.config['DENNIK_RECORD_SAMPLE'])
+    app.extensions['dennik_recorder'] = recorder
+    app.before_request(recorder.before)
+    app.after_request(recorder.after)
+    from app.models import db
+    with app.app_context():
+        install_writer_timing(db)
@@ -0,0 +1,316 @@
+"""Obnova denníka zo ZIP exportu
+
+ZIP sa z requestu ukladá na disk po blokoch, prílohy sa rozbaľujú
+paralelne do dočasného priečinka vedľa uploads/ a každá sa overí
+(CRC zo ZIP + SHA-256 z manifest.json, ak ho export obsahuje). Až keď
+je všetko rozbalené a overené, súbory sa presunú na miesto a databáza
+sa nahradí cez SQLite backup API v jednom kroku - ostatné spojenia
+vidia buď starý, alebo nový obsah.
+
+Názvy v ZIP sa kontrolujú proti zip-slip (absolútne cesty, "..",
+symbolické odkazy); akceptujú sa iba dennik.db, manifest.json,
+uploads/<súbor> a archive/dennik-<rok>.db.
+"""
+import hashlib
+import json
+import os
+import posixpath
+import re
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+from app.backup import build_manifest
+from app.shards import SHARD_RE
+
+DATABASE_NAME = 'dennik.db'
+MANIFEST_NAME = 'manifest.json'
+CHUNK = 1024 * 1024
+DEFAULT_WORKERS = 4
+MAX_FINISHED_JOBS = 20
+# Shard aj jeho prípadné -wal/-shm súbory
+SHARD_FILE_RE = re.compile(r'^dennik-\d{4}\.db(-wal|-shm|-journal)?$')
+
+
+class RestoreError(Exception):
+    """Neplatný archív alebo obnova, ktorá sa nedá spustiť"""
+
+
+def write_export_manifest(archive_dir):
+    """manifest.json s veľkosťou a SHA-256 každej prílohy v exporte"""
+    files = build_manifest(os.path.join(archive_dir, 'uploads'))
+    manifest = {
+        'created_at': datetime.now().isoformat(),
+        'files': {name: {'size': info['size'], 'sha256': info['sha256']} for name, info in files.items()},
+    }
+    with open(os.path.join(archive_dir, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1)
+
+
+def spool_stream(stream, folder=None):
+    """Uloží stream requestu do dočasného súboru po blokoch; vráti cestu"""
+    fd, path = tempfile.mkstemp(prefix='dennik_import_', suffix='.zip', dir=folder)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in iter(lambda: stream.read(CHUNK), b''):
+                f.write(chunk)
+    except Exception:
+        os.remove(path)
+        raise
+    return path
+
+
+def classify_member(info):
+    """('database'|'manifest'|'upload'|'shard', názov) alebo None; vyhodí RestoreError pri zip-slip"""
+    name = info.filename
+    if info.is_dir():
+        return None
+    if (info.external_attr >> 16) & 0o170000 == 0o120000:
+        raise RestoreError(f'Symbolický odkaz v archíve: {name}')
+    normalized = posixpath.normpath(name.replace('\\', '/'))
+    if (normalized.startswith('/') or normalized.startswith('..') or '/../' in f'/{normalized}/'
+            or (len(normalized) > 1 and normalized[1] == ':')):
+        raise RestoreError(f'Nebezpečná cesta v archíve: {name}')
+    parts = normalized.split('/')
+    if normalized == DATABASE_NAME:
+        return 'database', DATABASE_NAME
+    if normalized == MANIFEST_NAME:
+        return 'manifest', MANIFEST_NAME
+    if len(parts) == 2 and parts[0] == 'uploads' and parts[1] not in ('', '.', '..'):
+        return 'upload', parts[1]
+    if len(parts) == 2 and parts[0] == 'archive' and SHARD_RE.match(parts[1]):
+        return 'shard', parts[1]
+    return None
+
+
+class RestoreJob:
+    """Stav a priebeh jednej obnovy"""
+
+    def __init__(self, zip_path):
+        self.id = uuid.uuid4().hex[:12]
+        self.zip_path = zip_path
+        self.status = 'queued'
+        self.phase = None
+        self.files_total = 0
+        self.files_done = 0
+        self.bytes_total = 0
+        self.bytes_done = 0
+        self.error = None
+        self.result = None
+        self.started_at = datetime.now()
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    def update(self, **fields):
+        with self._lock:
+            for key, value in fields.items():
+                setattr(self, key, value)
+
+    def advance(self, files=0, bytes_count=0):
+        with self._lock:
+            self.files_done += files
+            self.bytes_done += bytes_count
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'id': self.id,
+                'status': self.status,
+                'phase': self.phase,
+                'files_total': self.files_total,
+                'files_done': self.files_done,
+                'bytes_total': self.bytes_total,
+                'bytes_done': self.bytes_done,
+                'percent': round(100 * self.bytes_done / self.bytes_total, 1) if self.bytes_total else None,
+                'error': self.error,
+                'result': self.result,
+                'started_at': self.started_at.isoformat(),
+                'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            }
+
+
+def _extract_member(zip_path, info, target, expected_sha256, job):
+    """Rozbalí jeden súbor (vlastný handle ZIP pre každé vlákno) a overí SHA-256"""
+    digest = hashlib.sha256()
+    with zipfile.ZipFile(zip_path) as archive, archive.open(info) as source, open(target, 'wb') as out:
+        # ZipExtFile pri poslednom čítaní overí CRC a pri chybe vyhodí BadZipFile
+        for chunk in iter(lambda: source.read(CHUNK), b''):
+            digest.update(chunk)
+            out.write(chunk)
+            job.advance(bytes_count=len(chunk))
+    if expected_sha256 and digest.hexdigest() != expected_sha256:
+        raise RestoreError(f'Kontrolný súčet nesedí: {info.filename}')
+    job.advance(files=1)
+
+
+def _check_database(path):
+    conn = sqlite3.connect(path)
+    try:
+        if conn.execute('PRAGMA integrity_check').fetchone()[0] != 'ok':
+            raise RestoreError('Databáza v archíve je poškodená')
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        if not {'entry', 'category'} <= tables:
+            raise RestoreError('Archív neobsahuje databázu denníka')
+    finally:
+        conn.close()
+
+
+def _data_version(conn):
+    try:
+        row = conn.execute("SELECT value FROM settings WHERE key = 'data_version'").fetchone()
+    except sqlite3.Error:
+        return 0
+    return int(row[0]) if row and row[0] else 0
+
+
+def _swap_database(staged_path, live_path):
+    """Nahradí živú databázu jedným krokom backup API; verzia dát sa vždy zvýši"""
+    live = sqlite3.connect(live_path, timeout=30)
+    staged = sqlite3.connect(staged_path)
+    try:
+        previous_version = _data_version(live)
+        staged.backup(live)
+        version = max(previous_version, _data_version(live)) + 1
+        with live:
+            updated = live.execute("UPDATE settings SET value = ? WHERE key = 'data_version'", (str(version),))
+            if updated.rowcount == 0:
+                live.execute("INSERT INTO settings (key, value) VALUES ('data_version', ?)", (str(version),))
+    finally:
+        staged.close()
+        live.close()
+
+
+def restore_archive(app, zip_path, job=None, workers=DEFAULT_WORKERS):
+    """Obnoví databázu, prílohy a archivované roky zo ZIP exportu"""
+    from app.models import db
+    from app.migrations import migrate
+    job = job or RestoreJob(zip_path)
+    job.update(status='running', phase='validating')
+
+    try:
+        archive = zipfile.ZipFile(zip_path)
+    except zipfile.BadZipFile:
+        raise RestoreError('Súbor nie je platný ZIP archív')
+    with archive:
+        members = {'database': [], 'manifest': [], 'upload': [], 'shard': []}
+        for info in archive.infolist():
+            kind = classify_member(info)
+            if kind:
+                members[kind[0]].append((info, kind[1]))
+        if not members['database']:
+            raise RestoreError('Archív neobsahuje dennik.db')
+        manifest = {}
+        if members['manifest']:
+            manifest = json.loads(archive.read(members['manifest'][0][0])).get('files', {})
+
+    with app.app_context():
+        live_db = db.engine.url.database
+    upload_folder = app.config['UPLOAD_FOLDER']
+    archive_folder = app.config['DENNIK_ARCHIVE_FOLDER']
+    staging = os.path.join(os.path.dirname(os.path.abspath(upload_folder)), f'.restore-{job.id}')
+    os.makedirs(os.path.join(staging, 'uploads'))
+    os.makedirs(os.path.join(staging, 'archive'))
+
+    try:
+        work = [(info, os.path.join(staging, DATABASE_NAME), None) for info, _ in members['database']]
+        work += [(info, os.path.join(staging, 'uploads', name), manifest.get(name, {}).get('sha256'))
+                 for info, name in members['upload']]
+        work += [(info, os.path.join(staging, 'archive', name), None) for info, name in members['shard']]
+        job.update(phase='extracting', files_total=len(work),
+                   bytes_total=sum(info.file_size for info, _, _ in work))
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_extract_member, zip_path, info, target, sha, job)
+                       for info, target, sha in work]
+            for future in as_completed(futures):
+                future.result()  # prvá chyba preruší obnovu pred zásahom do živých dát
+
+        job.update(phase='verifying')
+        _check_database(os.path.join(staging, DATABASE_NAME))
+
+        # Až teraz sa menia živé dáta: najprv súbory, potom databáza
+        job.update(phase='swapping')
+        os.makedirs(upload_folder, exist_ok=True)
+        for name in os.listdir(os.path.join(staging, 'uploads')):
+            os.replace(os.path.join(staging, 'uploads', name), os.path.join(upload_folder, name))
+        # Archivované roky sa nahrádzajú celé: shard, ktorý v archíve nie je, by inak
+        # skryl (exclude_archived) obnovené riadky toho roka v hlavnej databáze
+        shard_names = os.listdir(os.path.join(staging, 'archive'))
+        app.extensions['dennik_shards'].dispose()
+        if os.path.isdir(archive_folder):
+            for name in os.listdir(archive_folder):
+                if SHARD_FILE_RE.match(name) and name not in shard_names:
+                    os.remove(os.path.join(archive_folder, name))
+        if shard_names:
+            os.makedirs(archive_folder, exist_ok=True)
+            for name in shard_names:
+                os.replace(os.path.join(staging, 'archive', name), os.path.join(archive_folder, name))
+        _swap_database(os.path.join(staging, DATABASE_NAME), live_db)
+
+        with app.app_context():
+            # Staršie exporty majú staršiu schému
+            migrate()
+        app.extensions['dennik_cache'].clear()
+
+        result = {'uploads': len(members['upload']), 'archived_years': len(shard_names)}
+        job.update(status='done', phase=None, result=result, finished_at=datetime.now())
+        return job
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+def _run_job(app, job, lock, slot=None):
+    try:
+        restore_archive(app, job.zip_path, job)
+    except Exception as e:
+        job.update(status='failed', error=str(e), finished_at=datetime.now())
+        print(f'[RESTORE] Obnova {job.id} zlyhala: {e}', file=sys.stderr)
+    finally:
+        lock.release()
+        if slot is not None:
+            slot.close()  # slot limitu 'bulk' z routy - zatvorenie uvoľní flock
+        try:
+            os.remove(job.zip_path)
+        except OSError:
+            pass
+
+
+def start_restore(app, zip_path, slot=None):
+    """Spustí obnovu na pozadí; naraz môže bežať iba jedna
+
+    `slot` (držaný slot limitu, napr. 'bulk') sa uvoľní až po dobehnutí
+    obnovy; ak sa obnova nespustí, zostáva volajúcemu.
+    """
+    jobs = app.extensions.setdefault('dennik_restore_jobs', {})
+    lock = app.extensions.setdefault('dennik_restore_lock', threading.Lock())
+    if not lock.acquire(blocking=False):
+        raise RestoreError('Obnova už prebieha')
+    job = RestoreJob(zip_path)
+    # Staré dokončené úlohy netreba držať donekonečna
+    for old_id in [key for key, old in jobs.items() if old.finished_at][:-MAX_FINISHED_JOBS]:
+        jobs.pop(old_id, None)
+    jobs[job.id] = job
+    threading.Thread(target=_run_job, args=(app, job, lock, slot), name=f'dennik-restore-{job.id}', daemon=True).start()
+    return job
+
+
+def restore_job(app, job_id):
+    return app.extensions.get('dennik_restore_jobs', {}).get(job_id)
+
+
+def wait_for(job, interval=0.5, report=None):
+    """Pre CLI - čaká na dokončenie a priebežne volá report(job_dict)"""
+    while True:
+        state = job.to_dict()
+        if report:
+            report(state)
+        if state['status'] in ('done', 'failed'):
+            return state
+        time.sleep(interval)
@@ -1,99 +1,137 @@
-from flask import Blueprint, render_template, request, jsonify, redirect, url_for, send_from_directory, send_file
+from flask import Blueprint, render_template, request, jsonify, redirect, url_for, send_from_directory, send_file, current_app
 import subprocess
 import shutil
 import sys
 from datetime import datetime, date
 from app.models import db, Entry, Category, Settings, Attachment
+from app.filters import parse_entry_filters, compile_entry_query, FilterError
+from app.stats import build_timeline, parse_timeline_range, GRANULARITIES
+from app.cache import cached
+from app.extraction import schedule_extraction
+from app.backup import backup_database
+from app.scrubber import scrub_report
+from app.profiling import is_admin
+from app.limits import LimitExceeded, limit_response, limited, limiter
+from app.journals import dispatcher, list_journals
+from app.tasks import enqueue, queue_stats, retry_task, worker
+from app.suggest import suggest, DEFAULT_LIMIT as DEFAULT_SUGGEST_LIMIT
+from app.restore import write_export_manifest, start_restore, restore_job, spool_stream, RestoreError
+from app.shards import (ArchivedYearError, check_writable_year, years_for_filters, exclude_archived,
+                        find_archived, paginate_entries, count_by, daily_counts_all, archived_years)
+from sqlalchemy.orm import selectinload
 from sqlalchemy import and_, or_, desc, asc, extract
 from werkzeug.utils import secure_filename
 import os
 import uuid
+from functools import wraps
 
 main = Blueprint('main', __name__)
 
+def entry_with_details(entry, category=None):
+    """Záznam s kategóriou (a nadkategóriou) a prílohami pre API"""
+    entry_dict = entry.to_dict()
+    # Záznamy zo shardov nemajú kategórie vo svojej databáze - dostanú ich zvonka
+    category = category if category is not None else entry.category
+    if category:
+        entry_dict['category'] = category.to_dict()
+        # Pridaj parent kategóriu ak existuje
+        if category.parent:
+            entry_dict['category']['parent'] = category.parent.to_dict()
+    # Pridaj prílohy
+    entry_dict['attachments'] = [att.to_dict() for att in entry.attachments]
+    return entry_dict
+
+def _archived_entry_with_details(entry):
+    return entry_with_details(entry, db.session.get(Category, entry.category_id))
+
+def _find_attachment(attachment_id):
+    """Príloha z hlavnej databázy alebo z archivovaného roka"""
+    attachment = db.session.get(Attachment, attachment_id)
+    if attachment is None:
+        attachment = find_archived(Attachment, attachment_id)
+    return attachment
+
+def bootstrap_data():
+    """Počiatočný stav stránky: kategórie, roky, prvá strana záznamov a štatistiky"""
+    return cached(('bootstrap',), lambda: {
+        'categories': category_tree(),
+        'years': year_list(),
+        'entries': entries_page(parse_entry_filters({})),
+        'stats': stats_data(),
+    })
+
 @main.route('/')
 def index():
-    """Hlavná stránka denníka"""
-    return render_template('index.html')
+    """Hlavná stránka denníka (počiatočný stav je vložený priamo do HTML)"""
+    try:
+        bootstrap = bootstrap_data()
+    except Exception as e:
+        # Stránka sa musí zobraziť aj tak - app.js si dáta dotiahne cez API
+        print(f'[BOOTSTRAP] {e}', file=sys.stderr)
+        bootstrap = None
+    return render_template('index.html', bootstrap=bootstrap)
+
+@main.route('/api/bootstrap', methods=['GET'])
+def get_bootstrap():
+    """Všetko pre prvé zobrazenie jedným requestom"""
+    try:
+        return jsonify(bootstrap_data())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
 @main.route('/api/entries', methods=['GET'])
 def get_entries():
     """Získať zoznamy záznamov s filtrovaním"""
     try:
-        # Parametre filtrovania
-        year = request.args.get('year', type=int)
-        month = request.args.get('month', type=int)
-        category_id = request.args.get('category_id', type=int)
-        search = request.args.get('search', '')
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 20, type=int)
-        
-        # Základný query
-        query = Entry.query
-        
-        # Filtrovanie podľa roku
-        if year:
-            query = query.filter(Entry.year == year)
-        
-        # Filtrovanie podľa mesiaca
-        if month and year:
-            query = query.filter(and_(Entry.year == year, Entry.month == month))
-        
-        # Filtrovanie podľa kategórie (vrátane podkategórií)
-        if category_id:
-            # Nájsť kategóriu a všetky jej podkategórie
-            category = Category.query.get(category_id)
-            if category:
-                category_ids = [category_id]
-                # Ak je to nadkategória, pridaj všetky podkategórie
-                if category.children:
-                    category_ids.extend([child.id for child in category.children])
-                query = query.filter(Entry.category_id.in_(category_ids))
-        
-        # Vyhľadávanie v názve a obsahu
-        if search:
-            search_term = f'%{search}%'
-            query = query.filter(
-                or_(
-                    Entry.title.ilike(search_term),
-                    Entry.content.ilike(search_term)
-                )
-            )
+        # Parametre filtrovania (rozsahy dátumov, viac kategórií, prílohy, triedenie)
+        try:
+            filters = parse_entry_filters(request.args)
+        except FilterError as e:
+            return jsonify({'error': str(e)}), 400
         
-        # Triedenie (najnovšie najprv)
-        query = query.order_by(desc(Entry.date), desc(Entry.time))
+        return jsonify(entries_page(filters))
         
-        # Paginácia
-        pagination = query.paginate(
-            page=page, 
-            per_page=per_page, 
-            error_out=False
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def entries_page(filters):
+    """{'entries': [...], 'pagination': {...}} pre rozparsované filtre"""
+    query = exclude_archived(compile_entry_query(filters))
+    
+    # Archivované roky, ktorých sa filtre týkajú, sa spoja s hlavnou databázou
+    shard_years = years_for_filters(filters)
+    if shard_years:
+        entries, pagination_info = paginate_entries(
+            filters, query, shard_years, _archived_entry_with_details
         )
-        
-        entries = []
-        for entry in pagination.items:
-            entry_dict = entry.to_dict()
-            # Pridaj info o kategórii
-            if entry.category:
-                entry_dict['category'] = entry.category.to_dict()
-                # Pridaj parent kategóriu ak existuje
-                if entry.category.parent:
-                    entry_dict['category']['parent'] = entry.category.parent.to_dict()
-            # Pridaj prílohy
-            entry_dict['attachments'] = [att.to_dict() for att in entry.attachments]
-            entries.append(entry_dict)
-        
-        return jsonify({
-            'entries': entries,
-            'pagination': {
-                'page': pagination.page,
-                'pages': pagination.pages,
-                'per_page': pagination.per_page,
-                'total': pagination.total,
-                'has_next': pagination.has_next,
-                'has_prev': pagination.has_prev
-            }
-        })
+        return {'entries': entries, 'pagination': pagination_info}
+    
+    # Paginácia
+    pagination = query.paginate(
+        page=filters['page'], 
+        per_page=filters['per_page'], 
+        error_out=False
+    )
+    
+    return {
+        'entries': [entry_with_details(entry) for entry in pagination.items],
+        'pagination': {
+            'page': pagination.page,
+            'pages': pagination.pages,
+            'per_page': pagination.per_page,
+            'total': pagination.total,
+            'has_next': pagination.has_next,
+            'has_prev': pagination.has_prev
+        }
+    }
+
+@main.route('/api/suggest', methods=['GET'])
+def get_suggestions():
+    """Návrhy pre vyhľadávanie pri písaní (názvy, kategórie, časté slová)"""
+    try:
+        prefix = request.args.get('q', '')
+        limit = request.args.get('limit', DEFAULT_SUGGEST_LIMIT, type=int)
+        return jsonify({'suggestions': suggest(prefix, limit)})
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -133,6 +171,12 @@ def create_entry():
             except ValueError:
                 return jsonify({'error': 'Neplatný formát času'}), 400
         
+        # Archivované roky sú iba na čítanie
+        try:
+            check_writable_year(entry_date.year)
+        except ArchivedYearError as e:
+            return jsonify({'error': str(e)}), 409
+        
         # Vytvorenie záznamu
         entry = Entry(
             title=data['title'],
@@ -158,28 +202,37 @@ def create_entry():
 def get_entry(entry_id):
     """Získať konkrétny záznam"""
     try:
-        entry = Entry.query.get_or_404(entry_id)
-        entry_dict = entry.to_dict()
-        
-        # Pridaj info o kategórii
-        if entry.category:
-            entry_dict['category'] = entry.category.to_dict()
-            if entry.category.parent:
-                entry_dict['category']['parent'] = entry.category.parent.to_dict()
-        
-        # Pridaj prílohy
-        entry_dict['attachments'] = [att.to_dict() for att in entry.attachments]
-        
-        return jsonify({'entry': entry_dict})
+        entry = db.session.get(Entry, entry_id)
+        if entry is None:
+            # Záznam môže byť v archivovanom roku (iba na čítanie)
+            archived = find_archived(Entry, entry_id, selectinload(Entry.attachments))
+            if archived is None:
+                return jsonify({'error': 'Záznam neexistuje'}), 404
+            entry_dict = _archived_entry_with_details(archived)
+            entry_dict['archived'] = True
+            return jsonify({'entry': entry_dict})
+        
+        return jsonify({'entry': entry_with_details(entry)})
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def _writable_entry(entry_id):
+    """(záznam, None) alebo (None, chybová odpoveď) - archivovaný rok je iba na čítanie"""
+    entry = db.session.get(Entry, entry_id)
+    if entry is not None and entry.year not in archived_years():
+        return entry, None
+    if entry is not None or find_archived(Entry, entry_id) is not None:
+        return None, (jsonify({'error': 'Záznam patrí archivovanému roku (iba na čítanie)'}), 409)
+    return None, (jsonify({'error': 'Záznam neexistuje'}), 404)
+
 @main.route('/api/entries/<int:entry_id>', methods=['PUT'])
 def update_entry(entry_id):
     """Aktualizovať záznam"""
     try:
-        entry = Entry.query.get_or_404(entry_id)
+        entry, error = _writable_entry(entry_id)
+        if error:
+            return error
         data = request.get_json()
         
         # Aktualizuj polia ak sú poskytnuté
@@ -197,11 +250,14 @@ def update_entry(entry_id):
         if 'date' in data:
             try:
                 entry_date = datetime.strptime(data['date'], '%Y-%m-%d').date()
+                check_writable_year(entry_date.year)
                 entry.date = entry_date
                 entry.year = entry_date.year
                 entry.month = entry_date.month
             except ValueError:
                 return jsonify({'error': 'Neplatný formát dátumu'}), 400
+            except ArchivedYearError as e:
+                return jsonify({'error': str(e)}), 409
         
         if 'time' in data:
             try:
@@ -225,8 +281,14 @@ def update_entry(entry_id):
 def delete_entry(entry_id):
     """Zmazať záznam"""
     try:
-        entry = Entry.query.get_or_404(entry_id)
+        entry, error = _writable_entry(entry_id)
+        if error:
+            return error
+        filenames = [attachment.filename for attachment in entry.attachments]
         db.session.delete(entry)
+        # Súbory príloh zmaže front úloh až po úspešnom commite
+        for filename in filenames:
+            enqueue('remove_upload', {'filename': filename}, key=f'remove_upload:{filename}')
         db.session.commit()
         
         return jsonify({'message': 'Záznam úspešne zmazaný'})
@@ -239,6 +301,14 @@ def delete_entry(entry_id):
 def get_categories():
     """Získať hierarchické kategórie"""
     try:
+        return jsonify({'categories': category_tree()})
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def category_tree():
+    """Aktívne hlavné kategórie s podkategóriami (v cache do ďalšej zmeny dát)"""
+    def build():
         # Získaj všetky kategórie
         all_categories = Category.query.filter_by(active=True).all()
         
@@ -254,11 +324,8 @@ def get_categories():
                         subcategories.append(child.to_dict())
                 category_dict['subcategories'] = subcategories
                 main_categories.append(category_dict)
-        
-        return jsonify({'categories': main_categories})
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return main_categories
+    return cached(('categories',), build)
 
 @main.route('/api/categories/flat', methods=['GET'])
 def get_categories_flat():
@@ -309,13 +376,19 @@ def get_subcategories(parent_id):
 def get_years():
     """Získať dostupné roky pre filtrovanie"""
     try:
-        years = db.session.query(Entry.year).distinct().order_by(desc(Entry.year)).all()
-        year_list = [year[0] for year in years]
-        return jsonify({'years': year_list})
+        return jsonify({'years': year_list()})
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def year_list():
+    """Roky so záznamami od najnovšieho (v cache do ďalšej zmeny dát)"""
+    def build():
+        years = exclude_archived(db.session.query(Entry.year).distinct()).all()
+        # Archivované roky sú v samostatných súboroch (shardoch)
+        return sorted({year[0] for year in years} | set(archived_years()), reverse=True)
+    return cached(('years',), build)
+
 @main.route('/api/categories', methods=['POST'])
 def create_category():
     """Vytvoriť novú kategóriu"""
@@ -412,7 +485,7 @@ def delete_category(category_id):
         category = Category.query.get_or_404(category_id)
         
         # Kontrola či kategória má záznamy
-        entries_count = Entry.query.filter_by(category_id=category_id).count()
+        entries_count = count_by(Entry.category_id).get(category_id, 0)
         if entries_count > 0:
             return jsonify({
                 'error': f'Kategória obsahuje {entries_count} záznamov. Najprv ich presuň alebo zmaž.'
@@ -444,58 +517,86 @@ def get_stats():
     """Získať štatistiky denníka"""
     try:
         year = request.args.get('year', type=int)
+        return jsonify(stats_data(year))
         
-        # Základné štatistiky
-        total_entries = Entry.query.count()
-        
-        # Štatistiky pre konkrétny rok
-        if year:
-            year_entries = Entry.query.filter(Entry.year == year).count()
-            
-            # Počty podľa kategórií
-            category_stats = db.session.query(
-                Category.name,
-                Category.icon,
-                Category.color,
-                db.func.count(Entry.id).label('count')
-            ).join(Entry).filter(Entry.year == year).group_by(Category.id).all()
-            
-            # Počty podľa mesiacov
-            month_stats = db.session.query(
-                Entry.month,
-                db.func.count(Entry.id).label('count')
-            ).filter(Entry.year == year).group_by(Entry.month).order_by(Entry.month).all()
-            
-        else:
-            year_entries = total_entries
-            category_stats = db.session.query(
-                Category.name,
-                Category.icon,
-                Category.color,
-                db.func.count(Entry.id).label('count')
-            ).join(Entry).group_by(Category.id).all()
-            month_stats = []
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def stats_data(year=None):
+    """Počty záznamov celkovo, za rok, podľa kategórií a mesiacov (v cache do ďalšej zmeny dát)"""
+    return cached(('stats', year), lambda: _compute_stats(year))
+
+def _compute_stats(year):
+    # Počty sa zbierajú z hlavnej databázy aj archivovaných rokov (shardov)
+    total_entries = sum(count_by(Entry.year).values())
+    
+    # Štatistiky pre konkrétny rok
+    if year:
+        category_counts = count_by(Entry.category_id, year=year)
+        year_entries = sum(category_counts.values())
+        
+        # Počty podľa mesiacov
+        month_stats = sorted(count_by(Entry.month, year=year).items())
+        
+    else:
+        year_entries = total_entries
+        category_counts = count_by(Entry.category_id)
+        month_stats = []
+    
+    # Počty podľa kategórií (metadáta kategórií sú v hlavnej databáze)
+    categories_by_id = {
+        category.id: category
+        for category in Category.query.filter(Category.id.in_(list(category_counts))).all()
+    }
+    category_stats = [
+        (categories_by_id[category_id].name, categories_by_id[category_id].icon,
+         categories_by_id[category_id].color, count)
+        for category_id, count in category_counts.items()
+        if category_id in categories_by_id
+    ]
+    
+    return {
+        'total_entries': total_entries,
+        'year_entries': year_entries,
+        'categories': [
+            {
+                'name': stat[0],
+                'icon': stat[1],
+                'color': stat[2],
+                'count': stat[3]
+            }
+            for stat in category_stats
+        ],
+        'months': [
+            {
+                'month': stat[0],
+                'count': stat[1]
+            }
+            for stat in month_stats
+        ]
+    }
+
+@main.route('/api/stats/timeline', methods=['GET'])
+def get_timeline():
+    """Počty záznamov po dňoch/týždňoch/mesiacoch pre heatmapu a časovú os"""
+    try:
+        granularity = request.args.get('granularity', 'day')
+        if granularity not in GRANULARITIES:
+            return jsonify({'error': 'Neplatná granularita (day, week, month)'}), 400
+        by_category = request.args.get('by_category') in ('1', 'true')
         
-        return jsonify({
-            'total_entries': total_entries,
-            'year_entries': year_entries,
-            'categories': [
-                {
-                    'name': stat[0],
-                    'icon': stat[1],
-                    'color': stat[2],
-                    'count': stat[3]
-                }
-                for stat in category_stats
-            ],
-            'months': [
-                {
-                    'month': stat[0],
-                    'count': stat[1]
-                }
-                for stat in month_stats
-            ]
-        })
+        try:
+            date_from, date_to = parse_timeline_range(request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # Výsledok je v cache až do ďalšej zmeny dát
+        timeline = cached(
+            ('timeline', date_from, date_to, granularity, by_category),
+            lambda: build_timeline(date_from, date_to, granularity, by_category,
+                                   rows=daily_counts_all(date_from, date_to, by_category))
+        )
+        return jsonify(timeline)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -506,17 +607,33 @@ UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'upload
 ALLOWED_EXTENSIONS = {'pdf', 'png', 'jpg', 'jpeg', 'gif', 'txt', 'doc', 'docx', 'xls', 'xlsx', 'zip', 'eml', 'msg'}
 MAX_FILE_SIZE = 16 * 1024 * 1024  # 16 MB
 
+def upload_folder():
+    """Priečinok príloh aktuálnej aplikácie (config UPLOAD_FOLDER)"""
+    return current_app.config['UPLOAD_FOLDER']
+
+def remove_upload(filename):
+    """Zmaže súbor prílohy; chyba nevadí (osirelý súbor zoberie kontrola príloh)"""
+    try:
+        os.remove(os.path.join(upload_folder(), filename))
+    except OSError:
+        pass
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 @main.route('/api/entries/<int:entry_id>/attachments', methods=['POST'])
+@limited('upload')
 def upload_attachment(entry_id):
     """Nahrať prílohu k záznamu"""
+    saved_path = None  # uložený súbor, ku ktorému ešte nie je commitnutý riadok
     try:
         # Overiť, že záznam existuje
         entry = Entry.query.get(entry_id)
         if not entry:
             return jsonify({'error': 'Záznam neexistuje'}), 404
+        # Jediné spojenie zapisovača vrátiť do poolu ešte pred ukladaním súboru -
+        # inak by ho upload držal počas celého zápisu na disk a ostatné zápisy by čakali
+        db.session.close()
 
         # Overiť, že súbor bol nahraný
         if 'file' not in request.files:
@@ -529,14 +646,23 @@ def upload_attachment(entry_id):
         if not allowed_file(file.filename):
             return jsonify({'error': 'Nepovolený typ súboru'}), 400
 
+        # Veľkosť z nahraného streamu - neplatný súbor sa na disk vôbec nezapíše
+        file.stream.seek(0, os.SEEK_END)
+        file_size = file.stream.tell()
+        file.stream.seek(0)
+        if file_size == 0:
+            return jsonify({'error': 'Súbor je prázdny'}), 400
+        if file_size > MAX_FILE_SIZE:
+            return jsonify({'error': 'Súbor je príliš veľký'}), 400
+
         # Generovať bezpečný názov súboru
         original_filename = secure_filename(file.filename)
         file_ext = original_filename.rsplit('.', 1)[1].lower()
         unique_filename = f"{uuid.uuid4().hex}.{file_ext}"
 
         # Uložiť súbor
-        os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-        file_path = os.path.join(UPLOAD_FOLDER, unique_filename)
+        os.makedirs(upload_folder(), exist_ok=True)
+        file_path = os.path.join(upload_folder(), unique_filename)
 
         try:
             file.save(file_path)
@@ -548,30 +674,7 @@ def upload_attachment(entry_id):
                 except Exception:
                     pass
             return jsonify({'error': f'Chyba pri ukladaní súboru: {save_exc}'}), 500
-
-        # Získať veľkosť súboru
-        file_size = os.path.getsize(file_path)
-
-        # Kontrola veľkosti a validity súboru
-        if file_size == 0:
-            try:
-                os.remove(file_path)
-            except Exception:
-                pass
-            return jsonify({'error': 'Súbor je prázdny'}), 400
-
-        if file_size > MAX_FILE_SIZE:
-            try:
-                os.remove(file_path)
-            except Exception:
-                pass
-            return jsonify({'error': 'Súbor je príliš veľký'}), 400
-
-        # Nastaviť čitateľné povolenia pre súbor
-        try:
-            os.chmod(file_path, 0o644)
-        except Exception:
-            pass
+        saved_path = file_path
 
         # Vytvoriť záznam v databáze
         attachment = Attachment(
@@ -582,7 +685,14 @@ def upload_attachment(entry_id):
             mime_type=file.content_type
         )
         db.session.add(attachment)
+        # Práva súboru a referenčný hash pre kontrolu príloh - po commite na pozadí
+        enqueue('finalize_upload', {'filename': unique_filename, 'file_size': file_size},
+                key=f'finalize_upload:{unique_filename}')
         db.session.commit()
+        saved_path = None
+
+        # Extrakcia textu pre vyhľadávanie beží na pozadí (neblokuje upload)
+        schedule_extraction(current_app._get_current_object(), attachment, file_path)
 
         return jsonify({
             'success': True,
@@ -591,17 +701,19 @@ def upload_attachment(entry_id):
 
     except Exception as e:
         db.session.rollback()
+        if saved_path:
+            remove_upload(os.path.basename(saved_path))
         return jsonify({'error': str(e)}), 500
 
 @main.route('/api/attachments/<int:attachment_id>', methods=['GET'])
 def download_attachment(attachment_id):
     """Stiahnuť (alebo zobraziť) prílohu"""
     try:
-        attachment = Attachment.query.get(attachment_id)
+        attachment = _find_attachment(attachment_id)
         if not attachment:
             return jsonify({'error': 'Príloha neexistuje'}), 404
 
-        file_path = os.path.join(UPLOAD_FOLDER, attachment.filename)
+        file_path = os.path.join(upload_folder(), attachment.filename)
         if not os.path.exists(file_path):
             return jsonify({'error': 'Súbor neexistuje'}), 404
 
@@ -663,7 +775,7 @@ def download_attachment(attachment_id):
 def viewer_pdf(attachment_id):
     """Zobraziť PDF pomocou integrovaného vieweru (PDF.js)"""
     from flask import abort
-    attachment = Attachment.query.get(attachment_id)
+    attachment = _find_attachment(attachment_id)
     if not attachment:
         abort(404)
     # Použiť URL endpointu pre stiahnutie/prenos súboru
@@ -674,11 +786,11 @@ def viewer_pdf(attachment_id):
 @main.route('/api/attachments/<int:attachment_id>/open', methods=['POST'])
 def open_attachment_local(attachment_id):
     """Spustiť lokálnu aplikáciu na otvorenie prílohy (evince/xdg-open). Užívané iba pre lokálne nasadenie."""
-    attachment = Attachment.query.get(attachment_id)
+    attachment = _find_attachment(attachment_id)
     if not attachment:
         return jsonify({'error': 'Príloha neexistuje'}), 404
     
-    file_path = os.path.join(UPLOAD_FOLDER, attachment.filename)
+    file_path = os.path.join(upload_folder(), attachment.filename)
     if not os.path.exists(file_path):
         return jsonify({'error': 'Súbor neexistuje'}), 404
     
@@ -733,10 +845,10 @@ def open_attachment_local(attachment_id):
 @main.route('/api/attachments/<int:attachment_id>/open_folder', methods=['POST'])
 def open_attachment_folder(attachment_id):
     """Otvoriť priečinok uploads/ v lokálnom správcovi súborov"""
-    attachment = Attachment.query.get(attachment_id)
+    attachment = _find_attachment(attachment_id)
     if not attachment:
         return jsonify({'error': 'Príloha neexistuje'}), 404
-    folder = os.path.abspath(UPLOAD_FOLDER)
+    folder = os.path.abspath(upload_folder())
     if not os.path.isdir(folder):
         return jsonify({'error': 'Priečinok neexistuje'}), 404
     try:
@@ -758,15 +870,14 @@ def delete_attachment(attachment_id):
     try:
         attachment = Attachment.query.get(attachment_id)
         if not attachment:
+            if find_archived(Attachment, attachment_id) is not None:
+                return jsonify({'error': 'Príloha patrí archivovanému roku (iba na čítanie)'}), 409
             return jsonify({'error': 'Príloha neexistuje'}), 404
         
-        # Zmazať súbor z disku
-        file_path = os.path.join(UPLOAD_FOLDER, attachment.filename)
-        if os.path.exists(file_path):
-            os.remove(file_path)
-        
-        # Zmazať záznam z databázy
+        # Súbor zmaže front úloh po commite - ak commit zlyhá, úloha nevznikne a súbor ostane
+        filename = attachment.filename
         db.session.delete(attachment)
+        enqueue('remove_upload', {'filename': filename}, key=f'remove_upload:{filename}')
         db.session.commit()
         
         return jsonify({'success': True})
@@ -775,55 +886,245 @@ def delete_attachment(attachment_id):
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+# === ADMIN ===
+
+def _admin_error():
+    """None alebo chybová odpoveď 403 - admin endpointy vyžadujú token v hlavičke X-Dennik-Profile"""
+    if not current_app.config.get('DENNIK_PROFILE_TOKEN'):
+        return jsonify({'error': 'Admin endpointy vyžadujú nastavený DENNIK_PROFILE_TOKEN'}), 403
+    if not is_admin(current_app):
+        return jsonify({'error': 'Chýba alebo nesedí token v hlavičke X-Dennik-Profile'}), 403
+    return None
+
+def admin_required(view):
+    """Dekorátor routy: iba s platným admin tokenom (rovnaký ako pre profily)"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        error = _admin_error()
+        if error:
+            return error
+        return view(*args, **kwargs)
+    return wrapper
+
+# === KONTROLA PRÍLOH ===
+
+@main.route('/api/admin/scrub', methods=['GET'])
+@admin_required
+def scrub_status():
+    """Výsledok kontroly príloh (chýbajúce, poškodené, osirelé súbory)"""
+    try:
+        service = current_app.extensions['dennik_scrub']
+        report = scrub_report()
+        report['running'] = service.running
+        report['last_result'] = service.last_result
+        return jsonify(report)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@main.route('/api/admin/scrub', methods=['POST'])
+@admin_required
+def start_scrub():
+    """Spustiť kontrolu príloh na pozadí"""
+    try:
+        if not current_app.extensions['dennik_scrub'].trigger():
+            return jsonify({'error': 'Kontrola príloh už prebieha'}), 409
+        return jsonify({'success': True}), 202
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@main.route('/api/admin/limits', methods=['GET'])
+@admin_required
+def limits_status():
+    """Obsadenosť slotov a dĺžka frontov limitov súbežnosti"""
+    try:
+        return jsonify({name: limiter(name).status() for name in current_app.config['DENNIK_LIMITS']})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@main.route('/api/admin/tasks', methods=['GET'])
+@admin_required
+def tasks_status():
+    """Hĺbka frontu úloh na pozadí a posledné zlyhané úlohy"""
+    try:
+        stats = queue_stats()
+        service = worker()
+        stats['worker'] = service.status() if service is not None else None
+        return jsonify(stats)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@main.route('/api/admin/tasks/<int:task_id>/retry', methods=['POST'])
+@admin_required
+def retry_failed_task(task_id):
+    """Zlyhanú úlohu zaradí znova"""
+    try:
+        if not retry_task(task_id):
+            return jsonify({'error': 'Úloha neexistuje alebo nie je zlyhaná'}), 404
+        return jsonify({'success': True})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@main.route('/api/admin/journals', methods=['GET'])
+@admin_required
+def journals_status():
+    """Existujúce a práve otvorené denníky (iba v hlavnom denníku)"""
+    try:
+        journals = dispatcher(current_app)
+        if journals is None:
+            return jsonify({'error': 'Denníky sú dostupné iba z hlavného denníka'}), 404
+        status = journals.pool.status()
+        status['journals'] = list_journals(current_app)
+        return jsonify(status)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# === PROFILOVANIE ===
+
+def _profiler_or_error():
+    """(profiler, None) alebo (None, chybová odpoveď)"""
+    profiler = current_app.extensions.get('dennik_profiler')
+    if profiler is None:
+        return None, (jsonify({'error': 'Profilovanie nie je zapnuté'}), 404)
+    # Profily obsahujú SQL a zásobníky - bez nastaveného tokenu ich nikto nedostane
+    error = _admin_error()
+    if error:
+        return None, error
+    return profiler, None
+
+@main.route('/api/admin/profiles', methods=['GET'])
+def list_profiles():
+    """Zoznam uložených profilov requestov"""
+    try:
+        profiler, error = _profiler_or_error()
+        if error:
+            return error
+        return jsonify({'profiles': profiler.list()})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@main.route('/api/admin/profiles/<path:filename>', methods=['GET'])
+def get_profile(filename):
+    """Súbor profilu (.folded pre flamegraph, .json s časovou osou SQL)"""
+    try:
+        profiler, error = _profiler_or_error()
+        if error:
+            return error
+        path = profiler.path(filename)
+        if path is None:
+            return jsonify({'error': 'Profil neexistuje'}), 404
+        return send_file(path, mimetype='text/plain' if filename.endswith('.folded') else 'application/json')
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 # === ARCHIVÁCIA ===
 
-@main.route('/api/archive/export', methods=['GET'])
-def export_archive():
-    """Export celého denníka do ZIP (databáza + prílohy)"""
+def export_filename():
+    return f'dennik_zaloha_{datetime.now().strftime("%Y%m%d")}.zip'
+
+def build_export_archive():
+    """Vytvorí ZIP exportu (databáza + prílohy + archivované roky); vráti cestu k súboru"""
+    import zipfile
+    
+    # Vytvor dočasný priečinok pre archív
+    archive_dir = os.path.join('/tmp', f'dennik_export_{uuid.uuid4().hex}')
+    os.makedirs(archive_dir, exist_ok=True)
+    
     try:
-        import zipfile
-        import shutil
-        from flask import send_file
-        
-        # Vytvor dočasný priečinok pre archív
-        archive_dir = os.path.join('/tmp', f'dennik_export_{uuid.uuid4().hex}')
-        os.makedirs(archive_dir, exist_ok=True)
-        
-        # Skopíruj databázu
-        db_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'instance', 'dennik.db')
+        # Skopíruj databázu (online backup API - konzistentná kópia aj počas zápisov)
+        db_path = db.engine.url.database
         if os.path.exists(db_path):
-            shutil.copy(db_path, os.path.join(archive_dir, 'dennik.db'))
+            backup_database(db_path, os.path.join(archive_dir, 'dennik.db'))
         
         # Skopíruj prílohy
-        if os.path.exists(UPLOAD_FOLDER):
+        if os.path.exists(upload_folder()):
             uploads_archive = os.path.join(archive_dir, 'uploads')
-            shutil.copytree(UPLOAD_FOLDER, uploads_archive)
+            shutil.copytree(upload_folder(), uploads_archive)
+        
+        # Archivované roky (read-only shardy sa nemenia, stačí obyčajná kópia)
+        shard_files = archived_years()
+        if shard_files:
+            os.makedirs(os.path.join(archive_dir, 'archive'), exist_ok=True)
+            for path in shard_files.values():
+                shutil.copy(path, os.path.join(archive_dir, 'archive', os.path.basename(path)))
+        
+        # Manifest s kontrolnými súčtami príloh pre obnovu
+        write_export_manifest(archive_dir)
         
         # Vytvor ZIP
-        zip_path = os.path.join('/tmp', f'dennik_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}.zip')
+        zip_path = os.path.join('/tmp', f'dennik_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}_{uuid.uuid4().hex[:6]}.zip')
         with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
             for root, dirs, files in os.walk(archive_dir):
                 for file in files:
                     file_path = os.path.join(root, file)
                     arcname = os.path.relpath(file_path, archive_dir)
                     zipf.write(file_path, arcname)
-        
+        return zip_path
+    finally:
         # Vyčistiť dočasný priečinok
-        shutil.rmtree(archive_dir)
+        shutil.rmtree(archive_dir, ignore_errors=True)
+
+@main.route('/api/archive/export', methods=['GET'])
+@limited('export', until_sent=True)
+def export_archive():
+    """Export celého denníka do ZIP (databáza + prílohy + archivované roky)"""
+    try:
+        zip_path = build_export_archive()
         
         # Použiť send_file s fallbackom pre kompatibilitu s rôznymi verziami Flask
         try:
             return send_file(
                 zip_path,
                 as_attachment=True,
-                download_name=f'dennik_zaloha_{datetime.now().strftime("%Y%m%d")}.zip'
+                download_name=export_filename()
             )
         except TypeError:
             return send_file(
                 zip_path,
                 as_attachment=True,
-                attachment_filename=f'dennik_zaloha_{datetime.now().strftime("%Y%m%d")}.zip'
+                attachment_filename=export_filename()
             )
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
+
+@main.route('/api/archive/import', methods=['POST'])
+@admin_required
+def import_archive():
+    """Obnova denníka zo ZIP exportu - beží na pozadí, priebeh cez GET /api/archive/import/<job_id>"""
+    # Slot 'bulk' sa drží počas uloženia ZIP aj celej obnovy na pozadí (uvoľní ho RestoreJob)
+    try:
+        slot = limiter('bulk').acquire()
+    except LimitExceeded as e:
+        return limit_response(e)
+    try:
+        # ZIP sa ukladá na disk po blokoch (nikdy nie celý v pamäti)
+        if 'file' in request.files:
+            zip_path = spool_stream(request.files['file'].stream)
+        elif request.mimetype in ('application/zip', 'application/octet-stream'):
+            zip_path = spool_stream(request.stream)
+        else:
+            slot.close()
+            return jsonify({'error': 'Žiadny súbor'}), 400
+        
+        try:
+            job = start_restore(current_app._get_current_object(), zip_path, slot)
+        except RestoreError as e:
+            slot.close()
+            os.remove(zip_path)
+            return jsonify({'error': str(e)}), 409
+        
+        return jsonify({'job': job.to_dict()}), 202
+        
+    except Exception as e:
+        slot.close()
+        return jsonify({'error': str(e)}), 500
+
+@main.route('/api/archive/import/<job_id>', methods=['GET'])
+@admin_required
+def import_archive_status(job_id):
+    """Priebeh obnovy"""
+    job = restore_job(current_app._get_current_object(), job_id)
+    if job is None:
+        return jsonify({'error': 'Obnova neexistuje'}), 404
+    return jsonify({'job': job.to_dict()})
@@ -0,0 +1,331 @@
+"""Kontrola integrity príloh a zber osirelých súborov
+
+Kontrola prechádza tabuľku Attachment po dávkach podľa ID - hlavnú
+databázu aj archivované roky (ID sú spoločné, archivovaný riadok si
+ponechá svoje). Pozícia sa ukladá do Settings ('scrub_cursor'), takže
+prerušený prechod pokračuje tam, kde skončil. Stav každého súboru drží tabuľka AttachmentFile:
+SHA-256 sa počíta iba pri prvom výskyte a keď sa zmení veľkosť alebo
+mtime (prípadne pri každom prechode s verify=True). Prílohy sa po
+nahraní nemenia, takže iný obsah než zaznamenaný znamená poškodenie.
+
+Na konci prechodu sa uploads/ porovná so všetkými odkazmi (hlavná
+databáza aj archivované roky). Súbor bez odkazu sa označí ako osirelý
+a zmaže sa až po lehote DENNIK_SCRUB_GRACE - dovtedy môže ísť o upload,
+ktorý ešte nestihol uložiť riadok do databázy.
+
+Čítanie súborov je obmedzené na DENNIK_SCRUB_RATE bajtov za sekundu a
+spojenie zapisovača sa počas I/O nedrží; zoznamy príloh sa čítajú cez
+reader_session() (app/db_routing.py).
+"""
+import fcntl
+import hashlib
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+from app.db_routing import reader_session
+from app.models import db, Attachment, AttachmentFile, Settings
+from app.shards import registry
+
+CURSOR_KEY = 'scrub_cursor'
+LAST_PASS_KEY = 'scrub_last_pass'
+DEFAULT_BATCH = 100
+DEFAULT_RATE = 8 * 1024 * 1024
+DEFAULT_GRACE = 24 * 3600
+READ_CHUNK = 256 * 1024
+REPORT_LIMIT = 100
+
+
+class Throttle:
+    """Obmedzenie priepustnosti čítania (bajty za sekundu, 0 = bez obmedzenia)"""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self._started = time.monotonic()
+        self._consumed = 0
+
+    def consume(self, count):
+        if not self.rate:
+            return
+        self._consumed += count
+        ahead = self._consumed / self.rate - (time.monotonic() - self._started)
+        if ahead > 0:
+            time.sleep(ahead)
+
+
+def hash_file(path, throttle):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(READ_CHUNK), b''):
+            digest.update(chunk)
+            throttle.consume(len(chunk))
+    return digest.hexdigest()
+
+
+def _get_setting(key):
+    return db.session.query(Settings.value).filter(Settings.key == key).scalar()
+
+
+def _set_setting(key, value):
+    setting = Settings.query.filter_by(key=key).first()
+    if setting is None:
+        db.session.add(Settings(key=key, value=str(value)))
+    else:
+        setting.value = str(value)
+
+
+def check_file(path, expected_size, known, throttle, verify=False):
+    """Nový stav súboru: dict(status, file_size, file_mtime, sha256)"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return {'status': 'missing'}
+    state = {'status': 'ok', 'file_size': stat.st_size, 'file_mtime': stat.st_mtime,
+             'sha256': known['sha256'] if known else None}
+    unchanged = (known is not None and known['sha256'] and known['file_size'] == stat.st_size
+                 and known['file_mtime'] == stat.st_mtime)
+    if unchanged and not verify:
+        if known['status'] == 'corrupt':
+            state['status'] = 'corrupt'
+        return state
+    digest = hash_file(path, throttle)
+    if state['sha256'] is None:
+        state['sha256'] = digest
+    # Zaznamenaný hash sa neprepisuje - slúži ako referencia pre ďalšie kontroly
+    if digest != state['sha256'] or (expected_size is not None and expected_size != stat.st_size):
+        state['status'] = 'corrupt'
+    return state
+
+
+def _known_states(*criteria):
+    """{filename: dict} - obyčajné hodnoty, aby sa po commite nenačítavali znova počas I/O"""
+    return {row.filename: row._asdict() for row in db.session.query(
+        AttachmentFile.filename, AttachmentFile.file_size, AttachmentFile.file_mtime,
+        AttachmentFile.sha256, AttachmentFile.status, AttachmentFile.since).filter(*criteria)}
+
+
+def _store_states(states, now):
+    existing = {f.filename: f for f in AttachmentFile.query.filter(AttachmentFile.filename.in_(list(states)))}
+    for filename, state in states.items():
+        record = existing.get(filename)
+        if record is None:
+            record = AttachmentFile(filename=filename)
+            db.session.add(record)
+        if state['status'] == 'ok':
+            record.since = None
+        elif state['status'] != record.status or record.since is None:
+            record.since = state.get('since') or now
+        record.status = state['status']
+        for field in ('file_size', 'file_mtime', 'sha256'):
+            if state.get(field) is not None:
+                setattr(record, field, state[field])
+        record.checked_at = now
+
+
+def _attachment_batch(cursor, batch_size):
+    """Ďalších `batch_size` príloh s ID > cursor z hlavnej databázy aj archivovaných rokov"""
+    def batch(session):
+        return (session.query(Attachment.id, Attachment.filename, Attachment.file_size)
+                .filter(Attachment.id > cursor).order_by(Attachment.id).limit(batch_size).all())
+
+    with reader_session() as session:
+        rows = batch(session)
+    shards = registry()
+    for year in shards.years():
+        session = shards.session(year)
+        try:
+            rows.extend(batch(session))
+        finally:
+            session.close()
+    return sorted(rows, key=lambda row: row.id)[:batch_size]
+
+
+def scrub_batch(upload_folder, batch_size=DEFAULT_BATCH, throttle=None, verify=False):
+    """Skontroluje ďalšiu dávku príloh od uloženej pozície; vráti (počet, koniec_tabuľky)"""
+    throttle = throttle or Throttle(0)
+    cursor = int(_get_setting(CURSOR_KEY) or 0)
+    rows = _attachment_batch(cursor, batch_size)
+    known = _known_states(AttachmentFile.filename.in_([row.filename for row in rows])) if rows else {}
+    # Počas čítania súborov nedrž spojenie zapisovača
+    db.session.commit()
+
+    states = {}
+    for row in rows:
+        states[row.filename] = check_file(os.path.join(upload_folder, row.filename), row.file_size,
+                                          known.get(row.filename), throttle, verify)
+
+    _store_states(states, datetime.utcnow())
+    finished = len(rows) < batch_size
+    _set_setting(CURSOR_KEY, 0 if finished else rows[-1].id)
+    db.session.commit()
+    return len(rows), finished
+
+
+def referenced_filenames():
+    """Názvy súborov, na ktoré odkazuje hlavná databáza alebo archivované roky"""
+    with reader_session() as session:
+        names = {name for (name,) in session.query(Attachment.filename)}
+    shards = registry()
+    for year in shards.years():
+        session = shards.session(year)
+        try:
+            names.update(name for (name,) in session.query(Attachment.filename))
+        finally:
+            session.close()
+    return names
+
+
+def sweep_orphans(upload_folder, grace=DEFAULT_GRACE, dry_run=False):
+    """Označí súbory bez odkazu a po lehote ich zmaže; vráti súhrn"""
+    referenced = referenced_filenames()
+    known = _known_states(AttachmentFile.status.in_(('orphan', 'missing')))
+    db.session.commit()
+
+    now = datetime.utcnow()
+    limit = now - timedelta(seconds=grace)
+    orphans, reclaimed, reclaimed_bytes = {}, 0, 0
+    on_disk = set()
+    if os.path.isdir(upload_folder):
+        for item in os.scandir(upload_folder):
+            if not item.is_file() or item.name.startswith('.'):
+                continue
+            on_disk.add(item.name)
+            if item.name in referenced:
+                continue
+            stat = item.stat()
+            state = known.get(item.name)
+            since = state['since'] if state and state['status'] == 'orphan' and state['since'] else now
+            if (since <= limit and datetime.utcfromtimestamp(stat.st_mtime) <= limit
+                    and not dry_run):
+                try:
+                    os.remove(item.path)
+                except OSError:
+                    continue
+                reclaimed += 1
+                reclaimed_bytes += stat.st_size
+                on_disk.discard(item.name)
+            else:
+                orphans[item.name] = {'status': 'orphan', 'since': since,
+                                      'file_size': stat.st_size, 'file_mtime': stat.st_mtime}
+
+    _store_states(orphans, now)
+    # Stav súborov, ktoré už nikto nepotrebuje (zmazané prílohy aj zmazané siroty)
+    stale = [name for name, state in known.items()
+             if name not in referenced and (state['status'] == 'missing' or name not in on_disk)]
+    if stale:
+        AttachmentFile.query.filter(AttachmentFile.filename.in_(stale)).delete(synchronize_session=False)
+    db.session.commit()
+    return {'orphans': len(orphans), 'reclaimed': reclaimed, 'reclaimed_bytes': reclaimed_bytes}
+
+
+def scrub_report():
+    """Počty podľa stavu, zoznam problémových súborov a pozícia prechodu"""
+    counts = dict(db.session.query(AttachmentFile.status, db.func.count()).group_by(AttachmentFile.status).all())
+    problems = (AttachmentFile.query.filter(AttachmentFile.status != 'ok')
+                .order_by(AttachmentFile.status, AttachmentFile.filename).limit(REPORT_LIMIT).all())
+    return {
+        'counts': counts,
+        'problems': [p.to_dict() for p in problems],
+        'cursor': int(_get_setting(CURSOR_KEY) or 0),
+        'last_pass': _get_setting(LAST_PASS_KEY),
+    }
+
+
+def _lock_path(app):
+    os.makedirs(app.instance_path, exist_ok=True)
+    return os.path.join(app.instance_path, 'scrub.lock')
+
+
+def run_scrub(app, verify=None, dry_run=False, stop=None):
+    """Dokončí rozbehnutý (alebo celý nový) prechod; None ak už kontrola beží inde"""
+    started = time.monotonic()
+    lock = open(_lock_path(app), 'w')
+    try:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return None
+        config = app.config
+        verify = config['DENNIK_SCRUB_VERIFY'] if verify is None else verify
+        throttle = Throttle(config['DENNIK_SCRUB_RATE'])
+        upload_folder = config['UPLOAD_FOLDER']
+        checked = 0
+        with app.app_context():
+            while True:
+                count, finished = scrub_batch(upload_folder, config['DENNIK_SCRUB_BATCH'], throttle, verify)
+                checked += count
+                if finished:
+                    break
+                if stop is not None and stop.is_set():
+                    return {'checked': checked, 'finished': False}
+            result = sweep_orphans(upload_folder, config['DENNIK_SCRUB_GRACE'], dry_run)
+            _set_setting(LAST_PASS_KEY, datetime.utcnow().isoformat())
+            db.session.commit()
+            result.update(scrub_report()['counts'])
+        result.update(checked=checked, finished=True, seconds=round(time.monotonic() - started, 3))
+        return result
+    finally:
+        lock.close()
+
+
+class ScrubService:
+    """Vlákno na pozadí: prechod každých `interval` sekúnd alebo na požiadanie"""
+
+    def __init__(self, app, interval):
+        self.app = app
+        self.interval = interval
+        self.running = False
+        self.last_result = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='dennik-scrub', daemon=True)
+                self._thread.start()
+
+    def trigger(self):
+        """Spustí prechod hneď; False ak práve beží"""
+        if self.running:
+            return False
+        self.start()
+        self._wake.set()
+        return True
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.interval or None)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            self.running = True
+            try:
+                self.last_result = run_scrub(self.app, stop=self._stop)
+                if self.last_result:
+                    print(f"[SCRUB] {self.last_result['checked']} príloh skontrolovaných, "
+                          f"{self.last_result.get('reclaimed', 0)} osirelých zmazaných", file=sys.stderr)
+            except Exception as e:
+                print(f'[SCRUB] Kontrola príloh zlyhala: {e}', file=sys.stderr)
+            finally:
+                self.running = False
+
+
+def init_scrubber(app):
+    app.config.setdefault('DENNIK_SCRUB_INTERVAL', int(os.environ.get('DENNIK_SCRUB_INTERVAL', '0')))
+    app.config.setdefault('DENNIK_SCRUB_RATE', int(os.environ.get('DENNIK_SCRUB_RATE', DEFAULT_RATE)))
+    app.config.setdefault('DENNIK_SCRUB_GRACE', int(os.environ.get('DENNIK_SCRUB_GRACE', DEFAULT_GRACE)))
+    app.config.setdefault('DENNIK_SCRUB_BATCH', DEFAULT_BATCH)
+    app.config.setdefault('DENNIK_SCRUB_VERIFY', False)
+    service = ScrubService(app, app.config['DENNIK_SCRUB_INTERVAL'])
+    app.extensions['dennik_scrub'] = service
+    if service.interval > 0:
+        service.start()
@@ -0,0 +1,308 @@
+"""Archív uzavretých rokov v samostatných SQLite súboroch (shardy)
+
+Rok presunutý do archívu žije v súbore archive/dennik-<rok>.db spolu so
+svojimi prílohami (riadky Attachment a AttachmentText, súbory ostávajú
+v uploads/). Shardy sa otvárajú iba na čítanie (mode=ro, immutable=1)
+a až keď ich dotaz potrebuje. Kategórie ostávajú v hlavnej databáze.
+
+Archivovaný rok vlastní výhradne jeho shard: riadky toho roka v hlavnej
+databáze sa pri čítaní ignorujú a zápisy do neho sú zakázané.
+"""
+import os
+import re
+import sqlite3
+import threading
+from datetime import date
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+from app.models import db, Entry, Attachment, AttachmentText, Settings
+from app.filters import apply_entry_filters, SORT_KEYS, DEFAULT_SORT
+from app.cache import mark_data_changed
+from app.stats import daily_counts
+
+SHARD_RE = re.compile(r'^dennik-(\d{4})\.db$')
+SHARD_TABLES = (Entry.__table__, Attachment.__table__, AttachmentText.__table__)
+# Najvyššie archivované ID - nové riadky v hlavnej DB ich nesmú znovu použiť
+ID_FLOOR_KEYS = {Entry: 'archive_max_entry_id', Attachment: 'archive_max_attachment_id'}
+
+
+class ArchivedYearError(Exception):
+    """Zápis do roka, ktorý je archivovaný (iba na čítanie)"""
+
+    def __init__(self, year):
+        super().__init__(f'Rok {year} je archivovaný (iba na čítanie)')
+        self.year = year
+
+
+class ShardRegistry:
+    """Zoznam archivovaných rokov a lenivo otvárané read-only enginy"""
+
+    def __init__(self, folder):
+        self.folder = folder
+        self._lock = threading.Lock()
+        self._engines = {}
+        self._years = {}
+        self._folder_mtime = None
+
+    def years(self):
+        """{rok: cesta} pre všetky shardy (obnovuje sa pri zmene priečinka)"""
+        try:
+            mtime = os.stat(self.folder).st_mtime_ns
+        except OSError:
+            return {}
+        with self._lock:
+            if mtime != self._folder_mtime:
+                found = {}
+                for name in os.listdir(self.folder):
+                    match = SHARD_RE.match(name)
+                    if match:
+                        found[int(match.group(1))] = os.path.join(self.folder, name)
+                self._years = found
+                self._folder_mtime = mtime
+            return dict(self._years)
+
+    def engine(self, year):
+        path = self.years()[year]
+        with self._lock:
+            engine = self._engines.get(path)
+            if engine is None:
+                engine = create_engine(
+                    f'sqlite:///file:{os.path.abspath(path)}?mode=ro&immutable=1&uri=true'
+                )
+                self._engines[path] = engine
+            return engine
+
+    def session(self, year):
+        return Session(bind=self.engine(year))
+
+    def dispose(self):
+        with self._lock:
+            for engine in self._engines.values():
+                engine.dispose()
+            self._engines.clear()
+
+
+def init_shards(app):
+    folder = app.config.setdefault('DENNIK_ARCHIVE_FOLDER', os.path.join(app.instance_path, 'archive'))
+    app.extensions['dennik_shards'] = ShardRegistry(folder)
+    for model in ID_FLOOR_KEYS:
+        if not event.contains(model, 'before_insert', _respect_id_floor):
+            event.listen(model, 'before_insert', _respect_id_floor)
+
+
+def registry(app=None):
+    from flask import current_app
+    return (app or current_app).extensions['dennik_shards']
+
+
+def archived_years():
+    return registry().years()
+
+
+def check_writable_year(year):
+    """Vyhodí ArchivedYearError ak je rok archivovaný"""
+    if year in archived_years():
+        raise ArchivedYearError(year)
+
+
+def years_for_filters(filters):
+    """Archivované roky, ktoré môžu obsahovať výsledky pre dané filtre"""
+    years = sorted(archived_years())
+    if 'year' in filters:
+        return [year for year in years if year == filters['year']]
+    if 'date_from' in filters:
+        years = [year for year in years if year >= filters['date_from'].year]
+    if 'date_to' in filters:
+        years = [year for year in years if year <= filters['date_to'].year]
+    return years
+
+
+def exclude_archived(query):
+    """Skryje riadky archivovaných rokov, ktoré ešte ostali v hlavnej databáze"""
+    years = archived_years()
+    if years:
+        query = query.filter(Entry.year.notin_(sorted(years)))
+    return query
+
+
+def find_archived(model, object_id, *options):
+    """Nájde riadok v shardoch; vráti odpojený objekt (s načítanými options) alebo None"""
+    shards = registry()
+    for year in sorted(shards.years(), reverse=True):
+        session = shards.session(year)
+        try:
+            query = session.query(model)
+            if options:
+                query = query.options(*options)
+            obj = query.filter(model.id == object_id).first()
+            if obj is not None:
+                session.expunge_all()
+                return obj
+        finally:
+            session.close()
+    return None
+
+
+def paginate_entries(filters, hot_query, shard_years, serialize):
+    """Stránka záznamov spojená z hlavnej databázy a shardov
+
+    Z každého zdroja sa načíta najviac page * per_page zoradených riadkov,
+    výsledky sa spoja v Pythone rovnakým poradím ako v SQL.
+    serialize(entry) sa volá, kým sú sessions shardov otvorené.
+    """
+    page, per_page = filters['page'], filters['per_page']
+    needed = page * per_page
+    shards = registry()
+    sessions = [shards.session(year) for year in shard_years]
+    try:
+        queries = [hot_query] + [apply_entry_filters(session.query(Entry), filters) for session in sessions]
+        total = sum(query.order_by(None).count() for query in queries)
+        rows = []
+        for query in queries:
+            rows.extend(query.limit(needed).all())
+        key, reverse = SORT_KEYS[filters.get('sort', DEFAULT_SORT)]
+        rows.sort(key=key, reverse=reverse)
+        items = [serialize(entry) for entry in rows[(page - 1) * per_page:needed]]
+    finally:
+        for session in sessions:
+            session.close()
+    pages = (total + per_page - 1) // per_page if total else 0
+    return items, {
+        'page': page,
+        'pages': pages,
+        'per_page': per_page,
+        'total': total,
+        'has_next': page < pages,
+        'has_prev': page > 1
+    }
+
+
+def count_by(column, year=None):
+    """{hodnota: počet} zoskupené podľa stĺpca Entry cez hlavnú databázu a shardy"""
+    shards = registry()
+    archived = shards.years()
+    counts = {}
+
+    def add(query):
+        for value, count in query.group_by(column).all():
+            counts[value] = counts.get(value, 0) + count
+
+    if year is None or year not in archived:
+        query = exclude_archived(db.session.query(column, db.func.count(Entry.id)))
+        if year is not None:
+            query = query.filter(Entry.year == year)
+        add(query)
+    for shard_year in sorted(archived):
+        if year is not None and shard_year != year:
+            continue
+        session = shards.session(shard_year)
+        try:
+            add(session.query(column, db.func.count(Entry.id)))
+        finally:
+            session.close()
+    return counts
+
+
+def daily_counts_all(date_from, date_to, by_category=False):
+    """Denné počty pre časovú os vrátane archivovaných rokov v rozsahu"""
+    rows = daily_counts(date_from, date_to, by_category, query_filter=exclude_archived)
+    shards = registry()
+    for year in sorted(shards.years()):
+        if date_from.year <= year <= date_to.year:
+            session = shards.session(year)
+            try:
+                rows.extend(daily_counts(date_from, date_to, by_category, session=session))
+            finally:
+                session.close()
+    return rows
+
+
+def _respect_id_floor(mapper, connection, target):
+    """Zabráni opätovnému použitiu ID, ktoré už patrí archivovanému riadku"""
+    if target.id is not None:
+        return
+    settings = Settings.__table__
+    floor = connection.execute(
+        db.select(settings.c.value).where(settings.c.key == ID_FLOOR_KEYS[type(target)])
+    ).scalar()
+    if not floor:
+        return
+    table = mapper.local_table
+    current = connection.execute(db.select(db.func.max(table.c.id))).scalar() or 0
+    if current < int(floor):
+        target.id = int(floor) + 1
+
+
+def _columns(model, alias=None):
+    prefix = f'{alias}.' if alias else ''
+    return ', '.join(f'{prefix}"{column.name}"' for column in model.__table__.columns)
+
+
+def archive_year(app, year):
+    """Presunie záznamy roka do read-only shardu; vráti počet presunutých záznamov"""
+    if year >= date.today().year:
+        raise ValueError('Archivovať sa dajú iba uzavreté roky')
+    shards = registry(app)
+    if year in shards.years():
+        raise ValueError(f'Rok {year} je už archivovaný')
+
+    os.makedirs(shards.folder, exist_ok=True)
+    final_path = os.path.join(shards.folder, f'dennik-{year}.db')
+    tmp_path = final_path + '.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    with app.app_context():
+        hot_path = db.engine.url.database
+
+        # 1. Schéma shardu (iba tabuľky záznamov a príloh)
+        shard_engine = create_engine(f'sqlite:///{tmp_path}')
+        db.metadata.create_all(shard_engine, tables=list(SHARD_TABLES))
+        shard_engine.dispose()
+
+        # 2. Kópia riadkov roka cez ATTACH
+        conn = sqlite3.connect(tmp_path)
+        try:
+            conn.execute('ATTACH DATABASE ? AS hot', (hot_path,))
+            with conn:
+                # Stĺpce vymenované podľa modelu - poradie v starších databázach sa môže líšiť
+                conn.execute(f'INSERT INTO main.entry ({_columns(Entry)}) '
+                             f'SELECT {_columns(Entry)} FROM hot.entry WHERE year = ?', (year,))
+                conn.execute(f'INSERT INTO main.attachment ({_columns(Attachment)}) '
+                             f'SELECT {_columns(Attachment, "a")} FROM hot.attachment a '
+                             'JOIN main.entry e ON e.id = a.entry_id')
+                conn.execute(f'INSERT INTO main.attachment_text ({_columns(AttachmentText)}) '
+                             f'SELECT {_columns(AttachmentText, "t")} FROM hot.attachment_text t '
+                             'JOIN main.attachment a ON a.id = t.attachment_id')
+            moved = conn.execute('SELECT count(*) FROM main.entry').fetchone()[0]
+            max_entry = conn.execute('SELECT max(id) FROM main.entry').fetchone()[0]
+            max_attachment = conn.execute('SELECT max(id) FROM main.attachment').fetchone()[0]
+            conn.execute('DETACH DATABASE hot')
+            conn.execute('ANALYZE')
+            conn.execute('VACUUM')
+        finally:
+            conn.close()
+
+        # 3. Zverejnenie shardu - odteraz rok vlastní shard
+        os.replace(tmp_path, final_path)
+
+        # 4. Odstránenie riadkov z hlavnej databázy + ochrana ID
+        entry_ids = db.session.query(Entry.id).filter(Entry.year == year)
+        attachment_ids = db.session.query(Attachment.id).filter(Attachment.entry_id.in_(entry_ids))
+        db.session.query(AttachmentText).filter(
+            AttachmentText.attachment_id.in_(attachment_ids)).delete(synchronize_session=False)
+        db.session.query(Attachment).filter(
+            Attachment.entry_id.in_(entry_ids)).delete(synchronize_session=False)
+        db.session.query(Entry).filter(Entry.year == year).delete(synchronize_session=False)
+        mark_data_changed()
+        for model, value in ((Entry, max_entry), (Attachment, max_attachment)):
+            if value is None:
+                continue
+            key = ID_FLOOR_KEYS[model]
+            setting = Settings.query.filter_by(key=key).first()
+            if setting is None:
+                db.session.add(Settings(key=key, value=str(value)))
+            elif int(setting.value or 0) < value:
+                setting.value = str(value)
+        db.session.commit()
+    return moved
@@ -1,21 +1,73 @@
 // Globálne premenné
 let currentPage = 1;
 let currentFilters = {};
-let categories = [];
+let categories = [];  // hlavné kategórie, každá s poľom subcategories
 let editingEntryId = null;
+let bootstrapStats = null;  // štatistiky z počiatočného stavu (platné do prvej zmeny)
+const API_BASE = window.DENNIK_BASE || '';  // prefix denníka (/j/<meno>), v hlavnom denníku prázdny
 
 // Inicializácia aplikácie
 document.addEventListener('DOMContentLoaded', function() {
-    loadCategories();
-    loadYears();
-    loadEntries();
     setCurrentDateTime();
+    initApp();
 });
 
+// Počiatočný stav: vložený v HTML, inak jeden request /api/bootstrap, inak jednotlivé API
+async function initApp() {
+    let state = readEmbeddedState();
+    if (!state) {
+        try {
+            const response = await fetch(`${API_BASE}/api/bootstrap`);
+            if (response.ok) {
+                state = await response.json();
+            }
+        } catch (error) {
+            console.error('Chyba pri načítavaní počiatočného stavu:', error);
+        }
+    }
+    
+    if (state && state.categories && state.entries) {
+        applyBootstrap(state);
+    } else {
+        loadCategories();
+        loadYears();
+        loadEntries();
+    }
+}
+
+function readEmbeddedState() {
+    const element = document.getElementById('bootstrapData');
+    if (!element) return null;
+    try {
+        return JSON.parse(element.textContent);
+    } catch (error) {
+        console.error('Neplatný vložený počiatočný stav:', error);
+        return null;
+    }
+}
+
+function applyBootstrap(state) {
+    categories = state.categories;
+    populateCategoryFilters();
+    populateEntryCategories();
+    populateYears(state.years || []);
+    document.getElementById('monthFilter').disabled = true;
+    displayEntries(state.entries.entries);
+    displayPagination(state.entries.pagination);
+    bootstrapStats = state.stats || null;
+}
+
+// Podkategórie z už načítaného stromu kategórií (null ak strom nie je k dispozícii)
+function localSubcategories(mainCategoryId) {
+    const mainCategory = categories.find(category => String(category.id) === String(mainCategoryId));
+    return mainCategory && mainCategory.subcategories ? mainCategory.subcategories : null;
+}
+
 // Načítanie kategórií
 async function loadCategories() {
+    bootstrapStats = null;
     try {
-        const response = await fetch('/api/categories/main');
+        const response = await fetch(`${API_BASE}/api/categories`);
         const data = await response.json();
         
         if (data.categories) {
@@ -78,13 +130,16 @@ async function updateSubcategoryFilter() {
     }
     
     try {
-        const response = await fetch(`/api/categories/${mainCategoryId}/subcategories`);
-        const data = await response.json();
+        let subcategories = localSubcategories(mainCategoryId);
+        if (!subcategories) {
+            const response = await fetch(`${API_BASE}/api/categories/${mainCategoryId}/subcategories`);
+            subcategories = (await response.json()).categories;
+        }
         
         subcategoryFilter.innerHTML = '<option value="">Všetky podkategórie</option>';
         
-        if (data.categories && data.categories.length > 0) {
-            data.categories.forEach(subcategory => {
+        if (subcategories && subcategories.length > 0) {
+            subcategories.forEach(subcategory => {
                 const option = document.createElement('option');
                 option.value = subcategory.id;
                 option.textContent = `${subcategory.icon} ${subcategory.name}`;
@@ -114,13 +169,16 @@ async function updateEntrySubcategories() {
     }
     
     try {
-        const response = await fetch(`/api/categories/${mainCategoryId}/subcategories`);
-        const data = await response.json();
+        let subcategories = localSubcategories(mainCategoryId);
+        if (!subcategories) {
+            const response = await fetch(`${API_BASE}/api/categories/${mainCategoryId}/subcategories`);
+            subcategories = (await response.json()).categories;
+        }
         
         entrySubcategory.innerHTML = '<option value="">Vyber podkategóriu</option>';
         
-        if (data.categories && data.categories.length > 0) {
-            data.categories.forEach(subcategory => {
+        if (subcategories && subcategories.length > 0) {
+            subcategories.forEach(subcategory => {
                 const option = document.createElement('option');
                 option.value = subcategory.id;
                 option.textContent = `${subcategory.icon} ${subcategory.name}`;
@@ -139,25 +197,29 @@ async function updateEntrySubcategories() {
 // Načítanie dostupných rokov
 async function loadYears() {
     try {
-        const response = await fetch('/api/years');
+        const response = await fetch(`${API_BASE}/api/years`);
         const data = await response.json();
         
         if (data.years) {
-            const yearFilter = document.getElementById('yearFilter');
-            yearFilter.innerHTML = '<option value="">Všetky roky</option>';
-            
-            data.years.forEach(year => {
-                const option = document.createElement('option');
-                option.value = year;
-                option.textContent = year;
-                yearFilter.appendChild(option);
-            });
+            populateYears(data.years);
         }
     } catch (error) {
         console.error('Chyba pri načítavaní rokov:', error);
     }
 }
 
+function populateYears(years) {
+    const yearFilter = document.getElementById('yearFilter');
+    yearFilter.innerHTML = '<option value="">Všetky roky</option>';
+    
+    years.forEach(year => {
+        const option = document.createElement('option');
+        option.value = year;
+        option.textContent = year;
+        yearFilter.appendChild(option);
+    });
+}
+
 // Načítanie záznamov
 async function loadEntries(page = 1) {
     try {
@@ -188,7 +250,7 @@ async function loadEntries(page = 1) {
         // Povolenie/zakázanie mesiaca podľa roku
         document.getElementById('monthFilter').disabled = !yearFilter;
         
-        const response = await fetch(`/api/entries?${params.toString()}`);
+        const response = await fetch(`${API_BASE}/api/entries?${params.toString()}`);
         const data = await response.json();
         
         if (data.entries) {
@@ -252,7 +314,7 @@ function displayEntries(entries) {
                                     <i class="fas fa-download"></i> ${escapeHtml(att.original_filename)}
                                 </button>
                                 ${att.original_filename.toLowerCase().endsWith('.pdf') ? `
-                                  <a href="/viewer/pdf/${att.id}" target="_blank" class="btn btn-sm btn-outline-primary me-1 mb-1">
+                                  <a href="${API_BASE}/viewer/pdf/${att.id}" target="_blank" class="btn btn-sm btn-outline-primary me-1 mb-1">
                                     <i class="fas fa-eye"></i> Zobraziť
                                   </a>
                                 ` : ''}
@@ -359,7 +421,7 @@ function showAddEntryForm() {
 async function editEntry(entryId) {
     try {
         editingEntryId = entryId;
-        const response = await fetch(`/api/entries/${entryId}`);
+        const response = await fetch(`${API_BASE}/api/entries/${entryId}`);
         const data = await response.json();
         
         if (data.entry) {
@@ -373,15 +435,18 @@ async function editEntry(entryId) {
             
             // Nastavenie kategórie - musíme zistiť či je to hlavná alebo podkategória
             if (entry.category_id) {
-                // Načítaj informácie o kategórii
-                const categoryResponse = await fetch(`/api/categories`);
-                const categoryData = await categoryResponse.json();
+                // Strom kategórií je už načítaný (počiatočný stav / loadCategories)
+                let categoryTree = categories;
+                if (!categoryTree.length) {
+                    const categoryResponse = await fetch(`${API_BASE}/api/categories`);
+                    categoryTree = (await categoryResponse.json()).categories || [];
+                }
                 
                 let selectedCategory = null;
                 let parentCategory = null;
                 
                 // Nájdi kategóriu v hierarchii
-                for (let mainCat of categoryData.categories) {
+                for (let mainCat of categoryTree) {
                     if (mainCat.id === entry.category_id) {
                         selectedCategory = mainCat;
                         break;
@@ -447,7 +512,7 @@ async function saveEntry() {
             return;
         }
         
-        const url = editingEntryId ? `/api/entries/${editingEntryId}` : '/api/entries';
+        const url = editingEntryId ? `${API_BASE}/api/entries/${editingEntryId}` : `${API_BASE}/api/entries`;
         const method = editingEntryId ? 'PUT' : 'POST';
         
         const response = await fetch(url, {
@@ -492,7 +557,8 @@ async function saveEntry() {
             document.getElementById('entryForm').reset();
             editingEntryId = null;
             
-            // Obnovenie zoznam
+            // Obnovenie zoznam (počiatočné štatistiky už neplatia)
+            bootstrapStats = null;
             loadEntries(currentPage);
         } else {
             showAlert(result.error || 'Chyba pri ukladaní', 'danger');
@@ -515,7 +581,7 @@ async function uploadAttachments(entryId, files) {
             
             console.log(`Nahrávam súbor: ${file.name}`);
             
-            const response = await fetch(`/api/entries/${entryId}/attachments`, {
+            const response = await fetch(`${API_BASE}/api/entries/${entryId}/attachments`, {
                 method: 'POST',
                 body: formData
             });
@@ -551,7 +617,7 @@ async function deleteEntry(entryId) {
     }
     
     try {
-        const response = await fetch(`/api/entries/${entryId}`, {
+        const response = await fetch(`${API_BASE}/api/entries/${entryId}`, {
             method: 'DELETE'
         });
         
@@ -559,6 +625,7 @@ async function deleteEntry(entryId) {
         
         if (response.ok) {
             showAlert(result.message, 'success');
+            bootstrapStats = null;
             loadEntries(currentPage);
         } else {
             showAlert(result.error || 'Chyba pri mazaní', 'danger');
@@ -592,6 +659,44 @@ function handleSearch(event) {
     }
 }
 
+// Návrhy pri písaní (ľahký /api/suggest namiesto plného vyhľadávania)
+function handleSearchInput(event) {
+    // Výber z datalistu - rovno vyhľadať
+    if (!event.inputType || event.inputType === 'insertReplacementText') {
+        loadEntries(1);
+        return;
+    }
+    clearTimeout(handleSearchInput.timeout);
+    handleSearchInput.timeout = setTimeout(loadSuggestions, 150);
+}
+
+async function loadSuggestions() {
+    const query = document.getElementById('searchInput').value.trim();
+    const datalist = document.getElementById('searchSuggestions');
+    if (query.length < 2) {
+        datalist.innerHTML = '';
+        return;
+    }
+    
+    // Staršie odpovede (pomalší request) neprepíšu novšie
+    const requestId = (loadSuggestions.lastId || 0) + 1;
+    loadSuggestions.lastId = requestId;
+    try {
+        const response = await fetch(`${API_BASE}/api/suggest?q=${encodeURIComponent(query)}`);
+        const data = await response.json();
+        if (requestId !== loadSuggestions.lastId || !data.suggestions) return;
+        
+        datalist.innerHTML = '';
+        data.suggestions.forEach(suggestion => {
+            const option = document.createElement('option');
+            option.value = suggestion.text;
+            datalist.appendChild(option);
+        });
+    } catch (error) {
+        console.error('Chyba pri načítavaní návrhov:', error);
+    }
+}
+
 // Nastavenie aktuálneho dátumu a času
 function setCurrentDateTime() {
     const now = new Date();
@@ -606,10 +711,12 @@ function setCurrentDateTime() {
 async function showStats() {
     try {
         const yearFilter = document.getElementById('yearFilter').value;
-        const url = yearFilter ? `/api/stats?year=${yearFilter}` : '/api/stats';
-        
-        const response = await fetch(url);
-        const data = await response.json();
+        let data = !yearFilter ? bootstrapStats : null;
+        if (!data) {
+            const url = yearFilter ? `${API_BASE}/api/stats?year=${yearFilter}` : `${API_BASE}/api/stats`;
+            const response = await fetch(url);
+            data = await response.json();
+        }
         
         if (data) {
             displayStats(data, yearFilter);
@@ -734,7 +841,7 @@ function showManageCategories() {
 
 async function loadManageCategories() {
     try {
-        const response = await fetch('/api/categories');
+        const response = await fetch(`${API_BASE}/api/categories`);
         const data = await response.json();
         
         if (data.categories) {
@@ -840,7 +947,7 @@ async function saveManageCategory() {
             formData.parent_id = parseInt(formData.parent_id);
         }
         
-        const url = manageEditingId ? `/api/categories/${manageEditingId}` : '/api/categories';
+        const url = manageEditingId ? `${API_BASE}/api/categories/${manageEditingId}` : `${API_BASE}/api/categories`;
         const method = manageEditingId ? 'PUT' : 'POST';
         
         const response = await fetch(url, {
@@ -904,7 +1011,7 @@ async function deleteManageCategory(categoryId) {
     }
     
     try {
-        const response = await fetch(`/api/categories/${categoryId}`, {
+        const response = await fetch(`${API_BASE}/api/categories/${categoryId}`, {
             method: 'DELETE'
         });
         
@@ -940,10 +1047,10 @@ function setManageIcon(icon) {
 function downloadAttachment(attachmentId, filename) {
     // Pre PDF súbory otvoriť v novom okne, pre ostatné stiahnuť
     if (filename.toLowerCase().endsWith('.pdf')) {
-        window.open(`/api/attachments/${attachmentId}`, '_blank');
+        window.open(`${API_BASE}/api/attachments/${attachmentId}`, '_blank');
     } else {
         const link = document.createElement("a");
-        link.href = `/api/attachments/${attachmentId}`;
+        link.href = `${API_BASE}/api/attachments/${attachmentId}`;
         link.download = filename;
         link.style.display = "none";
         document.body.appendChild(link);
@@ -954,7 +1061,7 @@ function downloadAttachment(attachmentId, filename) {
 }
 
 function openInReader(attachmentId) {
-    fetch(`/api/attachments/${attachmentId}/open`, {method: 'POST'})
+    fetch(`${API_BASE}/api/attachments/${attachmentId}/open`, {method: 'POST'})
         .then(resp => resp.json())
         .then(data => {
             if (data.status === 'ok') {
@@ -972,7 +1079,7 @@ function openInReader(attachmentId) {
 }
 
 function openFolder(attachmentId) {
-    fetch(`/api/attachments/${attachmentId}/open_folder`, {method: 'POST'})
+    fetch(`${API_BASE}/api/attachments/${attachmentId}/open_folder`, {method: 'POST'})
         .then(resp => resp.json())
         .then(data => {
             if (data.status === 'ok') {
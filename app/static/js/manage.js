@@ -1,6 +1,7 @@
 // Spravovanie kategórií
 let categories = [];
 let editingCategoryId = null;
+const API_BASE = window.DENNIK_BASE || '';  // prefix denníka (/j/<meno>), v hlavnom denníku prázdny
 
 // Inicializácia
 document.addEventListener('DOMContentLoaded', function() {
@@ -11,7 +12,7 @@ document.addEventListener('DOMContentLoaded', function() {
 // Načítanie kategórií
 async function loadCategories() {
     try {
-        const response = await fetch('/api/categories');
+        const response = await fetch(`${API_BASE}/api/categories`);
         const data = await response.json();
         
         if (data.categories) {
@@ -89,7 +90,7 @@ function displayCategories(categories) {
 // Načítanie nadkategórií pre dropdown
 async function loadParentOptions() {
     try {
-        const response = await fetch('/api/categories');
+        const response = await fetch(`${API_BASE}/api/categories`);
         const data = await response.json();
         
         if (data.categories) {
@@ -130,7 +131,7 @@ async function saveCategory() {
             formData.parent_id = parseInt(formData.parent_id);
         }
         
-        const url = editingCategoryId ? `/api/categories/${editingCategoryId}` : '/api/categories';
+        const url = editingCategoryId ? `${API_BASE}/api/categories/${editingCategoryId}` : `${API_BASE}/api/categories`;
         const method = editingCategoryId ? 'PUT' : 'POST';
         
         const response = await fetch(url, {
@@ -202,7 +203,7 @@ async function deleteCategory(categoryId) {
     }
     
     try {
-        const response = await fetch(`/api/categories/${categoryId}`, {
+        const response = await fetch(`${API_BASE}/api/categories/${categoryId}`, {
             method: 'DELETE'
         });
         
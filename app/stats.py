@@ -0,0 +1,81 @@
+"""Agregácie pre heatmapu a časovú os
+
+Jeden zoskupený dotaz po dňoch (idx_entry_date_category ho pokryje bez
+čítania riadkov tabuľky), týždne a mesiace sa skladajú z denných počtov
+v Pythone - rok má najviac 366 skupín na kategóriu.
+"""
+from datetime import date, timedelta
+from app.models import db, Entry
+
+GRANULARITIES = ('day', 'week', 'month')
+MAX_RANGE_DAYS = 366 * 20
+
+
+def _bucket_start(day, granularity):
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())  # pondelok ISO týždňa
+    if granularity == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def daily_counts(date_from, date_to, by_category=False, session=None, query_filter=None):
+    """[(deň, category_id alebo None, počet)] pre rozsah vrátane oboch hraníc"""
+    columns = [Entry.date]
+    if by_category:
+        columns.append(Entry.category_id)
+    query = (session or db.session).query(*columns, db.func.count()).filter(
+        Entry.date >= date_from,
+        Entry.date <= date_to
+    )
+    if query_filter is not None:
+        query = query_filter(query)
+    rows = query.group_by(*columns).all()
+    if by_category:
+        return [(row[0], row[1], row[2]) for row in rows]
+    return [(row[0], None, row[1]) for row in rows]
+
+
+def build_timeline(date_from, date_to, granularity='day', by_category=False, rows=None):
+    """Počty záznamov po dňoch/týždňoch/mesiacoch, voliteľne rozdelené podľa kategórie"""
+    if rows is None:
+        rows = daily_counts(date_from, date_to, by_category)
+
+    buckets = {}
+    for day, category_id, count in rows:
+        start = _bucket_start(day, granularity)
+        bucket = buckets.get(start)
+        if bucket is None:
+            bucket = buckets[start] = {'period': start.isoformat(), 'count': 0}
+            if by_category:
+                bucket['categories'] = {}
+        bucket['count'] += count
+        if by_category:
+            key = str(category_id)
+            bucket['categories'][key] = bucket['categories'].get(key, 0) + count
+
+    ordered = [buckets[key] for key in sorted(buckets)]
+    return {
+        'granularity': granularity,
+        'date_from': date_from.isoformat(),
+        'date_to': date_to.isoformat(),
+        'total': sum(bucket['count'] for bucket in ordered),
+        'max': max((bucket['count'] for bucket in ordered), default=0),
+        'buckets': ordered,
+    }
+
+
+def parse_timeline_range(args):
+    """Rozsah z parametrov date_from/date_to alebo year (predvolene posledných 365 dní)"""
+    year = args.get('year', type=int)
+    if year:
+        date_from, date_to = date(year, 1, 1), date(year, 12, 31)
+    else:
+        date_to = date.fromisoformat(args['date_to']) if args.get('date_to') else date.today()
+        date_from = (date.fromisoformat(args['date_from']) if args.get('date_from')
+                     else date_to - timedelta(days=364))
+    if date_from > date_to:
+        raise ValueError('date_from musí byť pred date_to')
+    if (date_to - date_from).days > MAX_RANGE_DAYS:
+        raise ValueError('Príliš veľký rozsah dátumov')
+    return date_from, date_to
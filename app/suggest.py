@@ -0,0 +1,201 @@
+"""Návrhy pri písaní do vyhľadávania (prefixový index v pamäti)
+
+Index obsahuje názvy záznamov (aj od každého slova v názve, takže
+"opr" nájde "Veľká oprava auta"), názvy kategórií a časté slová z
+názvov a textov záznamov - z hlavnej databázy aj archivovaných rokov.
+Kľúče sú bez diakritiky a malými písmenami v zoradenom zozname, takže
+prefix sa hľadá binárne (bisect) a stačí prejsť iba zhodný úsek.
+
+Index sa stavia na pozadí pre verziu dát (data_version), najviac raz
+za DENNIK_SUGGEST_INTERVAL sekúnd, a drží sa iba posledný; najčastejšie
+prefixy si pamätá malá LRU cache.
+"""
+import os
+import re
+import sys
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+from collections import Counter, OrderedDict
+
+from flask import current_app
+
+from app.cache import data_version
+from app.db_routing import reader_session
+from app.models import Entry, Category
+
+WORD_RE = re.compile(r'\w{3,}', re.UNICODE)
+MIN_PREFIX = 2
+DEFAULT_LIMIT = 8
+MAX_LIMIT = 20
+MAX_TITLE_WORDS = 8
+MAX_TERMS = 5000
+MIN_TERM_COUNT = 2
+MAX_SCAN = 2000
+PREFIX_CACHE_SIZE = 512
+DEFAULT_REBUILD_INTERVAL = 30
+# Poradie druhov pri rovnakej zhode: kategórie, názvy, časté slová
+KIND_PRIORITY = {'category': 0, 'title': 1, 'term': 2}
+
+
+def normalize(text):
+    """Malé písmená bez diakritiky ("Škola" -> "skola")"""
+    decomposed = unicodedata.normalize('NFKD', text.casefold())
+    return ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+class SuggestIndex:
+    """Zoradené kľúče (normalizovaný text, druh, zobrazenie, váha) + LRU pre prefixy"""
+
+    def __init__(self, items):
+        self._keys = []
+        self._values = []
+        for key, kind, text, weight in sorted(items):
+            # Poradie sa počíta pri stavbe: druh, celá zhoda od začiatku textu pred
+            # zhodou od slova v strede, početnosť, kratší text
+            rank = (KIND_PRIORITY[kind], key != normalize(text), -weight, len(text))
+            self._keys.append(key)
+            self._values.append((rank, kind, text, weight))
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._keys)
+
+    def suggest(self, prefix, limit=DEFAULT_LIMIT):
+        prefix = normalize(prefix.strip())
+        if len(prefix) < MIN_PREFIX:
+            return []
+        cache_key = (prefix, limit)
+        with self._lock:
+            if cache_key in self._cache:
+                self._cache.move_to_end(cache_key)
+                return self._cache[cache_key]
+
+        best = {}
+        start = bisect_left(self._keys, prefix)
+        for position in range(start, min(start + MAX_SCAN, len(self._keys))):
+            key = self._keys[position]
+            if not key.startswith(prefix):
+                break
+            rank, kind, text, weight = self._values[position]
+            if text not in best or rank < best[text][0]:
+                best[text] = (rank, kind, weight)
+        result = [
+            {'text': text, 'kind': kind, 'count': weight}
+            for text, (rank, kind, weight) in sorted(best.items(), key=lambda item: item[1][0])[:limit]
+        ]
+
+        with self._lock:
+            self._cache[cache_key] = result
+            while len(self._cache) > PREFIX_CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return result
+
+
+EMPTY_INDEX = SuggestIndex([])
+
+
+def _word_keys(text):
+    """Kľúče od začiatku textu a od každého ďalšieho slova"""
+    normalized = normalize(text)
+    keys = [normalized]
+    for match in list(re.finditer(r'\w+', normalized))[1:MAX_TITLE_WORDS]:
+        keys.append(normalized[match.start():])
+    return keys
+
+
+def _entry_texts(session):
+    """(názov, text) záznamov z hlavnej databázy (cez `session`) aj archivovaných rokov"""
+    from app.shards import registry, exclude_archived
+    for entry in exclude_archived(session.query(Entry)).yield_per(500):
+        yield entry.title, entry.content
+    shards = registry()
+    for year in shards.years():
+        session = shards.session(year)
+        try:
+            for entry in session.query(Entry).yield_per(500):
+                yield entry.title, entry.content
+        finally:
+            session.close()
+
+
+def build_index():
+    """Prechod všetkých záznamov - cez čitateľa, spojenie zapisovača počas neho ostáva voľné"""
+    titles = Counter()
+    terms = Counter()
+    with reader_session() as session:
+        for title, content in _entry_texts(session):
+            if title:
+                titles[title.strip()] += 1
+            words = set(WORD_RE.findall((title or '') + ' ' + (content or '')))
+            terms.update(word.lower() for word in words)
+        categories = [name for (name,) in session.query(Category.name).filter_by(active=True)]
+
+    items = []
+    for name in categories:
+        items.append((normalize(name), 'category', name, 0))
+    for title, count in titles.items():
+        for key in _word_keys(title):
+            items.append((key, 'title', title, count))
+    for term, count in terms.most_common(MAX_TERMS):
+        if count < MIN_TERM_COUNT:
+            break
+        items.append((normalize(term), 'term', term, count))
+    return SuggestIndex(items)
+
+
+class SuggestHolder:
+    """Aktuálny index aplikácie; stavia sa vždy na pozadí
+
+    Kým nie je prvý index hotový, návrhy sú prázdne - request nikdy
+    nečaká na prechod celej databázy. Po zmene dát odpovedá predchádzajúci
+    index a nový sa stavia najskôr `interval` sekúnd po začiatku
+    poslednej stavby, takže séria zápisov spustí jednu prestavbu, nie
+    jednu na každý zápis.
+    """
+
+    def __init__(self, app, interval=0):
+        self.app = app
+        self.interval = interval
+        self.version = None
+        self.index = None
+        self._started = None
+        self._building = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        version = data_version()
+        if self.version == version and self.index is not None:
+            return self.index
+        with self._lock:
+            due = self._started is None or time.monotonic() - self._started >= self.interval
+            if self.version != version and self._building is None and due:
+                self._started = time.monotonic()
+                self._building = threading.Thread(target=self._rebuild, args=(version,),
+                                                  name='dennik-suggest', daemon=True)
+                self._building.start()
+            return self.index if self.index is not None else EMPTY_INDEX
+
+    def _rebuild(self, version):
+        try:
+            with self.app.app_context():
+                index = build_index()
+            with self._lock:
+                self.index = index
+                self.version = version
+        except Exception as e:
+            print(f'[SUGGEST] Prestavba indexu zlyhala: {e}', file=sys.stderr)
+        finally:
+            self._building = None
+
+
+def suggest(prefix, limit=DEFAULT_LIMIT):
+    return current_app.extensions['dennik_suggest'].get().suggest(prefix, min(max(1, limit), MAX_LIMIT))
+
+
+def init_suggest(app):
+    app.config.setdefault('DENNIK_SUGGEST_INTERVAL',
+                          int(os.environ.get('DENNIK_SUGGEST_INTERVAL', DEFAULT_REBUILD_INTERVAL)))
+    app.extensions['dennik_suggest'] = SuggestHolder(app, app.config['DENNIK_SUGGEST_INTERVAL'])
@@ -0,0 +1,349 @@
+"""Trvalý front úloh na pozadí v SQLite
+
+Request zaradí úlohu cez enqueue() do tej istej session ako zmenu dát,
+takže úloha vznikne iba ak sa zmena commitne (a pri rollbacku zmizne
+s ňou). Po commite sa zobudí worker vlákno, ktoré si úlohu atomicky
+zoberie (UPDATE ... RETURNING, bezpečné aj pre viac workerov a
+procesov), spustí obsluhu mimo transakcie a výsledok zapíše krátkym
+zápisom. Zlyhaná úloha sa opakuje s exponenciálnym odstupom, po
+`max_attempts` pokusoch ostane ako `failed` (dá sa zopakovať cez
+/api/admin/tasks/<id>/retry).
+
+Workery bežia iba v serverovom procese (run.py a asgi.py zakladajú
+aplikáciu so serving_config()); skripty ich nespúšťajú a ich úlohy
+spracuje bežiaci server alebo run_pending.
+
+Obsluhy musia byť idempotentné - úloha prerušená pádom procesu sa po
+uplynutí lease spustí znova. Rovnaký idempotency_key sa zaradí iba raz;
+hotové úlohy (a ich kľúče) sa mažú po DENNIK_TASK_KEEP sekundách.
+"""
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import event, func
+
+from app.models import db, Task
+
+DEFAULT_WORKERS = 1
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_BACKOFF = 5
+MAX_BACKOFF = 3600
+DEFAULT_LEASE = 600
+DEFAULT_KEEP = 7 * 24 * 3600
+MAX_IDLE_WAIT = 60
+MAINTENANCE_INTERVAL = 300
+MAX_ERROR_LENGTH = 2000
+# Úloha splatná do toľkých sekúnd drží denník otvorený (app/journals.py)
+NEAR_DUE_SECONDS = 60
+
+TASK_HANDLERS = {}
+
+
+def task_handler(kind):
+    """Dekorátor: obsluha úlohy `kind`, volaná ako handler(app, payload)"""
+    def decorator(func):
+        TASK_HANDLERS[kind] = func
+        return func
+    return decorator
+
+
+def enqueue(kind, payload=None, key=None, max_attempts=DEFAULT_MAX_ATTEMPTS, delay=0):
+    """Zaradí úlohu do aktuálnej session (bez commitu); vráti Task
+
+    Ak už úloha s rovnakým kľúčom existuje, vráti ju a nič nepridá.
+    """
+    if key is not None:
+        existing = Task.query.filter_by(idempotency_key=key).first()
+        if existing is not None:
+            return existing
+    task = Task(
+        kind=kind,
+        payload=json.dumps(payload, ensure_ascii=False) if payload is not None else None,
+        idempotency_key=key,
+        max_attempts=max_attempts,
+        run_after=datetime.utcnow() + timedelta(seconds=delay),
+    )
+    db.session.add(task)
+    db.session.info['dennik_tasks_enqueued'] = True
+    return task
+
+
+def _wake_after_commit(session):
+    if not session.info.pop('dennik_tasks_enqueued', False):
+        return
+    try:
+        worker = current_app.extensions.get('dennik_tasks')
+    except RuntimeError:
+        return  # mimo kontextu aplikácie - úlohu nájde worker pri ďalšom prechode
+    if worker is not None:
+        worker.wake()
+
+
+def _forget_enqueued(session):
+    session.info.pop('dennik_tasks_enqueued', None)
+
+
+def backoff_seconds(attempts, base=DEFAULT_BACKOFF):
+    return min(base * 2 ** max(0, attempts - 1), MAX_BACKOFF)
+
+
+def claim_next(now=None):
+    """Atomicky zoberie najstaršiu splatnú úlohu; dict alebo None"""
+    now = now or datetime.utcnow()
+    next_id = (db.select(Task.id)
+               .where(Task.status == 'pending', Task.run_after <= now)
+               .order_by(Task.run_after, Task.id)
+               .limit(1)
+               .scalar_subquery())
+    row = db.session.execute(
+        db.update(Task)
+        .where(Task.id == next_id, Task.status == 'pending')
+        .values(status='running', started_at=now, attempts=Task.attempts + 1)
+        .returning(Task.id, Task.kind, Task.payload, Task.attempts, Task.max_attempts)
+    ).first()
+    db.session.commit()
+    return row._asdict() if row else None
+
+
+def finish(task, error=None, backoff=DEFAULT_BACKOFF):
+    now = datetime.utcnow()
+    if error is None:
+        values = {'status': 'done', 'finished_at': now, 'last_error': None}
+    elif task['attempts'] < task['max_attempts']:
+        values = {'status': 'pending', 'last_error': error[:MAX_ERROR_LENGTH],
+                  'run_after': now + timedelta(seconds=backoff_seconds(task['attempts'], backoff))}
+    else:
+        values = {'status': 'failed', 'finished_at': now, 'last_error': error[:MAX_ERROR_LENGTH]}
+    db.session.execute(db.update(Task).where(Task.id == task['id']).values(**values))
+    db.session.commit()
+
+
+def run_next(app):
+    """V kontexte aplikácie: spustí jednu splatnú úlohu; False ak nie je čo robiť"""
+    task = claim_next()
+    if task is None:
+        return False
+    # Spojenie zapisovača je po commite voľné - obsluha ho počas I/O nedrží
+    handler = TASK_HANDLERS.get(task['kind'])
+    error = None
+    if handler is None:
+        error = f"Neznámy druh úlohy: {task['kind']}"
+        task['attempts'] = task['max_attempts']
+    else:
+        try:
+            handler(app, json.loads(task['payload']) if task['payload'] else None)
+        except Exception as e:
+            db.session.rollback()
+            error = f'{type(e).__name__}: {e}'
+            print(f"[TASKS] Úloha {task['id']} ({task['kind']}) zlyhala, pokus {task['attempts']}: {e}",
+                  file=sys.stderr)
+    finish(task, error, app.config['DENNIK_TASK_BACKOFF'])
+    return True
+
+
+def run_pending(app, limit=None):
+    """Spustí splatné úlohy hneď v aktuálnom vlákne (skripty); vráti počet"""
+    count = 0
+    with app.app_context():
+        while (limit is None or count < limit) and run_next(app):
+            count += 1
+    return count
+
+
+def seconds_until_next():
+    """Čas do najbližšej splatnej úlohy (None ak žiadna nečaká)"""
+    due = db.session.query(func.min(Task.run_after)).filter(Task.status == 'pending').scalar()
+    db.session.commit()
+    if due is None:
+        return None
+    return max(0.0, (due - datetime.utcnow()).total_seconds())
+
+
+def maintain(lease=DEFAULT_LEASE, keep=DEFAULT_KEEP):
+    """Úlohy zaseknuté v `running` (pád procesu) späť do frontu, staré hotové preč
+
+    Úloha, ktorá už vyčerpala pokusy, sa nevracia (mohla by pád spôsobovať
+    sama) - ostane ako `failed`. Vráti (vrátené, zlyhané, zmazané).
+    """
+    now = datetime.utcnow()
+    stuck = (Task.status == 'running', Task.started_at < now - timedelta(seconds=lease))
+    exhausted = db.session.execute(
+        db.update(Task)
+        .where(*stuck, Task.attempts >= Task.max_attempts)
+        .values(status='failed', finished_at=now,
+                last_error='Prerušená (lease vypršal) po poslednom pokuse')
+    ).rowcount
+    recovered = db.session.execute(
+        db.update(Task).where(*stuck).values(status='pending', run_after=now)
+    ).rowcount
+    pruned = db.session.execute(
+        db.delete(Task).where(Task.status == 'done', Task.finished_at < now - timedelta(seconds=keep))
+    ).rowcount
+    db.session.commit()
+    return recovered, exhausted, pruned
+
+
+def retry_task(task_id):
+    """Zlyhanú úlohu vráti do frontu s novými pokusmi; False ak nie je zlyhaná"""
+    updated = db.session.execute(
+        db.update(Task)
+        .where(Task.id == task_id, Task.status == 'failed')
+        .values(status='pending', attempts=0, run_after=datetime.utcnow(), finished_at=None)
+    ).rowcount
+    db.session.info['dennik_tasks_enqueued'] = bool(updated)
+    db.session.commit()
+    return bool(updated)
+
+
+def queue_stats():
+    """Hĺbka frontu: počty podľa stavu a druhu, vek najstaršej čakajúcej úlohy"""
+    now = datetime.utcnow()
+    by_status = dict(db.session.query(Task.status, func.count(Task.id)).group_by(Task.status).all())
+    pending = dict(db.session.query(Task.kind, func.count(Task.id))
+                   .filter(Task.status == 'pending').group_by(Task.kind).all())
+    due = db.session.query(func.count(Task.id)).filter(Task.status == 'pending', Task.run_after <= now).scalar()
+    oldest = db.session.query(func.min(Task.created_at)).filter(Task.status == 'pending').scalar()
+    failed = Task.query.filter_by(status='failed').order_by(Task.finished_at.desc()).limit(20).all()
+    return {
+        'counts': {status: by_status.get(status, 0) for status in ('pending', 'running', 'done', 'failed')},
+        'pending_by_kind': pending,
+        'due': due,
+        'oldest_pending_seconds': round((now - oldest).total_seconds(), 1) if oldest else None,
+        'failed': [task.to_dict() for task in failed],
+    }
+
+
+class TaskWorker:
+    """Vlákna, ktoré spracúvajú front; zobudí ich commit s novou úlohou"""
+
+    def __init__(self, app, workers):
+        self.app = app
+        self.workers = workers
+        self.processed = 0
+        self.running = 0
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+        self._lock = threading.Lock()
+        self._maintained = 0.0
+        # time.monotonic() najbližšej čakajúcej úlohy, None = front je prázdny
+        self.next_due = time.monotonic()
+
+    def start(self):
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f'dennik-tasks-{index}', daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def wake(self):
+        self.next_due = time.monotonic()
+        self._wake.set()
+
+    def pending_soon(self, within=NEAR_DUE_SECONDS):
+        """Čaká úloha splatná do `within` sekúnd (alebo už splatná)?"""
+        next_due = self.next_due
+        return next_due is not None and next_due - time.monotonic() <= within
+
+    def stop(self, timeout=5):
+        # Rozbehnutú úlohu nechať dobehnúť - potom sa zatvárajú enginy aplikácie
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            if thread is not threading.current_thread():
+                thread.join(timeout)
+
+    def _maintain(self):
+        if time.monotonic() - self._maintained < MAINTENANCE_INTERVAL:
+            return
+        self._maintained = time.monotonic()
+        recovered, exhausted, _ = maintain(self.app.config['DENNIK_TASK_LEASE'], self.app.config['DENNIK_TASK_KEEP'])
+        if recovered:
+            print(f'[TASKS] {recovered} prerušených úloh vrátených do frontu', file=sys.stderr)
+        if exhausted:
+            print(f'[TASKS] {exhausted} prerušených úloh bez ďalšieho pokusu označených ako zlyhané',
+                  file=sys.stderr)
+
+    def _run(self):
+        while not self._stop.is_set():
+            wait = MAX_IDLE_WAIT
+            try:
+                with self.app.app_context():
+                    self._maintain()
+                    with self._lock:
+                        self.running += 1
+                    try:
+                        ran = run_next(self.app)
+                    finally:
+                        with self._lock:
+                            self.running -= 1
+                    if ran:
+                        with self._lock:
+                            self.processed += 1
+                        continue
+                    due = seconds_until_next()
+                    self.next_due = None if due is None else time.monotonic() + due
+                    if due is not None:
+                        wait = min(wait, due)
+            except Exception as e:
+                print(f'[TASKS] Worker zlyhal: {e}', file=sys.stderr)
+                wait = DEFAULT_BACKOFF
+            self._wake.wait(wait)
+            self._wake.clear()
+
+    def status(self):
+        return {'workers': self.workers, 'running': self.running, 'processed': self.processed}
+
+
+def worker(app=None):
+    app = app or current_app
+    return app.extensions.get('dennik_tasks')
+
+
+# === OBSLUHY ===
+
+@task_handler('remove_upload')
+def _remove_upload(app, payload):
+    """Zmazanie súboru prílohy po commite; chýbajúci súbor je hotová úloha"""
+    try:
+        os.remove(os.path.join(app.config['UPLOAD_FOLDER'], payload['filename']))
+    except FileNotFoundError:
+        pass
+
+
+@task_handler('finalize_upload')
+def _finalize_upload(app, payload):
+    """Práva súboru a referenčný SHA-256 pre kontrolu príloh (scrubber)"""
+    from app.scrubber import Throttle, check_file, _store_states
+    path = os.path.join(app.config['UPLOAD_FOLDER'], payload['filename'])
+    if not os.path.exists(path):
+        return  # príloha bola medzitým zmazaná
+    os.chmod(path, 0o644)
+    state = check_file(path, payload.get('file_size'), None, Throttle(app.config['DENNIK_SCRUB_RATE']))
+    _store_states({payload['filename']: state}, datetime.utcnow())
+    db.session.commit()
+
+
+def serving_config():
+    """Konfigurácia create_app pre serverový proces - s workermi frontu úloh"""
+    return {'DENNIK_TASK_WORKERS': int(os.environ.get('DENNIK_TASK_WORKERS', DEFAULT_WORKERS))}
+
+
+def init_tasks(app):
+    # Bez serving_config() (skripty, create_journal, bench) sa workery nespúšťajú
+    app.config.setdefault('DENNIK_TASK_WORKERS', 0)
+    app.config.setdefault('DENNIK_TASK_BACKOFF', DEFAULT_BACKOFF)
+    app.config.setdefault('DENNIK_TASK_LEASE', DEFAULT_LEASE)
+    app.config.setdefault('DENNIK_TASK_KEEP', DEFAULT_KEEP)
+    if not event.contains(db.session, 'after_commit', _wake_after_commit):
+        event.listen(db.session, 'after_commit', _wake_after_commit)
+        event.listen(db.session, 'after_rollback', _forget_enqueued)
+    # 0 = bez workera (úlohy spustí run_pending alebo iný proces)
+    if app.config['DENNIK_TASK_WORKERS'] > 0:
+        service = TaskWorker(app, app.config['DENNIK_TASK_WORKERS'])
+        app.extensions['dennik_tasks'] = service
+        service.start()
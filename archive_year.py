@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""Presun uzavretého roka do read-only archívu (archive/dennik-<rok>.db)
+
+Použitie: python3 archive_year.py 2019
+          python3 archive_year.py --list
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app
+from app.shards import archive_year, registry
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        print(__doc__)
+        sys.exit(1)
+    app = create_app()
+    shards = registry(app)
+    if sys.argv[1] == '--list':
+        for year, path in sorted(shards.years().items()):
+            print(f"{year}: {path} ({os.path.getsize(path) // 1024} kB)")
+        sys.exit(0)
+    try:
+        moved = archive_year(app, int(sys.argv[1]))
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    print(f"✅ Rok {sys.argv[1]} archivovaný ({moved} záznamov) do {shards.folder}")
@@ -0,0 +1,11 @@
+#!/usr/bin/env python3
+"""ASGI vstupný bod: uvicorn asgi:application --workers 2 (pip install -r requirements-asgi.txt)"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app
+from app.asgi import create_asgi_app
+from app.tasks import serving_config
+
+application = create_asgi_app(create_app(serving_config()))
@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+"""Okamžitá záloha databázy a príloh (rovnaká ako plánovaná záloha)
+
+Použitie: python3 backup_now.py          - vytvorí snapshot
+          python3 backup_now.py --list   - vypíše existujúce snapshoty
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app
+from app.backup import backup_app, list_snapshots, load_manifest
+
+if __name__ == '__main__':
+    app = create_app()
+    if '--list' in sys.argv[1:]:
+        for snapshot in list_snapshots(app.config['DENNIK_BACKUP_FOLDER']):
+            manifest = load_manifest(snapshot)
+            print(f"{os.path.basename(snapshot)}: {len(manifest['files'])} príloh, "
+                  f"{len(manifest.get('archive', {}))} archivovaných rokov")
+        sys.exit(0)
+    result = backup_app(app)
+    if result is None:
+        print("⚠️ Iná záloha práve beží")
+        sys.exit(1)
+    print(f"✅ Záloha {result['snapshot']}: {result['files']} príloh, "
+          f"{result['shards']} archivovaných rokov, {result['copied']} nových, {result['seconds']} s")
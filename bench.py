@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""Benchmarky denníka nad syntetickou databázou
+
+Použitie: python3 bench.py filters|timeline|startup|suggest [--entries 20000] [--repeat 20]
+"""
+import sys
+import os
+import argparse
+import random
+import tempfile
+import time
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from datetime import date, datetime, time as dtime, timedelta
+
+from app import create_app
+from app.models import db, Category, Entry, Attachment
+from app.filters import parse_entry_filters, compile_entry_query
+from app.stats import build_timeline
+
+# Kombinácie filtrov pre benchmark /api/entries (rovnaké parametre ako v URL)
+FILTER_CASES = [
+    ('bez filtra', {}),
+    ('rok', {'year': '2023'}),
+    ('rok + mesiac', {'year': '2023', 'month': '6'}),
+    ('rozsah dátumov', {'date_from': '2022-03-01', 'date_to': '2022-05-31'}),
+    ('kategória so stromom', {'category_id': '1'}),
+    ('viac kategórií', {'category_ids': '2,5,7'}),
+    ('rozsah + kategórie', {'date_from': '2021-01-01', 'date_to': '2021-12-31', 'category_ids': '1,3'}),
+    ('má prílohy', {'has_attachments': '1'}),
+    ('bez príloh', {'has_attachments': '0'}),
+    ('typ prílohy', {'attachment_type': 'application/pdf'}),
+    ('typ prílohy prefix', {'attachment_type': 'image/*'}),
+    ('vytvorené okno', {'created_from': '2024-01-01', 'created_to': '2024-01-31'}),
+    ('upravené okno + triedenie', {'updated_from': '2024-06-01', 'sort': 'updated_desc'}),
+    ('triedenie podľa názvu', {'sort': 'title'}),
+    ('hľadanie', {'search': 'faktúra'}),
+]
+
+
+def seed(entries_count, seed_value=42):
+    """Naplní prázdnu databázu kategóriami, záznamami a prílohami"""
+    rnd = random.Random(seed_value)
+    db.create_all()
+
+    parents = []
+    for i in range(4):
+        parent = Category(name=f'Skupina {i}')
+        db.session.add(parent)
+        parents.append(parent)
+    db.session.flush()
+    for parent in parents:
+        for j in range(3):
+            db.session.add(Category(name=f'Podskupina {j}', parent_id=parent.id))
+    db.session.flush()
+    category_ids = [c.id for c in Category.query.all()]
+
+    words = ['faktúra', 'záhrada', 'oprava', 'škola', 'výlet', 'nákup', 'lekár', 'auto']
+    start = date(2018, 1, 1)
+    mimes = ['application/pdf', 'image/png', 'image/jpeg', 'text/plain']
+    entry_rows = []
+    for i in range(entries_count):
+        day = start + timedelta(days=rnd.randrange(0, 365 * 7))
+        created = datetime(day.year, day.month, day.day) + timedelta(hours=rnd.randrange(0, 24 * 30))
+        entry_rows.append({
+            'date': day,
+            'time': dtime(rnd.randrange(24), rnd.randrange(60)),
+            'title': f'{rnd.choice(words).capitalize()} {i}',
+            'content': ' '.join(rnd.choice(words) for _ in range(40)),
+            'category_id': rnd.choice(category_ids),
+            'year': day.year,
+            'month': day.month,
+            'created_at': created,
+            'updated_at': created + timedelta(days=rnd.randrange(0, 400)),
+        })
+    db.session.execute(Entry.__table__.insert(), entry_rows)
+
+    entry_ids = [row[0] for row in db.session.query(Entry.id).all()]
+    attachment_rows = []
+    for entry_id in rnd.sample(entry_ids, len(entry_ids) // 5):
+        attachment_rows.append({
+            'entry_id': entry_id,
+            'filename': f'{entry_id}.bin',
+            'original_filename': f'subor_{entry_id}.bin',
+            'file_size': rnd.randrange(1, 10 ** 6),
+            'mime_type': rnd.choice(mimes),
+            'uploaded_at': datetime.utcnow(),
+        })
+    if attachment_rows:
+        db.session.execute(Attachment.__table__.insert(), attachment_rows)
+    db.session.commit()
+    db.session.execute(db.text('ANALYZE'))
+    db.session.commit()
+
+
+def query_plan(query):
+    """EXPLAIN QUERY PLAN pre SQLAlchemy query (iba detaily krokov)"""
+    compiled = query.statement.compile(db.engine, compile_kwargs={'literal_binds': True})
+    rows = db.session.execute(db.text(f'EXPLAIN QUERY PLAN {compiled}')).all()
+    return '; '.join(row[-1] for row in rows)
+
+
+def bench_filters(args):
+    for name, params in FILTER_CASES:
+        timings = []
+        total = 0
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            filters = parse_entry_filters(params)
+            query = compile_entry_query(filters)
+            pagination = query.paginate(page=1, per_page=filters['per_page'], error_out=False)
+            total = pagination.total
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        median = timings[len(timings) // 2]
+        print(f'{name:<28} {median:8.2f} ms  (n={total})')
+        if args.plan:
+            print(f'    {query_plan(compile_entry_query(parse_entry_filters(params)))}')
+
+
+def bench_timeline(args):
+    """Heatmapa jedného roka - zoskupený dotaz bez cache"""
+    year_from, year_to = date(2023, 1, 1), date(2023, 12, 31)
+    for granularity in ('day', 'week', 'month'):
+        for by_category in (False, True):
+            timings = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                timeline = build_timeline(year_from, year_to, granularity, by_category)
+                timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+            label = f'{granularity}{" + kategórie" if by_category else ""}'
+            print(f'{label:<28} {timings[len(timings) // 2]:8.2f} ms  (skupín={len(timeline["buckets"])})')
+    if args.plan:
+        query = db.session.query(Entry.date, Entry.category_id, db.func.count()).filter(
+            Entry.date >= year_from, Entry.date <= year_to).group_by(Entry.date, Entry.category_id)
+        print(f'    {query_plan(query)}')
+
+
+def bench_startup(args):
+    """Studený štart create_app nad existujúcou databázou s aktuálnou schémou"""
+    from flask import current_app
+    config = {'SQLALCHEMY_DATABASE_URI': current_app.config['SQLALCHEMY_DATABASE_URI']}
+    timings = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        app = create_app(config)
+        timings.append((time.perf_counter() - started) * 1000)
+        with app.app_context():
+            for engine in db.engines.values():
+                engine.dispose()
+    timings.sort()
+    print(f'{"create_app":<28} {timings[len(timings) // 2]:8.2f} ms  (min {timings[0]:.2f} ms)')
+
+    started = time.perf_counter()
+    db.create_all()
+    print(f'{"create_all (pre porovnanie)":<28} {(time.perf_counter() - started) * 1000:8.2f} ms')
+
+
+def bench_suggest(args):
+    """Návrhy pri písaní: zostavenie indexu a dotazy na prefixy (bez a s LRU)"""
+    from app.suggest import build_index
+    started = time.perf_counter()
+    index = build_index()
+    print(f'{"zostavenie indexu":<28} {(time.perf_counter() - started) * 1000:8.2f} ms  (kľúčov={len(index)})')
+    for prefix in ('fa', 'fakt', 'zahr', 'oprava 1', 'sk'):
+        cold = time.perf_counter()
+        count = len(index.suggest(prefix))
+        cold = (time.perf_counter() - cold) * 1000
+        timings = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            index.suggest(prefix)
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        print(f'{prefix!r:<28} {cold:8.3f} ms  (z LRU {timings[len(timings) // 2]:.4f} ms, návrhov={count})')
+    started = time.perf_counter()
+    filters = parse_entry_filters({'search': 'fakt'})
+    compile_entry_query(filters).paginate(page=1, per_page=filters['per_page'], error_out=False)
+    print(f'{"plné hľadanie (porovnanie)":<28} {(time.perf_counter() - started) * 1000:8.2f} ms')
+
+
+BENCHMARKS = {
+    'filters': bench_filters,
+    'timeline': bench_timeline,
+    'startup': bench_startup,
+    'suggest': bench_suggest,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarky denníka')
+    parser.add_argument('benchmark', choices=sorted(BENCHMARKS))
+    parser.add_argument('--entries', type=int, default=20000, help='počet syntetických záznamov')
+    parser.add_argument('--repeat', type=int, default=20, help='počet opakovaní každého merania')
+    parser.add_argument('--plan', action='store_true', help='vypísať EXPLAIN QUERY PLAN')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp, 'bench.db')}"})
+        with app.app_context():
+            seed(args.entries)
+            BENCHMARKS[args.benchmark](args)
+
+
+if __name__ == '__main__':
+    main()
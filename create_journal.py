@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""Založenie ďalšieho denníka (dostupný na /j/<meno>/)
+
+Použitie: python3 create_journal.py <meno>   - založí denník (priečinky + databáza)
+          python3 create_journal.py --list   - vypíše existujúce denníky
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app, shutdown_app
+from app.journals import JournalError, create_journal, journal_exists, list_journals
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    if len(args) != 1:
+        print(__doc__)
+        sys.exit(1)
+    app = create_app({'DENNIK_BACKUP_INTERVAL': 0, 'DENNIK_SCRUB_INTERVAL': 0})
+    try:
+        if args[0] == '--list':
+            for name in list_journals(app):
+                print(f'/j/{name}/')
+            sys.exit(0)
+        name = args[0]
+        try:
+            if journal_exists(app, name):
+                print(f'⚠️ Denník {name} už existuje')
+                sys.exit(1)
+            folder = create_journal(app, name)
+        except JournalError as e:
+            print(f'❌ {e}')
+            sys.exit(1)
+        print(f'✅ Denník {name} založený v {folder} (adresa /j/{name}/)')
+    finally:
+        shutdown_app(app)
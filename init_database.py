@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 from app import create_app
 from app.models import db, Category, Entry, Settings
+from app.migrations import set_schema_version, SCHEMA_VERSION
 from datetime import datetime, date
 
 def init_database():
@@ -11,6 +12,7 @@ def init_database():
         # Vymazanie existujúcich dát
         db.drop_all()
         db.create_all()
+        set_schema_version(SCHEMA_VERSION)
         
         print("Vytváranie ukážkových kategórií...")
         
@@ -1,15 +1,24 @@
 #!/usr/bin/env python3
-"""Migrácia databázy - pridanie tabuľky attachments"""
+"""Migrácia databázy - aplikuje chýbajúce verzie schémy (dá sa spustiť aj za behu aplikácie)"""
 import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from app import create_app
-from app.models import db
+from app.migrations import migrate, schema_version, SCHEMA_VERSION
+
+
+def report(version, description):
+    print(f"  → {version}: {description}")
+
 
 if __name__ == '__main__':
-    app = create_app()
+    # Aplikácia sa nesmie pokúsiť migrovať sama pri štarte
+    app = create_app({'DENNIK_AUTO_MIGRATE': False})
     with app.app_context():
-        # Vytvorí všetky nové tabuľky (vrátane Attachment)
-        db.create_all()
-        print("✅ Databáza aktualizovaná - tabuľka attachments vytvorená")
+        print(f"Verzia schémy: {schema_version()} (aktuálna {SCHEMA_VERSION})")
+        applied = migrate(report)
+        if applied:
+            print(f"✅ Databáza aktualizovaná na verziu {SCHEMA_VERSION}")
+        else:
+            print("✅ Databáza je aktuálna")
@@ -0,0 +1,22 @@
+#!/usr/bin/env python3
+"""Doplnenie textu príloh do vyhľadávania (iba nové alebo zmenené súbory)"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app
+from app.models import db, Attachment
+
+if __name__ == '__main__':
+    app = create_app()
+    extractor = app.extensions['dennik_extractor']
+    with app.app_context():
+        scheduled = 0
+        for attachment in Attachment.query.order_by(Attachment.id).all():
+            file_path = os.path.join(app.config['UPLOAD_FOLDER'], attachment.filename)
+            if extractor.schedule(attachment, file_path):
+                scheduled += 1
+        print(f"Naplánovaných extrakcií: {scheduled}")
+    # Počkaj na dokončenie všetkých úloh (výsledky sa ukladajú priebežne)
+    extractor.shutdown(wait=True)
+    print("✅ Text príloh aktualizovaný")
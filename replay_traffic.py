@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""Prehranie zaznamenanej záťaže proti bežiacej inštancii denníka
+
+Záznam vytvorí server spustený s DENNIK_RECORD_FILE=traffic.jsonl.
+Prehranie beží s daným počtom súbežných klientov a buď drží pôvodné
+rozostupy requestov (--speed 1 = reálny čas, 2 = dvakrát rýchlejšie),
+alebo posiela čo najrýchlejšie (--speed 0). Na konci vypíše
+priepustnosť, percentily latencie (celkovo aj podľa routy), chybovosť
+a počet chýb zamknutej SQLite databázy.
+
+Latencia sa počíta od plánovaného času odoslania, nie od chvíle, keď
+sa voľný klient k requestu dostal - request, ktorý čakal na klienta
+zdržaného pomalým serverom, sa započíta celým čakaním (coordinated
+omission). Čistý čas na serveri je zvlášť ako `service_ms`. Ak cieľový
+server zaznamenáva (DENNIK_RECORD_FILE), jeho hlavička Server-Timing
+pridá čakanie na zámok zapisovača (`lock_wait_ms`, `writer_ms`).
+
+Použitie: python3 replay_traffic.py traffic.jsonl [--url http://127.0.0.1:5005]
+              [--concurrency 8] [--speed 1] [--limit 1000] [--read-only] [--json]
+"""
+import sys
+import os
+import argparse
+import json
+import threading
+import time
+import uuid
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+DEFAULT_URL = f"http://127.0.0.1:{os.environ.get('DENNIK_PORT', '5005')}"
+READ_METHODS = ('GET', 'HEAD')
+# Odpovede, ktoré znamenajú čakanie na zámok SQLite / spojenie zapisovača
+LOCK_MARKERS = ('database is locked', 'database table is locked', 'QueuePool limit')
+READ_CHUNK = 64 * 1024
+
+
+def load_records(path, limit=None, read_only=False):
+    records = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if read_only and record['method'] not in READ_METHODS:
+                continue
+            records.append(record)
+            if limit and len(records) >= limit:
+                break
+    records.sort(key=lambda r: r.get('t', 0))
+    return records
+
+
+def multipart_body(files):
+    """Syntetické súbory rovnakej veľkosti a prípony ako v zázname"""
+    boundary = uuid.uuid4().hex
+    parts = []
+    for info in files:
+        ext = f".{info['ext']}" if info.get('ext') else ''
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{info["field"]}"; '
+            f'filename="replay{ext}"\r\nContent-Type: {info.get("mime_type") or "application/octet-stream"}'
+            f'\r\n\r\n'.encode() + os.urandom(info['size']) + b'\r\n')
+    parts.append(f'--{boundary}--\r\n'.encode())
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+
+def build_request(base_url, record):
+    """urllib Request zo záznamu; None pre requesty, ktoré sa nedajú prehrať (surové telo)"""
+    url = base_url.rstrip('/') + record['path']
+    if record.get('query'):
+        url += '?' + urlencode(record['query'])
+    data, content_type = None, None
+    if record.get('files'):
+        data, content_type = multipart_body(record['files'])
+    elif record.get('json') is not None:
+        data, content_type = json.dumps(record['json']).encode('utf-8'), 'application/json'
+    elif record.get('request_bytes') and record['method'] not in READ_METHODS:
+        return None
+    req = urllib.request.Request(url, data=data, method=record['method'])
+    if content_type:
+        req.add_header('Content-Type', content_type)
+    return req
+
+
+def server_timing(header):
+    """{'lock': ms, 'writer': ms} z hlavičky Server-Timing"""
+    timings = {}
+    for metric in (header or '').split(','):
+        name, _, params = metric.strip().partition(';')
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'dur':
+                try:
+                    timings[name] = float(value)
+                except ValueError:
+                    pass
+    return timings
+
+
+def send(req, timeout):
+    """(status, čas obsluhy v s, prijaté bajty, chyba zámku, Server-Timing)"""
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as response:
+            status = response.status
+            received = 0
+            for chunk in iter(lambda: response.read(READ_CHUNK), b''):
+                received += len(chunk)
+            return (status, time.perf_counter() - started, received, False,
+                    server_timing(response.headers.get('Server-Timing')))
+    except urllib.error.HTTPError as e:
+        body = e.read().decode('utf-8', 'replace')
+        return (e.code, time.perf_counter() - started, len(body), any(m in body for m in LOCK_MARKERS),
+                server_timing(e.headers.get('Server-Timing')))
+    except Exception as e:
+        return None, time.perf_counter() - started, 0, any(m in str(e) for m in LOCK_MARKERS), {}
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(results, seconds):
+    def latency(values, scale=1000):
+        values = sorted(values)
+        return {name: round(percentile(values, q) * scale, 2) if values else None
+                for name, q in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99))}
+
+    total = len(results)
+    server_errors = sum(1 for r in results if r['status'] is None or r['status'] >= 500)
+    statuses = {}
+    routes = {}
+    for r in results:
+        statuses[str(r['status'])] = statuses.get(str(r['status']), 0) + 1
+        routes.setdefault(f"{r['method']} {r['route']}", []).append(r['seconds'])
+    return {
+        'requests': total,
+        'seconds': round(seconds, 3),
+        'throughput': round(total / seconds, 1) if seconds else None,
+        'latency_ms': latency([r['seconds'] for r in results]),
+        'service_ms': latency([r['service'] for r in results]),
+        # Iba odpovede so Server-Timing (server so zapnutým DENNIK_RECORD_FILE)
+        'lock_wait_ms': latency([r['timing']['lock'] for r in results if 'lock' in r['timing']], 1),
+        'writer_ms': latency([r['timing']['writer'] for r in results if 'writer' in r['timing']], 1),
+        'error_rate': round(server_errors / total, 4) if total else 0,
+        'client_errors': sum(1 for r in results if r['status'] and 400 <= r['status'] < 500),
+        'lock_errors': sum(1 for r in results if r['lock']),
+        'statuses': statuses,
+        'routes': {route: dict(count=len(values), **latency(values)) for route, values in sorted(routes.items())},
+    }
+
+
+def replay(records, base_url, concurrency=8, speed=1.0, timeout=60):
+    results = []
+    results_lock = threading.Lock()
+    skipped = 0
+
+    def run(record, req, scheduled):
+        status, service, received, lock, timing = send(req, timeout)
+        with results_lock:
+            results.append({'method': record['method'], 'route': record.get('route') or record['path'],
+                            'status': status, 'seconds': time.perf_counter() - scheduled,
+                            'service': service, 'bytes': received, 'lock': lock, 'timing': timing})
+
+    first = records[0].get('t', 0) if records else 0
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for record in records:
+            req = build_request(base_url, record)
+            if req is None:
+                skipped += 1
+                continue
+            scheduled = time.perf_counter()
+            if speed > 0:
+                # Pôvodné rozostupy requestov, zrýchlené `speed`-krát
+                scheduled = started + (record.get('t', first) - first) / speed
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            # Latencia od `scheduled` - zahŕňa aj čakanie na voľného klienta v poole
+            pool.submit(run, record, req, scheduled)
+    summary = summarize(results, time.perf_counter() - started)
+    summary['skipped'] = skipped
+    return summary
+
+
+def print_summary(summary):
+    latency = summary['latency_ms']
+    print(f"Requesty: {summary['requests']} za {summary['seconds']} s "
+          f"({summary['throughput']} req/s), preskočené: {summary['skipped']}")
+    print(f"Latencia: p50 {latency['p50']} ms  p95 {latency['p95']} ms  p99 {latency['p99']} ms")
+    service = summary['service_ms']
+    print(f"Obsluha:  p50 {service['p50']} ms  p95 {service['p95']} ms  p99 {service['p99']} ms")
+    lock_wait, writer = summary['lock_wait_ms'], summary['writer_ms']
+    if lock_wait['p50'] is not None:
+        print(f"Server - čakanie na zapisovača: p50 {lock_wait['p50']} ms  p95 {lock_wait['p95']} ms  "
+              f"p99 {lock_wait['p99']} ms, dotazy zapisovača p95 {writer['p95']} ms")
+    print(f"Chyby 5xx/spojenie: {summary['error_rate'] * 100:.2f} %  4xx: {summary['client_errors']}  "
+          f"zámok SQLite: {summary['lock_errors']}")
+    print(f"Stavy: {summary['statuses']}")
+    print(f"{'routa':<60} {'počet':>6} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for route, stats in summary['routes'].items():
+        print(f"{route:<60} {stats['count']:>6} {stats['p50']:>9} {stats['p95']:>9} {stats['p99']:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Prehranie zaznamenanej záťaže denníka')
+    parser.add_argument('recording', help='JSONL záznam (DENNIK_RECORD_FILE)')
+    parser.add_argument('--url', default=DEFAULT_URL)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--speed', type=float, default=1.0, help='násobok rýchlosti, 0 = bez pauz')
+    parser.add_argument('--limit', type=int, default=None)
+    parser.add_argument('--timeout', type=float, default=60)
+    parser.add_argument('--read-only', action='store_true', help='iba GET/HEAD (nemení dáta)')
+    parser.add_argument('--json', action='store_true', help='výsledok ako JSON')
+    args = parser.parse_args()
+
+    records = load_records(args.recording, args.limit, args.read_only)
+    if not records:
+        print('⚠️ Záznam neobsahuje žiadne requesty')
+        sys.exit(1)
+    summary = replay(records, args.url, args.concurrency, args.speed, args.timeout)
+    if args.json:
+        print(json.dumps(summary, indent=1, ensure_ascii=False))
+    else:
+        print_summary(summary)
+
+
+if __name__ == '__main__':
+    main()
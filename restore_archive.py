@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""Obnova denníka zo ZIP exportu (/api/archive/export)
+
+Použitie: python3 restore_archive.py dennik_zaloha_20250101.zip
+"""
+import sys
+import os
+import threading
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app
+from app.restore import RestoreJob, restore_archive, wait_for
+
+
+def report(state):
+    percent = f"{state['percent']:5.1f} %" if state['percent'] is not None else '   -  '
+    print(f"\r{state['phase'] or state['status']:<11} {percent}  "
+          f"{state['files_done']}/{state['files_total']} súborov", end='', flush=True)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2 or not os.path.isfile(sys.argv[1]):
+        print(__doc__)
+        sys.exit(1)
+    app = create_app()
+    job = RestoreJob(os.path.abspath(sys.argv[1]))
+
+    def run():
+        try:
+            restore_archive(app, job.zip_path, job)
+        except Exception as e:
+            job.update(status='failed', error=str(e))
+
+    threading.Thread(target=run, daemon=True).start()
+    state = wait_for(job, report=report)
+    print()
+    if state['status'] == 'failed':
+        print(f"❌ Obnova zlyhala: {state['error']}")
+        sys.exit(1)
+    print(f"✅ Denník obnovený ({state['result']['uploads']} príloh, "
+          f"{state['result']['archived_years']} archivovaných rokov)")
@@ -4,10 +4,20 @@ import os
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from app import create_app
+from app.tasks import serving_config
 
 DEFAULT_PORT = int(os.environ.get('DENNIK_PORT', '5005'))
 
 if __name__ == '__main__':
-    app = create_app()
-    # Run on configurable port so CLI, launcher, and docs stay in sync
-    app.run(debug=True, host='0.0.0.0', port=DEFAULT_PORT)
\ No newline at end of file
+    app = create_app(serving_config())
+    if os.environ.get('DENNIK_SERVER') == 'asgi':
+        # Prílohy a export sa streamujú na event loope (závislosti v requirements-asgi.txt)
+        try:
+            import uvicorn
+        except ImportError:
+            sys.exit('ASGI režim vyžaduje uvicorn a asgiref: pip install -r requirements-asgi.txt')
+        from app.asgi import create_asgi_app
+        uvicorn.run(create_asgi_app(app), host='0.0.0.0', port=DEFAULT_PORT)
+    else:
+        # Run on configurable port so CLI, launcher, and docs stay in sync
+        app.run(debug=True, host='0.0.0.0', port=DEFAULT_PORT)
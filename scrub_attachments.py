@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""Kontrola integrity príloh a zber osirelých súborov
+
+Použitie: python3 scrub_attachments.py            - dokončí/spustí prechod
+          python3 scrub_attachments.py --verify   - prepočíta SHA-256 všetkých súborov
+          python3 scrub_attachments.py --dry-run  - osirelé súbory iba označí, nezmaže
+          python3 scrub_attachments.py --report   - vypíše výsledok poslednej kontroly
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app
+from app.scrubber import run_scrub, scrub_report
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    app = create_app()
+    if '--report' not in args:
+        result = run_scrub(app, verify=True if '--verify' in args else None, dry_run='--dry-run' in args)
+        if result is None:
+            print("⚠️ Iná kontrola príloh práve beží")
+            sys.exit(1)
+        print(f"✅ Skontrolovaných {result['checked']} príloh za {result['seconds']} s, "
+              f"zmazaných {result['reclaimed']} osirelých súborov ({result['reclaimed_bytes']} B)")
+    with app.app_context():
+        report = scrub_report()
+    print(f"Stav: {report['counts']}  (posledný prechod: {report['last_pass']})")
+    for problem in report['problems']:
+        print(f"  {problem['status']:8} {problem['filename']}  od {problem['since']}")
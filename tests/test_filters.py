@@ -0,0 +1,144 @@
+"""Kompilátor filtrov /api/entries - parsovanie aj query nad SQLite v pamäti"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetime import date
+
+import pytest
+
+from app import create_app, shutdown_app
+from app.filters import FilterError, apply_entry_filters, parse_entry_filters, MAX_PER_PAGE
+from app.models import db, Attachment, Category, Entry
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+        'DENNIK_INSTANCE_PATH': str(tmp_path / 'instance'),
+        'UPLOAD_FOLDER': str(tmp_path / 'uploads'),
+        'DENNIK_JOURNALS': False,
+    })
+    with app.app_context():
+        yield app
+    shutdown_app(app)
+
+
+@pytest.fixture
+def entries(app):
+    """Kategória s podkategóriou a záznamy s rôznymi prílohami"""
+    home = Category(name='Domov')
+    db.session.add(home)
+    db.session.flush()
+    garden = Category(name='Záhrada', parent_id=home.id)
+    work = Category(name='Práca')
+    db.session.add_all([garden, work])
+    db.session.flush()
+
+    def entry(title, day, category, attachments=()):
+        item = Entry(title=title, date=day, year=day.year, month=day.month, category_id=category.id)
+        item.content = f'obsah {title}'
+        db.session.add(item)
+        db.session.flush()
+        for original, mime in attachments:
+            db.session.add(Attachment(entry_id=item.id, filename=f'{item.id}-{original}',
+                                      original_filename=original, mime_type=mime, file_size=1))
+        return item
+
+    created = {
+        'faktura': entry('Faktúra', date(2024, 1, 15), work, [('faktura.pdf', 'application/pdf')]),
+        'foto': entry('Fotky', date(2024, 2, 3), garden, [('ruza.png', 'image/png')]),
+        'pozn': entry('Poznámka', date(2023, 12, 31), home),
+        'divne': entry('Divné', date(2024, 3, 1), work, [('a%b_c.txt', 'text/plain')]),
+    }
+    db.session.commit()
+    return {name: item.id for name, item in created.items()}
+
+
+def titles(filters):
+    query = apply_entry_filters(db.session.query(Entry), filters)
+    return [entry.title for entry in query]
+
+
+# === parse_entry_filters ===
+
+def test_defaults():
+    assert parse_entry_filters({}) == {'sort': 'date_desc', 'page': 1, 'per_page': 20}
+
+
+@pytest.mark.parametrize('args', [
+    {'date_from': '2024-13-01'},
+    {'date_to': '15.1.2024'},
+    {'date_from': '2024-02-01', 'date_to': '2024-01-01'},
+    {'created_from': 'včera'},
+    {'year': 'abc'},
+    {'year': '2024', 'month': '13'},
+    {'has_attachments': 'možno'},
+    {'has_attachments': '0', 'attachment_type': 'pdf'},
+    {'sort': 'random'},
+    {'category_ids': '1,x'},
+    {'page': 'prvá'},
+])
+def test_invalid_values_raise(args):
+    with pytest.raises(FilterError):
+        parse_entry_filters(args)
+
+
+def test_normalization():
+    filters = parse_entry_filters({
+        'category_ids': '3, 1,3', 'attachment_type': ' PDF ', 'search': '  text ',
+        'per_page': '100000', 'page': '-2', 'month': '5',
+    })
+    assert filters['category_ids'] == [3, 1]
+    assert filters['attachment_type'] == 'pdf'
+    assert filters['search'] == 'text'
+    assert filters['per_page'] == MAX_PER_PAGE
+    assert filters['page'] == 1
+    assert 'month' not in filters  # mesiac bez roka sa ignoruje
+
+
+def test_upper_date_bound_covers_whole_day():
+    filters = parse_entry_filters({'created_to': '2024-01-15'})
+    assert filters['created_to'].date() == date(2024, 1, 16)
+
+
+def test_route_returns_400(app):
+    response = app.test_client().get('/api/entries?date_from=2024-02-01&date_to=2024-01-01')
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+
+# === apply_entry_filters ===
+
+def test_year_month_and_date_range(entries):
+    assert titles(parse_entry_filters({'year': '2024', 'month': '2'})) == ['Fotky']
+    assert titles(parse_entry_filters({'date_from': '2023-12-31', 'date_to': '2024-01-15',
+                                       'sort': 'date_asc'})) == ['Poznámka', 'Faktúra']
+
+
+def test_category_includes_children(entries):
+    home = Category.query.filter_by(name='Domov').one()
+    assert sorted(titles(parse_entry_filters({'category_id': str(home.id)}))) == ['Fotky', 'Poznámka']
+
+
+def test_attachments(entries):
+    assert titles(parse_entry_filters({'has_attachments': '0'})) == ['Poznámka']
+    assert titles(parse_entry_filters({'has_attachments': '1', 'sort': 'title'})) == ['Divné', 'Faktúra', 'Fotky']
+    assert titles(parse_entry_filters({'attachment_type': 'image/*'})) == ['Fotky']
+    assert titles(parse_entry_filters({'attachment_type': 'application/pdf'})) == ['Faktúra']
+    assert titles(parse_entry_filters({'attachment_type': 'PDF'})) == ['Faktúra']
+
+
+def test_like_wildcards_are_literal(entries):
+    # % a _ od používateľa nesmú fungovať ako zástupné znaky
+    assert titles(parse_entry_filters({'attachment_type': '%/*'})) == []
+    assert titles(parse_entry_filters({'attachment_type': 'imag_/*'})) == []
+    assert titles(parse_entry_filters({'attachment_type': 'p_f'})) == []
+    assert titles(parse_entry_filters({'attachment_type': '%'})) == []
+    assert titles(parse_entry_filters({'attachment_type': 'txt'})) == ['Divné']
+
+
+def test_search_and_sort(entries):
+    assert titles(parse_entry_filters({'search': 'obsah f', 'sort': 'title'})) == ['Faktúra', 'Fotky']
+    assert titles(parse_entry_filters({'sort': 'date_asc'}))[0] == 'Poznámka'